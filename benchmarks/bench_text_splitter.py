@@ -0,0 +1,80 @@
+# benchmarks/bench_text_splitter.py
+# -*- coding: utf-8 -*-
+"""
+ChineseSentenceSplitter 吞吐量基准。
+可指定一本小说的 txt 文件；不指定时生成约 --size-mb MB 的合成中文文本：
+
+    python benchmarks/bench_text_splitter.py --file novel.txt
+    python benchmarks/bench_text_splitter.py --size-mb 8
+
+输出切分耗时、MB/s、片段数与平均片段长度；安装了 langchain 时附带 RecursiveCharacterTextSplitter 对比。
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _synthetic_text(size_mb: float) -> str:
+    random.seed(0)
+    chars = "天地玄黄宇宙洪荒日月盈昃辰宿列张寒来暑往秋收冬藏闰余成岁律吕调阳云腾致雨露结为霜金生丽水玉出昆冈"
+    endings = ["。", "！", "？", "……", "；"]
+    parts = []
+    size = 0
+    target = int(size_mb * 1024 * 1024)
+    while size < target:
+        sentence = "".join(random.choice(chars) for _ in range(random.randint(8, 40))) + random.choice(endings)
+        if random.random() < 0.2:
+            sentence = f"“{sentence}”"
+        if random.random() < 0.1:
+            sentence += "\n"
+        parts.append(sentence)
+        size += len(sentence.encode('utf-8'))
+    return "".join(parts)
+
+
+def _run(name, split, text):
+    size_mb = len(text.encode('utf-8')) / 1024 / 1024
+    start = time.perf_counter()
+    chunks = split(text)
+    elapsed = time.perf_counter() - start
+    avg = sum(len(c) for c in chunks) / max(len(chunks), 1)
+    print(f"[{name}] {size_mb:.2f}MB 用时 {elapsed:.2f}s，{size_mb / elapsed:.2f} MB/s，{len(chunks)} 个片段，平均 {avg:.0f} 字")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="中文句子切分器吞吐量基准")
+    parser.add_argument("--file", help="待切分的 UTF-8 文本文件")
+    parser.add_argument("--size-mb", type=float, default=4.0, help="未指定文件时生成的文本大小")
+    parser.add_argument("--chunk-tokens", type=int, default=400)
+    parser.add_argument("--overlap-tokens", type=int, default=50)
+    args = parser.parse_args()
+
+    if args.file:
+        with open(args.file, 'r', encoding='utf-8', errors='ignore') as f:
+            text = f.read()
+    else:
+        text = _synthetic_text(args.size_mb)
+
+    from novel_generator.text_splitter import ChineseSentenceSplitter
+    splitter = ChineseSentenceSplitter(args.chunk_tokens, args.overlap_tokens)
+    _run("ChineseSentenceSplitter", splitter.split_text, text)
+
+    try:
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+    except ImportError:
+        print("[RecursiveCharacterTextSplitter] 未安装 langchain_text_splitters，跳过")
+        return
+    baseline = RecursiveCharacterTextSplitter(
+        chunk_size=args.chunk_tokens,
+        chunk_overlap=args.overlap_tokens,
+        separators=["\n\n", "\n", "。", "！", "？", "；", "……", ""]
+    )
+    _run("RecursiveCharacterTextSplitter", baseline.split_text, text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+# benchmarks/bench_vectorstore.py
+# -*- coding: utf-8 -*-
+"""
+本地向量库 (LocalVectorStore) 与 chromadb 的对比基准。
+使用随机向量，不调用任何 Embedding 接口：
+
+    python benchmarks/bench_vectorstore.py --num 50000 --dim 1024 --queries 200
+
+输出导入耗时、写入耗时、冷启动耗时与查询延迟 (p50 / p95)；
+本地向量库另外报告缓存实例的热启动耗时，以及删除一半数据后压缩 (compact) 前后的冷启动耗时与磁盘占用。
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import importlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _percentile(values, pct):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    idx = min(len(values) - 1, int(len(values) * pct / 100))
+    return values[idx]
+
+
+def _report(name, import_s, build_s, open_s, latencies):
+    print(f"[{name}] 导入: {import_s * 1000:.1f}ms  写入: {build_s:.2f}s  冷启动: {open_s * 1000:.1f}ms  "
+          f"查询 p50: {_percentile(latencies, 50) * 1000:.2f}ms  p95: {_percentile(latencies, 95) * 1000:.2f}ms")
+
+
+def bench_local(vectors, queries, k, workdir, batch):
+    t0 = time.perf_counter()
+    module = importlib.import_module("novel_generator.local_vectorstore")
+    import_s = time.perf_counter() - t0
+
+    store_dir = os.path.join(workdir, "local")
+    store = module.LocalVectorStore(store_dir)
+    texts = [f"doc-{i}" for i in range(len(vectors))]
+    t0 = time.perf_counter()
+    for start in range(0, len(vectors), batch):
+        end = start + batch
+        store.add_texts(texts[start:end], ids=texts[start:end], embeddings=vectors[start:end])
+    build_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    store = module.LocalVectorStore(store_dir)
+    store.similarity_search_by_vector(queries[0], k=k)
+    open_s = time.perf_counter() - t0
+
+    latencies = []
+    for q in queries:
+        t0 = time.perf_counter()
+        store.similarity_search_by_vector(q, k=k)
+        latencies.append(time.perf_counter() - t0)
+    _report("local", import_s, build_s, open_s, latencies)
+    bench_local_reopen(module, workdir, store, texts)
+
+
+def _cold_open(module, project_dir):
+    module.close_local_vector_store(project_dir)
+    t0 = time.perf_counter()
+    store = module.open_local_vector_store(project_dir)
+    return store, time.perf_counter() - t0
+
+
+def bench_local_reopen(module, workdir, store, texts):
+    """模拟反复修改后的库：删除一半再覆盖写入一部分，比较压缩前后的冷启动与磁盘占用。"""
+    project_dir = os.path.join(workdir, "project")
+    store_dir = module.get_local_vectorstore_dir(project_dir)
+    shutil.copytree(store.persist_directory, store_dir)
+    store, cold_s = _cold_open(module, project_dir)
+    store.delete(texts[::2])
+    rewrite = texts[1::8]
+    store.add_texts(rewrite, ids=rewrite, embeddings=[v.tolist() for v in store.get_vectors(rewrite).values()])
+
+    store, before_s = _cold_open(module, project_dir)
+    t0 = time.perf_counter()
+    module.open_local_vector_store(project_dir)
+    warm_s = time.perf_counter() - t0
+    before = store.stats()
+    t0 = time.perf_counter()
+    store.compact()
+    compact_s = time.perf_counter() - t0
+    store, after_s = _cold_open(module, project_dir)
+    after = store.stats()
+    print(f"[local] 冷启动(未修改): {cold_s * 1000:.1f}ms  热启动(缓存实例): {warm_s * 1000:.3f}ms")
+    print(f"[local] 压缩前: {before['rows']} 行 / 墓碑 {before['dead_ratio']:.0%} / {before['disk_bytes'] / 1e6:.1f}MB / 冷启动 {before_s * 1000:.1f}ms")
+    print(f"[local] 压缩后: {after['rows']} 行 / {after['disk_bytes'] / 1e6:.1f}MB / 冷启动 {after_s * 1000:.1f}ms  (压缩耗时 {compact_s:.2f}s)")
+
+
+def bench_chroma(vectors, queries, k, workdir, batch):
+    t0 = time.perf_counter()
+    try:
+        chromadb = importlib.import_module("chromadb")
+    except ImportError:
+        print("[chroma] 未安装 chromadb，跳过")
+        return
+    import_s = time.perf_counter() - t0
+
+    store_dir = os.path.join(workdir, "chroma")
+    client = chromadb.PersistentClient(path=store_dir)
+    collection = client.get_or_create_collection("bench", metadata={"hnsw:space": "cosine"})
+    texts = [f"doc-{i}" for i in range(len(vectors))]
+    t0 = time.perf_counter()
+    for start in range(0, len(vectors), batch):
+        end = start + batch
+        collection.add(ids=texts[start:end], documents=texts[start:end], embeddings=vectors[start:end])
+    build_s = time.perf_counter() - t0
+    del collection, client
+
+    t0 = time.perf_counter()
+    client = chromadb.PersistentClient(path=store_dir)
+    collection = client.get_collection("bench")
+    collection.query(query_embeddings=[queries[0]], n_results=k)
+    open_s = time.perf_counter() - t0
+
+    latencies = []
+    for q in queries:
+        t0 = time.perf_counter()
+        collection.query(query_embeddings=[q], n_results=k)
+        latencies.append(time.perf_counter() - t0)
+    _report("chroma", import_s, build_s, open_s, latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LocalVectorStore vs chromadb 基准测试")
+    parser.add_argument("--num", type=int, default=20000, help="向量条数")
+    parser.add_argument("--dim", type=int, default=768, help="向量维度")
+    parser.add_argument("--queries", type=int, default=100, help="查询次数")
+    parser.add_argument("--k", type=int, default=4, help="每次返回条数")
+    parser.add_argument("--batch", type=int, default=1000, help="每批写入条数")
+    args = parser.parse_args()
+
+    import numpy as np
+    rng = np.random.default_rng(42)
+    vectors = rng.standard_normal((args.num, args.dim), dtype=np.float32).tolist()
+    queries = rng.standard_normal((args.queries, args.dim), dtype=np.float32).tolist()
+
+    workdir = tempfile.mkdtemp(prefix="bench_vs_")
+    try:
+        bench_local(vectors, queries, args.k, workdir, args.batch)
+        bench_chroma(vectors, queries, args.k, workdir, args.batch)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
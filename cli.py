@@ -0,0 +1,116 @@
+# cli.py
+# -*- coding: utf-8 -*-
+"""
+无界面批量生成入口（不导入 tkinter / customtkinter），适合在服务器上并行跑多部小说：
+
+    python cli.py --config config.json --project ./novels/book1 --steps all --from 1 --to 20
+
+进度以 JSON Lines 输出到标准输出（每行一个事件），日志输出到标准错误。
+"""
+import sys
+import json
+import time
+import logging
+import argparse
+import threading
+
+from config_manager import load_config
+from novel_generator.runner import (
+    STEP_ARCHITECTURE,
+    STEP_BLUEPRINT,
+    STEP_CONSISTENCY,
+    STEP_DRAFT,
+    STEP_FINALIZE,
+    resolve_run_settings,
+    run_pipeline
+)
+
+ALL_STEPS = [STEP_ARCHITECTURE, STEP_BLUEPRINT, STEP_DRAFT, STEP_FINALIZE]
+KNOWN_STEPS = ALL_STEPS + [STEP_CONSISTENCY]
+STEP_ALIASES = {"all": ALL_STEPS, "chapters": [STEP_DRAFT, STEP_FINALIZE]}
+
+
+def parse_steps(value: str):
+    steps = []
+    for name in value.split(","):
+        name = name.strip()
+        if not name:
+            continue
+        expanded = STEP_ALIASES.get(name, [name])
+        for step in expanded:
+            if step not in KNOWN_STEPS:
+                raise argparse.ArgumentTypeError(f"未知步骤: {step}")
+            if step not in steps:
+                steps.append(step)
+    return steps
+
+
+_emit_lock = threading.Lock()
+
+
+def emit_json(event: dict):
+    line = json.dumps(dict(event, ts=round(time.time(), 3)), ensure_ascii=False) + "\n"
+    # 并发执行的节点会同时上报进度，加锁保证每行完整
+    with _emit_lock:
+        sys.stdout.write(line)
+        sys.stdout.flush()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="AI 小说生成器命令行批量入口")
+    parser.add_argument("--config", default="config.json", help="配置文件路径（与 GUI 相同结构）")
+    parser.add_argument("--project", help="小说保存路径，默认取配置中的 other_params.filepath")
+    parser.add_argument("--steps", type=parse_steps, default=ALL_STEPS,
+                        help="逗号分隔：architecture,blueprint,draft,finalize,consistency；或 all / chapters")
+    parser.add_argument("--from", dest="chapter_start", type=int, default=1, help="起始章节号")
+    parser.add_argument("--to", dest="chapter_end", type=int, default=None, help="结束章节号（默认总章数）")
+    parser.add_argument("--topic", help="覆盖配置中的主题")
+    parser.add_argument("--genre", help="覆盖配置中的类型")
+    parser.add_argument("--num-chapters", type=int, help="覆盖配置中的总章数")
+    parser.add_argument("--word-number", type=int, help="覆盖配置中的每章字数")
+    parser.add_argument("--user-guidance", help="覆盖配置中的内容指导")
+    parser.add_argument("--skip-existing", action="store_true", help="架构/目录文件已存在时跳过对应步骤")
+    parser.add_argument("--keep-going", action="store_true", help="某一步失败后继续执行后续章节")
+    parser.add_argument("--pipeline", action="store_true", help="流水线模式：第 N 章定稿与第 N+1 章准备并行执行")
+    parser.add_argument("--parallel-blueprint", action="store_true", help="章节目录先生成骨架，再分块并行生成")
+    parser.add_argument("--no-resume", action="store_true", help="忽略步骤日志中的完成记录，全部重新生成")
+    parser.add_argument("--no-quality-gate", action="store_true", help="草稿生成后不做本地质量检查（见 draft_quality）")
+    parser.add_argument("--log-level", default="INFO", help="标准错误上的日志级别")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(stream=sys.stderr, level=getattr(logging, args.log_level.upper(), logging.INFO),
+                        format="%(asctime)s [%(levelname)s] %(message)s")
+
+    settings = resolve_run_settings(load_config(args.config), {
+        "filepath": args.project,
+        "topic": args.topic,
+        "genre": args.genre,
+        "num_chapters": args.num_chapters,
+        "word_number": args.word_number,
+        "user_guidance": args.user_guidance
+    })
+    if args.no_quality_gate:
+        settings["quality"]["enabled"] = False
+    emit_json({"event": "run_start", "project": settings["params"]["filepath"], "steps": args.steps,
+               "from": args.chapter_start, "to": args.chapter_end or int(settings["params"]["num_chapters"])})
+    try:
+        result = run_pipeline(
+            settings,
+            args.steps,
+            chapter_start=args.chapter_start,
+            chapter_end=args.chapter_end,
+            emit=emit_json,
+            skip_existing=args.skip_existing,
+            stop_on_error=not args.keep_going,
+            pipelined=args.pipeline,
+            parallel_blueprint=args.parallel_blueprint,
+            resume=not args.no_resume
+        )
+    except Exception as e:
+        emit_json({"event": "run_failed", "error": str(e)})
+        return 2
+    return 0 if not result["failed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -35,15 +35,19 @@ def check_consistency(
     plot_arcs: str = "",
     interface_format: str = "OpenAI",
     max_tokens: int = 2048,
-    timeout: int = 600
+    timeout: int = 600,
+    characters_involved: str = ""
 ) -> str:
     """
     调用模型做简单的一致性检查。可扩展更多提示或校验规则。
     新增: 会额外检查对“未解决冲突或剧情要点”（plot_arcs）的衔接情况。
+    角色状态只保留 characters_involved 点名的角色、其一度关联角色以及在最新章节中出现的角色。
     """
+    # 延迟导入：novel_generator 包的导入较重，也避免与包内模块循环导入
+    from novel_generator.character_store import filter_character_state_text
     prompt = CONSISTENCY_PROMPT.format(
         novel_setting=novel_setting,
-        character_state=character_state,
+        character_state=filter_character_state_text(character_state, characters_involved, [chapter_text]),
         global_summary=global_summary,
         plot_arcs=plot_arcs,
         chapter_text=chapter_text
@@ -12,6 +12,8 @@ import requests
 import traceback
 import time
 
+from utils import provider_call_limit, provider_call_slot
+
 
 def check_base_url(url: str) -> str:
     """
@@ -365,6 +367,18 @@ class SiliconFlowAdapter(BaseLLMAdapter):
             logging.error(f"硅基流动API调用超时或失败: {e}")
             return ""
 
+class ProviderLimitedAdapter(BaseLLMAdapter):
+    """
+    按接口限制同时进行的调用数（上限见 utils.set_provider_call_limits），多个任务共用同一接口时不超出其配额。
+    """
+    def __init__(self, adapter: BaseLLMAdapter, provider: str):
+        self.adapter = adapter
+        self.provider = provider
+
+    def invoke(self, prompt: str) -> str:
+        with provider_call_slot(self.provider):
+            return self.adapter.invoke(prompt)
+
 def create_llm_adapter(
     interface_format: str,
     base_url: str,
@@ -373,6 +387,23 @@ def create_llm_adapter(
     temperature: float,
     max_tokens: int,
     timeout: int
+) -> BaseLLMAdapter:
+    """
+    工厂函数：根据 interface_format 返回不同的适配器实例；该接口设置了并发上限时包装为 ProviderLimitedAdapter。
+    """
+    adapter = _create_llm_adapter(interface_format, base_url, model_name, api_key, temperature, max_tokens, timeout)
+    if provider_call_limit(interface_format) is not None:
+        return ProviderLimitedAdapter(adapter, interface_format)
+    return adapter
+
+def _create_llm_adapter(
+    interface_format: str,
+    base_url: str,
+    model_name: str,
+    api_key: str,
+    temperature: float,
+    max_tokens: int,
+    timeout: int
 ) -> BaseLLMAdapter:
     """
     工厂函数：根据 interface_format 返回不同的适配器实例。
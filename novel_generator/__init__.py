@@ -10,4 +10,27 @@ from .chapter import (
 )
 from .finalization import finalize_chapter, enrich_chapter_text
 from .knowledge import import_knowledge_file
-from .vectorstore_utils import clear_vector_store
\ No newline at end of file
+from .vectorstore_utils import clear_vector_store
+from .local_vectorstore import LocalVectorStore, load_local_vector_store, open_local_vector_store, close_local_vector_store
+from .chapter_indexing import update_chapter_vector_store
+from .retrieval import hybrid_search, multi_query_search, parse_keyword_groups
+from .retrieval_cache import cached_multi_query_search, memoize_keywords, chapter_inputs_hash, invalidate_retrieval_cache
+from .context_prefilter import prefilter_retrieved_texts
+from .knowledge_stream import stream_import_knowledge_file
+from .knowledge_parallel import import_knowledge_directory
+from .text_splitter import ChineseSentenceSplitter, split_sentences
+from .metadata_index import build_metadata_filter, recent_chapters_filter
+from .vectorstore_scope import clear_vector_store_scope, list_knowledge_files
+from .task_graph import TaskGraph, failed_nodes
+from .finalize_graph import finalize_chapter_graph
+from .chapter_pipeline import run_chapters_pipelined, prepare_chapter_context, filter_chapter_context
+from .blueprint_parallel import Chapter_blueprint_generate_parallel
+from .architecture_graph import Novel_architecture_generate_graph
+from .step_journal import StepJournal
+from .summary_store import update_hierarchical_summary, build_summary_context, summary_context_for_chapter
+from .character_store import load_character_store, render_character_state, update_character_state_delta
+from .character_store import select_character_state, filter_character_state_text
+from .chapter_cache import get_chapter_cache, get_last_n_chapters_text_cached
+from .blueprint_index import BlueprintIndex, get_blueprint_index
+from .job_queue import JobQueue, JobWorkerPool
+from .draft_quality import validate_draft, ensure_draft_quality
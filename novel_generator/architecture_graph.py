@@ -0,0 +1,166 @@
+# novel_generator/architecture_graph.py
+# -*- coding: utf-8 -*-
+"""
+按真实输入依赖并发生成小说架构：
+
+    core_seed ──┬── character_dynamics ──┬── character_state
+                │                        │
+                └── world_building ──────┴── plot_architecture
+
+角色动力学与世界观只依赖核心种子，可同时生成；角色状态只依赖角色动力学，与情节架构并行。
+每个阶段完成后立即写入 partial_architecture.json，失败后重跑只生成缺失的阶段；
+主题、类型等输入变化后旧的检查点自动作废。
+"""
+import os
+import json
+import hashlib
+import logging
+import threading
+from typing import Callable, Dict
+
+from llm_adapters import create_llm_adapter
+from prompt_definitions import (
+    character_dynamics_prompt,
+    core_seed_prompt,
+    create_character_state_prompt,
+    plot_architecture_prompt,
+    world_building_prompt
+)
+from utils import read_file, save_data_to_json, save_string_to_txt
+from .task_graph import TaskGraph, failed_nodes
+
+ARCHITECTURE_CHECKPOINT = "partial_architecture.json"
+INPUTS_KEY = "inputs_hash"
+
+# 阶段名 -> (检查点中的字段名, 依赖的阶段)；字段名与原有 partial_architecture.json 保持一致
+STAGES = {
+    "core_seed": ("core_seed_result", []),
+    "character_dynamics": ("character_dynamics_result", ["core_seed"]),
+    "world_building": ("world_building_result", ["core_seed"]),
+    "character_state": ("character_state_result", ["character_dynamics"]),
+    "plot_architecture": ("plot_arch_result", ["core_seed", "character_dynamics", "world_building"]),
+}
+
+
+class _Checkpoint:
+    """partial_architecture.json 的线程安全读写，并发完成的阶段逐个落盘。"""
+    def __init__(self, filepath: str, inputs_hash: str):
+        self.path = os.path.join(filepath, ARCHITECTURE_CHECKPOINT)
+        self._lock = threading.Lock()
+        self.data = {}
+        content = read_file(self.path)
+        if content:
+            try:
+                self.data = json.loads(content)
+            except json.JSONDecodeError:
+                logging.warning(f"[architecture_graph] 检查点损坏，忽略: {self.path}")
+        if self.data.get(INPUTS_KEY) not in (None, inputs_hash):
+            logging.info("[architecture_graph] 架构输入已变化，丢弃旧检查点")
+            self.data = {}
+        self.data[INPUTS_KEY] = inputs_hash
+
+    def get(self, field: str) -> str:
+        return (self.data.get(field) or "").strip()
+
+    def set(self, field: str, value: str):
+        with self._lock:
+            self.data[field] = value
+            save_data_to_json(self.data, self.path)
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def Novel_architecture_generate_graph(
+    interface_format: str,
+    api_key: str,
+    base_url: str,
+    llm_model: str,
+    topic: str,
+    genre: str,
+    number_of_chapters: int,
+    word_number: int,
+    filepath: str,
+    user_guidance: str = "",
+    temperature: float = 0.7,
+    max_tokens: int = 2048,
+    timeout: int = 600,
+    retries: int = 1,
+    emit: Callable[[dict], None] = lambda event: None
+) -> Dict[str, dict]:
+    """
+    与 Novel_architecture_generate 参数一致的并发版本，生成 Novel_architecture.txt 与 character_state.txt。
+    返回各阶段的执行结果（见 TaskGraph.run）；有阶段失败时抛出 RuntimeError，已完成的阶段保留在检查点中。
+    """
+    os.makedirs(filepath, exist_ok=True)
+    llm_adapter = create_llm_adapter(
+        interface_format=interface_format,
+        base_url=base_url,
+        model_name=llm_model,
+        api_key=api_key,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        timeout=timeout
+    )
+    inputs_hash = hashlib.sha1(json.dumps(
+        [topic, genre, number_of_chapters, word_number, user_guidance], ensure_ascii=False).encode('utf-8')).hexdigest()
+    checkpoint = _Checkpoint(filepath, inputs_hash)
+
+    def build_prompt(stage: str, inputs: Dict[str, str]) -> str:
+        if stage == "core_seed":
+            return core_seed_prompt.format(topic=topic, genre=genre, number_of_chapters=number_of_chapters, word_number=word_number)
+        if stage == "character_dynamics":
+            return character_dynamics_prompt.format(core_seed=inputs["core_seed"], user_guidance=user_guidance)
+        if stage == "world_building":
+            return world_building_prompt.format(core_seed=inputs["core_seed"], user_guidance=user_guidance)
+        if stage == "character_state":
+            return create_character_state_prompt.format(character_dynamics=inputs["character_dynamics"])
+        return plot_architecture_prompt.format(
+            core_seed=inputs["core_seed"],
+            character_dynamics=inputs["character_dynamics"],
+            world_building=inputs["world_building"],
+            user_guidance=user_guidance
+        )
+
+    def stage_func(stage: str, field: str):
+        def run(inputs: Dict[str, str]) -> str:
+            cached = checkpoint.get(field)
+            if cached:
+                logging.info(f"[architecture_graph] 阶段 {stage} 使用检查点")
+                return cached
+            result = (llm_adapter.invoke(build_prompt(stage, inputs)) or "").strip()
+            if not result:
+                raise RuntimeError(f"架构阶段 {stage} 生成失败：LLM 返回为空")
+            checkpoint.set(field, result)
+            return result
+        return run
+
+    graph = TaskGraph("novel_architecture")
+    for stage, (field, deps) in STAGES.items():
+        graph.add(stage, stage_func(stage, field), deps=deps, retries=retries)
+    results = graph.run(emit=emit)
+    failed = failed_nodes(results)
+    if failed:
+        raise RuntimeError(f"小说架构生成失败的阶段: {failed}（已完成的阶段已保存，重新运行将从缺失的阶段继续）")
+
+    outputs = {stage: results[stage]["result"] for stage in STAGES}
+    save_string_to_txt(outputs["character_state"], os.path.join(filepath, "character_state.txt"))
+
+    final_content = (
+        "#=== 0) 小说设定 ===\n"
+        f"主题：{topic},类型：{genre},篇幅：约{number_of_chapters}章（每章{word_number}字）\n\n"
+        "#=== 1) 核心种子 ===\n"
+        f"{outputs['core_seed']}\n\n"
+        "#=== 2) 角色动力学 ===\n"
+        f"{outputs['character_dynamics']}\n\n"
+        "#=== 3) 世界观 ===\n"
+        f"{outputs['world_building']}\n\n"
+        "#=== 4) 三幕式情节架构 ===\n"
+        f"{outputs['plot_architecture']}\n"
+    )
+    save_string_to_txt(final_content, os.path.join(filepath, "Novel_architecture.txt"))
+    checkpoint.remove()
+    timing = ", ".join(f"{name} {r['seconds']:.1f}s" for name, r in results.items())
+    logging.info(f"[architecture_graph] 小说架构生成完成: {timing}")
+    return results
@@ -0,0 +1,295 @@
+# novel_generator/blueprint_index.py
+# -*- coding: utf-8 -*-
+"""
+章节目录（Novel_directory.txt）的解析索引：
+
+    第n章 - [标题]
+    本章定位：...
+    核心作用：...
+    悬念密度：...
+    伏笔操作：...
+    认知颠覆：...
+    本章简述：...
+
+- 按 "第n章" 标题切分为章节块，解析为以章节号为键的紧凑记录，查找为 O(1)；
+  以 "第n章" 开头的行只有在下一行是字段行、或章节号紧接上一章时才算标题（简述里换行写的 "第n章……" 不会被拆开）；
+- 缺少的字段取与原有目录解析相同的默认值（如本章定位默认为 "常规章节"）；
+- 以 (mtime_ns, size) 校验文件，未变化时不重新读取；变化后只重新解析内容有变动的章节块；
+- 格式问题（缺少字段、重复/缺失章节号、无法识别的行）记录在 problems 中而不是静默忽略；
+- 目录中可用单独一行 "第N卷 ..." 分卷，其后各章记录所属卷号（volume），未分卷时为 None。
+
+用法：python -m novel_generator.blueprint_index <小说保存路径>  输出章节数与格式问题。
+"""
+import os
+import re
+import sys
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from utils import read_file, save_string_to_txt
+
+BLUEPRINT_FILE = "Novel_directory.txt"
+FIELD_LABELS = {
+    "本章定位": "chapter_role",
+    "核心作用": "chapter_purpose",
+    "悬念密度": "suspense_level",
+    "伏笔操作": "foreshadowing",
+    "认知颠覆": "plot_twist_level",
+    "本章简述": "chapter_summary",
+}
+CHAPTER_INFO_FIELDS = ("chapter_title",) + tuple(FIELD_LABELS.values())
+FIELD_DEFAULTS = {
+    "chapter_role": "常规章节",
+    "chapter_purpose": "内容推进",
+    "suspense_level": "中等",
+    "foreshadowing": "无",
+    "plot_twist_level": "★☆☆☆☆",
+    "chapter_summary": "",
+}
+
+_HEADING_RE = re.compile(r'^[ \t*#]*第\s*(\d+)\s*章[ \t]*(?:[-－—:：][ \t]*)?(.*)$', re.MULTILINE)
+_VOLUME_RE = re.compile(r'^[ \t*#]*第\s*([一二两三四五六七八九十百\d]+)\s*卷[^。！？\n]{0,30}$', re.MULTILINE)
+_CN_DIGITS = {"零": 0, "一": 1, "二": 2, "两": 2, "三": 3, "四": 4, "五": 5, "六": 6, "七": 7, "八": 8, "九": 9}
+_FIELD_RE = re.compile(r'^\s*[*#]*\s*(' + "|".join(FIELD_LABELS) + r')\s*[*]*\s*[:：]\s*(.*)$')
+
+
+def _unwrap(value: str) -> str:
+    value = value.strip().strip("*").strip()
+    if len(value) >= 2 and value[0] in "[【《" and value[-1] in "]】》":
+        value = value[1:-1].strip()
+    return value
+
+
+def _parse_number(text: str) -> int:
+    """阿拉伯数字或一百以内的中文数字（如 "十二"、"一百零五"）。"""
+    if text.isdigit():
+        return int(text)
+    total, current = 0, 0
+    for ch in text:
+        if ch in _CN_DIGITS:
+            current = _CN_DIGITS[ch]
+        else:
+            total += (current or 1) * (100 if ch == "百" else 10)
+            current = 0
+    return total + current
+
+
+def empty_chapter_info(chapter_number: int) -> dict:
+    info = dict(FIELD_DEFAULTS)
+    info["chapter_number"] = chapter_number
+    info["chapter_title"] = f"第{chapter_number}章"
+    info["volume"] = None
+    return info
+
+
+def parse_block(block: str) -> Tuple[Optional[dict], List[str]]:
+    """解析单个章节块，返回 (记录或 None, 问题列表)。"""
+    lines = block.strip("\n").splitlines()
+    heading = _HEADING_RE.match(lines[0]) if lines else None
+    if heading is None:
+        return None, ["缺少 \"第n章\" 标题"]
+    problems = []
+    record = empty_chapter_info(int(heading.group(1)))
+    values = {}
+    title = _unwrap(heading.group(2))
+    if title:
+        record["chapter_title"] = title
+    else:
+        problems.append("缺少标题")
+    last_field = None
+    for line in lines[1:]:
+        if not line.strip() or _VOLUME_RE.match(line):
+            continue
+        match = _FIELD_RE.match(line)
+        if match:
+            last_field = FIELD_LABELS[match.group(1)]
+            values[last_field] = _unwrap(match.group(2))
+        elif last_field is not None:
+            # 字段值换行书写时并入上一个字段
+            values[last_field] = f"{values[last_field]}\n{line.strip()}".strip()
+        else:
+            problems.append(f"无法识别的行: {line.strip()[:30]}")
+    missing = [label for label, field in FIELD_LABELS.items() if not values.get(field)]
+    if missing:
+        problems.append(f"缺少字段: {'、'.join(missing)}")
+    record.update({field: value for field, value in values.items() if value})
+    return record, problems
+
+
+def heading_number(block: str) -> Optional[int]:
+    """章节块标题中的章节号；块不以 "第n章" 标题开头时返回 None。"""
+    heading = _HEADING_RE.match(block.lstrip("\n"))
+    return int(heading.group(1)) if heading else None
+
+
+def _followed_by_field(text: str, pos: int) -> bool:
+    for line in text[pos:].splitlines():
+        if line.strip():
+            return bool(_FIELD_RE.match(line))
+    return False
+
+
+def split_blocks(text: str) -> Tuple[str, List[Tuple[int, int, str]]]:
+    """
+    返回 (首个标题之前的内容, [(起始偏移, 结束偏移, 块文本), ...])。
+    以 "第n章" 开头的行在下一个非空行是字段行时算作标题；没有字段跟随时，只有第一个标题或章节号
+    紧接上一个标题时才算（缺少全部字段的章节仍会被切出并报告），否则视为上一章字段值的一部分。
+    章节块在其后的 "第N卷" 分卷行之前结束，分卷行不属于任何章节块。
+    """
+    starts = []
+    previous = None
+    for match in _HEADING_RE.finditer(text):
+        number = int(match.group(1))
+        if _followed_by_field(text, match.end()) or previous is None or number == previous + 1:
+            starts.append(match.start())
+            previous = number
+    preamble = text[:starts[0]] if starts else text
+    volume_starts = [match.start() for match in _VOLUME_RE.finditer(text)]
+    blocks = []
+    for i, start in enumerate(starts):
+        end = starts[i + 1] if i + 1 < len(starts) else len(text)
+        end = min([v for v in volume_starts if start < v < end] + [end])
+        blocks.append((start, end, text[start:end]))
+    return preamble, blocks
+
+
+def volume_marks(text: str) -> List[Tuple[int, int]]:
+    """目录中的分卷行 [(偏移, 卷号), ...]，按偏移排序。"""
+    return [(match.start(), _parse_number(match.group(1))) for match in _VOLUME_RE.finditer(text)]
+
+
+class BlueprintIndex:
+    def __init__(self, filepath: str):
+        self.path = os.path.join(filepath, BLUEPRINT_FILE)
+        self._lock = threading.RLock()
+        self._stat = None
+        self._text = ""
+        self._records: Dict[int, dict] = {}
+        self._spans: Dict[int, Tuple[int, int]] = {}
+        self._block_cache: Dict[str, Tuple[Optional[dict], List[str]]] = {}
+        self.problems: List[dict] = []
+        self.reparsed_blocks = 0
+
+    def _current_stat(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def refresh(self) -> bool:
+        """文件变化时重新索引（只解析内容变动过的章节块），返回是否重新索引。"""
+        with self._lock:
+            stat = self._current_stat()
+            if stat == self._stat and (stat is not None or not self._records):
+                return False
+            self._reindex(read_file(self.path) if stat is not None else "")
+            self._stat = stat
+            return True
+
+    def _reindex(self, text: str):
+        preamble, blocks = split_blocks(text)
+        records, spans, problems, cache = {}, {}, [], {}
+        reparsed = 0
+        volumes = volume_marks(text)
+        if _VOLUME_RE.sub("", preamble).strip():
+            problems.append({"chapter": None, "problem": f"首个章节标题之前有无法识别的内容: {preamble.strip()[:30]}"})
+        for start, end, block in blocks:
+            key = block.strip()
+            parsed = self._block_cache.get(key)
+            if parsed is None:
+                parsed = parse_block(block)
+                reparsed += 1
+            cache[key] = parsed
+            record, block_problems = parsed
+            number = record["chapter_number"] if record else None
+            if record is not None:
+                # 卷号取决于块在目录中的位置，不进入按块文本共享的解析缓存
+                record = dict(record, volume=next((v for offset, v in reversed(volumes) if offset < start), None))
+            problems.extend({"chapter": number, "problem": p} for p in block_problems)
+            if record is None:
+                continue
+            if number in records:
+                problems.append({"chapter": number, "problem": "章节号重复，保留第一次出现的内容"})
+                continue
+            records[number] = record
+            spans[number] = (start, end)
+        if records:
+            gaps = [n for n in range(1, max(records) + 1) if n not in records]
+            if gaps:
+                problems.append({"chapter": None, "problem": f"缺少章节: {gaps}"})
+        self._text, self._records, self._spans, self._block_cache = text, records, spans, cache
+        self.problems = problems
+        self.reparsed_blocks = reparsed
+
+    def chapter_info(self, chapter_number: int) -> dict:
+        """章节元数据（与 get_chapter_info_from_blueprint 的字段一致）；目录中没有该章时返回默认值。"""
+        self.refresh()
+        with self._lock:
+            record = self._records.get(chapter_number)
+            return dict(record) if record else empty_chapter_info(chapter_number)
+
+    def volume_of(self, chapter_number: int) -> Optional[int]:
+        """章节所属卷号；目录未分卷或没有该章时返回 None。"""
+        return self.chapter_info(chapter_number)["volume"]
+
+    def chapter_numbers(self) -> List[int]:
+        self.refresh()
+        with self._lock:
+            return sorted(self._records)
+
+    def block_text(self, chapter_number: int) -> str:
+        self.refresh()
+        with self._lock:
+            span = self._spans.get(chapter_number)
+            return self._text[span[0]:span[1]].strip() if span else ""
+
+    def update_block(self, chapter_number: int, block_text: str):
+        """替换（或按章节顺序插入）某一章的目录块并写回文件；其余章节块不重新解析。"""
+        with self._lock:
+            self.refresh()
+            block = block_text.strip() + "\n\n"
+            span = self._spans.get(chapter_number)
+            later = [self._spans[n][0] for n in self._spans if n > chapter_number]
+            if span:
+                text = self._text[:span[0]] + block + self._text[span[1]:]
+            elif later:
+                # 新章节插入到下一个更大章节号之前，保持目录按章节顺序
+                text = self._text[:min(later)] + block + self._text[min(later):]
+            else:
+                text = self._text.rstrip("\n") + ("\n\n" if self._text.strip() else "") + block
+            save_string_to_txt(text.rstrip("\n") + "\n", self.path)
+            self.refresh()
+
+    def report(self) -> str:
+        self.refresh()
+        lines = [f"{BLUEPRINT_FILE}: {len(self._records)} 章，{len(self.problems)} 处格式问题"]
+        for problem in self.problems:
+            prefix = f"第{problem['chapter']}章" if problem["chapter"] is not None else "全局"
+            lines.append(f"  {prefix}: {problem['problem']}")
+        return "\n".join(lines)
+
+
+_indexes: Dict[str, BlueprintIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_blueprint_index(filepath: str) -> BlueprintIndex:
+    """进程内按项目共享的目录索引。"""
+    key = os.path.abspath(filepath)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = _indexes[key] = BlueprintIndex(filepath)
+        return index
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="章节目录格式检查")
+    parser.add_argument("filepath", help="小说项目保存路径")
+    args = parser.parse_args()
+    index = get_blueprint_index(args.filepath)
+    print(index.report())
+    sys.exit(1 if index.problems else 0)
@@ -0,0 +1,232 @@
+# novel_generator/blueprint_parallel.py
+# -*- coding: utf-8 -*-
+"""
+分块并行生成章节目录：
+1. 骨架：一次调用为每个章节区间生成阶段目标与首末章一句话概要；
+2. 分块：各区间只以骨架和相邻区间的首末章概要为锚点，互不依赖，并发生成；
+3. 拼接校验：按章节号检查缺失/重复/越界，不合格的区间单独重生成，最后按序写入 Novel_directory.txt。
+骨架与每个区间的结果保存在 blueprint_chunks/ 下，中断后重跑只生成缺失的区间。
+总耗时约等于 骨架 + 最慢的一批分块，而不再随区间数线性（且提示词长度平方）增长。
+"""
+import os
+import re
+import json
+import hashlib
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from llm_adapters import create_llm_adapter
+from prompt_definitions import chapter_blueprint_skeleton_prompt, chunked_chapter_blueprint_from_skeleton_prompt
+from utils import read_file, save_string_to_txt
+from .blueprint_index import heading_number, split_blocks
+from .task_graph import TaskGraph, failed_nodes
+
+TOKENS_PER_CHAPTER = 200
+DEFAULT_MAX_WORKERS = 4
+MAX_REPAIR_ROUNDS = 2
+
+_SKELETON_EDGE_RE = re.compile(r'^\s*(?:首章|末章)\s*第\s*(\d+)\s*章\s*[:：]\s*(.+)$', re.MULTILINE)
+
+
+def compute_chunk_size(number_of_chapters: int, max_tokens: int) -> int:
+    """单次输出能容纳的章节数，按 10 章取整，至少 10 章（总章数更少时取总章数）。"""
+    fit = max(10, (max_tokens // TOKENS_PER_CHAPTER) // 10 * 10)
+    return max(1, min(number_of_chapters, fit))
+
+
+def chunk_ranges(number_of_chapters: int, chunk_size: int) -> List[Tuple[int, int]]:
+    return [(n, min(n + chunk_size - 1, number_of_chapters)) for n in range(1, number_of_chapters + 1, chunk_size)]
+
+
+def split_chapters(text: str) -> Dict[int, str]:
+    """按 "第n章" 标题（判定规则同 blueprint_index.split_blocks）把目录文本拆成 {章节号: 该章文本}；重复的章节号保留第一次出现。"""
+    result: Dict[int, str] = {}
+    for _, _, block in split_blocks(text)[1]:
+        number = heading_number(block)
+        if number is not None and number not in result:
+            result[number] = block.strip()
+    return result
+
+
+def parse_skeleton_edges(skeleton: str) -> Dict[int, str]:
+    """骨架中各区间首末章的一句话概要 {章节号: 概要}。"""
+    return {int(m.group(1)): m.group(2).strip() for m in _SKELETON_EDGE_RE.finditer(skeleton)}
+
+
+def validate_chunk(text: str, start: int, end: int) -> List[str]:
+    """返回区间输出的问题列表（为空表示合格）。"""
+    chapters = split_chapters(text)
+    problems = []
+    missing = [n for n in range(start, end + 1) if n not in chapters]
+    extra = sorted(n for n in chapters if n < start or n > end)
+    if missing:
+        problems.append(f"缺少章节 {missing}")
+    if extra:
+        problems.append(f"越界章节 {extra}")
+    return problems
+
+
+class _ChunkCache:
+    """blueprint_chunks/ 下的骨架与区间结果；架构、指导或分块方式变化后旧结果自动失效。"""
+    def __init__(self, filepath: str, key: str):
+        self.dir = os.path.join(filepath, "blueprint_chunks")
+        self.key = key
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.dir, f"{name}.json")
+
+    def load(self, name: str) -> Optional[str]:
+        content = read_file(self._path(name))
+        if not content:
+            return None
+        try:
+            data = json.loads(content)
+        except json.JSONDecodeError:
+            return None
+        return data.get("text") if data.get("key") == self.key else None
+
+    def save(self, name: str, text: str):
+        os.makedirs(self.dir, exist_ok=True)
+        save_string_to_txt(json.dumps({"key": self.key, "text": text}, ensure_ascii=False), self._path(name))
+
+    def discard(self, name: str):
+        try:
+            os.remove(self._path(name))
+        except FileNotFoundError:
+            pass
+
+
+def _chunk_name(start: int, end: int) -> str:
+    return f"chunk_{start}_{end}"
+
+
+def Chapter_blueprint_generate_parallel(
+    interface_format: str,
+    api_key: str,
+    base_url: str,
+    llm_model: str,
+    filepath: str,
+    number_of_chapters: int,
+    user_guidance: str = "",
+    temperature: float = 0.7,
+    max_tokens: int = 4096,
+    timeout: int = 600,
+    chunk_size: Optional[int] = None,
+    max_workers: int = DEFAULT_MAX_WORKERS
+) -> Dict[str, object]:
+    """
+    与 Chapter_blueprint_generate 参数一致的并行版本，生成 Novel_directory.txt。
+    修复后仍有缺失章节时抛出 RuntimeError，不写入目录文件。
+    返回 {"chunks": 区间数, "generated": 本次实际生成的区间数, "repaired": 校验后重生成的区间数}。
+    """
+    architecture_text = read_file(os.path.join(filepath, "Novel_architecture.txt")).strip()
+    if not architecture_text:
+        raise ValueError("Novel_architecture.txt 不存在或为空，请先生成小说架构。")
+
+    llm_adapter = create_llm_adapter(
+        interface_format=interface_format,
+        base_url=base_url,
+        model_name=llm_model,
+        api_key=api_key,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        timeout=timeout
+    )
+    ranges = chunk_ranges(number_of_chapters, chunk_size or compute_chunk_size(number_of_chapters, max_tokens))
+
+    cache_key = hashlib.sha1("|".join([architecture_text, user_guidance, str(number_of_chapters), repr(ranges)]).encode('utf-8')).hexdigest()
+    cache = _ChunkCache(filepath, cache_key)
+    skeleton = cache.load("skeleton")
+    if skeleton is None:
+        skeleton = (llm_adapter.invoke(chapter_blueprint_skeleton_prompt.format(
+            user_guidance=user_guidance,
+            novel_architecture=architecture_text,
+            number_of_chapters=number_of_chapters,
+            chunk_ranges="\n".join(f"第{start}-{end}章" for start, end in ranges)
+        )) or "").strip()
+        if not skeleton:
+            raise RuntimeError("章节骨架生成失败：LLM 返回为空")
+        cache.save("skeleton", skeleton)
+    edges = parse_skeleton_edges(skeleton)
+    stats = {"chunks": len(ranges), "generated": 0, "repaired": 0}
+
+    def generate(start: int, end: int, problems: Optional[List[str]] = None) -> str:
+        prompt = chunked_chapter_blueprint_from_skeleton_prompt.format(
+            user_guidance=user_guidance,
+            novel_architecture=architecture_text,
+            skeleton=skeleton,
+            prev_chapter=start - 1 if start > 1 else "无",
+            prev_summary=edges.get(start - 1, "（全书开篇）" if start == 1 else "（见骨架）"),
+            next_chapter=end + 1 if end < number_of_chapters else "无",
+            next_summary=edges.get(end + 1, "（全书结尾）" if end == number_of_chapters else "（见骨架）"),
+            n=start,
+            m=end,
+            number_of_chapters=number_of_chapters
+        )
+        if problems:
+            prompt += f"\n上一次输出存在问题：{'；'.join(problems)}，请修正。\n"
+        text = (llm_adapter.invoke(prompt) or "").strip()
+        if not text:
+            raise RuntimeError(f"第{start}-{end}章目录生成失败：LLM 返回为空")
+        return text
+
+    chunk_texts: Dict[Tuple[int, int], str] = {}
+    graph = TaskGraph("chapter_blueprint")
+
+    def node(start: int, end: int):
+        def run(_inputs) -> str:
+            text = generate(start, end)
+            cache.save(_chunk_name(start, end), text)
+            return text
+        return run
+
+    for start, end in ranges:
+        cached = cache.load(_chunk_name(start, end))
+        if cached is not None:
+            chunk_texts[(start, end)] = cached
+        else:
+            graph.add(_chunk_name(start, end), node(start, end), retries=1)
+    if graph.nodes:
+        results = graph.run(max_workers=max_workers)
+        failed = failed_nodes(results)
+        if failed:
+            raise RuntimeError(f"章节目录分块生成失败: {failed}（已完成的分块已保存，重新运行将只生成失败的分块）")
+        for name, result in results.items():
+            _, start, end = name.split("_")
+            chunk_texts[(int(start), int(end))] = result["result"]
+        stats["generated"] = len(results)
+
+    # 拼接前校验：缺章/越界的区间带着问题描述重生成
+    for _ in range(MAX_REPAIR_ROUNDS):
+        bad = {r: validate_chunk(chunk_texts[r], *r) for r in ranges}
+        bad = {r: problems for r, problems in bad.items() if problems}
+        if not bad:
+            break
+        logging.warning(f"[Chapter_blueprint_generate_parallel] 校验未通过的区间: {bad}")
+        repair = TaskGraph("chapter_blueprint_repair")
+        for (start, end), problems in bad.items():
+            repair.add(_chunk_name(start, end), lambda _inputs, s=start, e=end, p=problems: generate(s, e, p), retries=1)
+        for name, result in repair.run(max_workers=max_workers).items():
+            if result["status"] == "done":
+                _, start, end = name.split("_")
+                chunk_texts[(int(start), int(end))] = result["result"]
+                cache.save(name, result["result"])
+                stats["repaired"] += 1
+
+    chapters: Dict[int, str] = {}
+    for start, end in ranges:
+        for number, text in split_chapters(chunk_texts[(start, end)]).items():
+            if start <= number <= end:
+                chapters[number] = text
+    missing = [n for n in range(1, number_of_chapters + 1) if n not in chapters]
+    if missing:
+        # 不写入残缺的目录；丢弃不合格区间的缓存，重新运行时只重新生成这些区间
+        broken = [r for r in ranges if any(r[0] <= n <= r[1] for n in missing)]
+        for start, end in broken:
+            cache.discard(_chunk_name(start, end))
+        raise RuntimeError(f"章节目录修复 {MAX_REPAIR_ROUNDS} 轮后仍缺少章节 {missing}"
+                           f"（区间 {broken} 将在重新运行时重新生成，其余区间已保存）")
+
+    save_string_to_txt("\n\n".join(chapters[n] for n in sorted(chapters)), os.path.join(filepath, "Novel_directory.txt"))
+    logging.info(f"[Chapter_blueprint_generate_parallel] 目录生成完成: {stats}")
+    return stats
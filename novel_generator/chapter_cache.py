@@ -0,0 +1,147 @@
+# novel_generator/chapter_cache.py
+# -*- coding: utf-8 -*-
+"""
+按项目缓存章节文件（<filepath>/chapters/chapter_N.txt）：
+- 全文缓存在内存中，以 (mtime_ns, size) 校验，文件被改写（例如界面中保存、定稿扩写）后自动重新读取；
+- 只需要结尾片段时（上一章结尾、最近几章的末尾）从文件尾部读取，不读全文；
+- 每章字数记录在 chapters/.chapter_index.json 中，界面刷新章节列表时无需读取正文。
+"""
+import os
+import json
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from utils import read_file, read_file_tail, save_data_to_json
+
+INDEX_FILE = ".chapter_index.json"
+MAX_CACHED_CHAPTERS = 64
+
+
+def _stat_key(path: str):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+class ChapterCache:
+    def __init__(self, chapters_dir: str, max_cached: int = MAX_CACHED_CHAPTERS):
+        self.chapters_dir = chapters_dir
+        self.max_cached = max_cached
+        self._lock = threading.Lock()
+        self._texts: "OrderedDict[int, tuple]" = OrderedDict()  # 章节号 -> (stat_key, 全文)
+        self._index: Dict[str, dict] = {}                          # "N" -> {"mtime_ns", "size", "chars"}
+        self._index_dirty = False
+        content = read_file(os.path.join(chapters_dir, INDEX_FILE))
+        if content:
+            try:
+                self._index = json.loads(content)
+            except json.JSONDecodeError:
+                logging.warning(f"[chapter_cache] 章节索引损坏，将重新统计: {chapters_dir}")
+
+    def chapter_path(self, chapter_number: int) -> str:
+        return os.path.join(self.chapters_dir, f"chapter_{chapter_number}.txt")
+
+    def _record(self, chapter_number: int, key, text: str):
+        entry = {"mtime_ns": key[0], "size": key[1], "chars": len(text)}
+        if self._index.get(str(chapter_number)) != entry:
+            self._index[str(chapter_number)] = entry
+            self._index_dirty = True
+
+    def read(self, chapter_number: int) -> str:
+        """章节全文；文件不存在时返回空串。"""
+        path = self.chapter_path(chapter_number)
+        key = _stat_key(path)
+        if key is None:
+            with self._lock:
+                self._texts.pop(chapter_number, None)
+            return ""
+        with self._lock:
+            cached = self._texts.get(chapter_number)
+            if cached is not None and cached[0] == key:
+                self._texts.move_to_end(chapter_number)
+                return cached[1]
+        text = read_file(path)
+        with self._lock:
+            self._texts[chapter_number] = (key, text)
+            self._texts.move_to_end(chapter_number)
+            while len(self._texts) > self.max_cached:
+                self._texts.popitem(last=False)
+            self._record(chapter_number, key, text)
+        return text
+
+    def tail(self, chapter_number: int, max_chars: int) -> str:
+        """章节末尾 max_chars 个字符；全文已在缓存中时直接截取，否则只从文件尾部读取。"""
+        path = self.chapter_path(chapter_number)
+        key = _stat_key(path)
+        if key is None:
+            return ""
+        with self._lock:
+            cached = self._texts.get(chapter_number)
+            if cached is not None and cached[0] == key:
+                return cached[1][-max_chars:]
+        return read_file_tail(path, max_chars)
+
+    def char_count(self, chapter_number: int) -> int:
+        """章节字数；索引中记录的 mtime/size 与文件一致时不读取正文。"""
+        key = _stat_key(self.chapter_path(chapter_number))
+        if key is None:
+            return 0
+        with self._lock:
+            entry = self._index.get(str(chapter_number))
+        if entry and (entry["mtime_ns"], entry["size"]) == key:
+            return entry["chars"]
+        return len(self.read(chapter_number))
+
+    def char_counts(self) -> Dict[int, int]:
+        """目录中全部章节的字数，并把新统计的结果写回索引文件。"""
+        counts = {}
+        if os.path.isdir(self.chapters_dir):
+            for name in os.listdir(self.chapters_dir):
+                if name.startswith("chapter_") and name.endswith(".txt"):
+                    number = name[len("chapter_"):-len(".txt")]
+                    if number.isdigit():
+                        counts[int(number)] = self.char_count(int(number))
+        self.flush()
+        return dict(sorted(counts.items()))
+
+    def last_n_texts(self, current_chapter: int, n: int = 3, tail_chars: Optional[int] = None) -> List[str]:
+        """
+        第 current_chapter 章之前最多 n 章的正文（按章节顺序，缺失的章节为空串），
+        与 get_last_n_chapters_text 的返回一致；给定 tail_chars 时每章只取结尾部分。
+        """
+        texts = []
+        for number in range(max(1, current_chapter - n), current_chapter):
+            text = self.tail(number, tail_chars) if tail_chars else self.read(number)
+            texts.append(text.strip())
+        return texts
+
+    def flush(self):
+        with self._lock:
+            if not self._index_dirty or not os.path.isdir(self.chapters_dir):
+                return
+            index = dict(self._index)
+            self._index_dirty = False
+        save_data_to_json(index, os.path.join(self.chapters_dir, INDEX_FILE))
+
+
+_caches: Dict[str, ChapterCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_chapter_cache(chapters_dir: str) -> ChapterCache:
+    """进程内按目录共享的章节缓存。"""
+    key = os.path.abspath(chapters_dir)
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            cache = _caches[key] = ChapterCache(chapters_dir)
+        return cache
+
+
+def get_last_n_chapters_text_cached(chapters_dir: str, current_chapter_num: int, n: int = 3) -> List[str]:
+    """get_last_n_chapters_text 的缓存版本，参数与返回值相同。"""
+    return get_chapter_cache(chapters_dir).last_n_texts(current_chapter_num, n)
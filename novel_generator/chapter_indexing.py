@@ -0,0 +1,177 @@
+# novel_generator/chapter_indexing.py
+# -*- coding: utf-8 -*-
+"""
+定稿章节的增量向量化：
+- 以段落为单位进行内容定义切块 (content-defined chunking)，局部修改只影响附近的切块；
+- 每个切块按内容哈希生成 id，重复定稿时只对新增/变化的切块做 embedding，并删除失效切块；
+- 每章的切块清单 (manifest) 保存在向量库目录的 manifests/ 下；
+- 切块带 source/chapter/volume/characters 元数据，供检索时按来源、章节范围、卷与人物预过滤。
+"""
+import os
+import json
+import time
+import hashlib
+import logging
+from typing import Callable, Dict, List, Optional, Sequence
+
+from .local_vectorstore import LocalVectorStore, get_local_vectorstore_dir, open_local_vector_store
+from .metadata_index import SOURCE_CHAPTER
+from .text_splitter import ChineseSentenceSplitter
+
+CHUNK_MIN_CHARS = 200
+CHUNK_TARGET_CHARS = 500
+CHUNK_MAX_CHARS = 1200
+# 段落哈希满足 hash % BOUNDARY_DIVISOR == 0 时在该段落后切分
+BOUNDARY_DIVISOR = 4
+
+
+def chunk_hash(text: str) -> str:
+    """切块内容哈希（去除首尾空白后计算）。"""
+    return hashlib.sha1(text.strip().encode('utf-8')).hexdigest()
+
+
+def _is_boundary(paragraph: str) -> bool:
+    digest = hashlib.md5(paragraph.encode('utf-8')).digest()
+    return digest[0] % BOUNDARY_DIVISOR == 0
+
+
+def split_chapter_for_index(chapter_text: str) -> List[str]:
+    """
+    按段落切块。切点由段落内容本身决定（内容哈希 + 长度上下限），
+    因此修改某一段只会改变它所在的切块，后面的切块在下一个内容切点处重新对齐。
+    """
+    paragraphs = [p.strip() for p in chapter_text.splitlines() if p.strip()]
+    chunks: List[str] = []
+    current: List[str] = []
+    current_len = 0
+    long_splitter = ChineseSentenceSplitter(CHUNK_TARGET_CHARS, 0)
+    for para in paragraphs:
+        # 超长段落单独按句子切分，不在句中截断
+        if len(para) > CHUNK_MAX_CHARS:
+            if current:
+                chunks.append("\n".join(current))
+                current, current_len = [], 0
+            chunks.extend(long_splitter.split_text(para))
+            continue
+        if current and current_len + len(para) > CHUNK_MAX_CHARS:
+            chunks.append("\n".join(current))
+            current, current_len = [], 0
+        current.append(para)
+        current_len += len(para)
+        if current_len >= CHUNK_TARGET_CHARS or (current_len >= CHUNK_MIN_CHARS and _is_boundary(para)):
+            chunks.append("\n".join(current))
+            current, current_len = [], 0
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+def tag_characters(text: str, character_names: Optional[Sequence[str]]) -> List[str]:
+    """返回在 text 中出现过的人物名（保持 character_names 的顺序）。"""
+    return [name for name in (character_names or []) if name and name in text]
+
+
+def get_manifest_dir(filepath: str) -> str:
+    return os.path.join(get_local_vectorstore_dir(filepath), "manifests")
+
+
+def load_chapter_manifest(filepath: str, chapter_number: int) -> dict:
+    path = os.path.join(get_manifest_dir(filepath), f"chapter_{chapter_number}.json")
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        logging.warning(f"[chapter_indexing] 读取第{chapter_number}章切块清单失败，将视为首次定稿: {e}")
+        return {}
+
+
+def save_chapter_manifest(filepath: str, chapter_number: int, manifest: dict):
+    manifest_dir = get_manifest_dir(filepath)
+    os.makedirs(manifest_dir, exist_ok=True)
+    path = os.path.join(manifest_dir, f"chapter_{chapter_number}.json")
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def upsert_chapter_chunks(
+    store: LocalVectorStore,
+    filepath: str,
+    chapter_number: int,
+    chunks: List[str],
+    extra_metadata: Optional[dict] = None,
+    character_names: Optional[Sequence[str]] = None
+) -> Dict[str, int]:
+    """
+    将章节切块与上次定稿的清单比对，只写入变化的切块、删除失效切块。
+    内容未变但元数据（卷号、出场人物）变化的切块复用已存向量重写元数据，不重新 embedding。
+    返回 {"added": x, "deleted": y, "unchanged": z, "retagged": w}。
+    """
+    old_manifest = load_chapter_manifest(filepath, chapter_number)
+    old_ids = {c["id"] for c in old_manifest.get("chunks", [])}
+
+    entries = []
+    seen = set()
+    for index, text in enumerate(chunks):
+        if not text.strip():
+            continue
+        h = chunk_hash(text)
+        doc_id = f"chapter_{chapter_number}_{h[:16]}"
+        if doc_id in seen:
+            continue
+        seen.add(doc_id)
+        entries.append({"id": doc_id, "hash": h, "index": index, "text": text})
+
+    for e in entries:
+        meta = {"source": SOURCE_CHAPTER, "chapter": chapter_number, "chunk_index": e["index"], "chunk_hash": e["hash"]}
+        if character_names is not None:
+            meta["characters"] = tag_characters(e["text"], character_names)
+        if extra_metadata:
+            meta.update(extra_metadata)
+        e["metadata"] = meta
+
+    # 清单中有但库里已不存在的（例如被清空过）也需要重新写入
+    existing = store.get(ids=[e["id"] for e in entries])
+    present = dict(zip(existing["ids"], existing["metadatas"]))
+    to_add = [e for e in entries if e["id"] not in present]
+    to_retag = [e for e in entries if e["id"] in present and present[e["id"]] != e["metadata"]]
+    orphan_ids = sorted(old_ids - seen)
+
+    deleted = store.delete(orphan_ids) if orphan_ids else 0
+    if to_add:
+        store.add_texts([e["text"] for e in to_add], metadatas=[e["metadata"] for e in to_add], ids=[e["id"] for e in to_add])
+    if to_retag:
+        vectors = store.get_vectors([e["id"] for e in to_retag])
+        store.add_texts([e["text"] for e in to_retag], metadatas=[e["metadata"] for e in to_retag],
+                        ids=[e["id"] for e in to_retag], embeddings=[vectors[e["id"]].tolist() for e in to_retag])
+
+    save_chapter_manifest(filepath, chapter_number, {
+        "chapter": chapter_number,
+        "updated_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "chunks": [{"id": e["id"], "hash": e["hash"], "index": e["index"]} for e in entries]
+    })
+    return {"added": len(to_add), "deleted": deleted, "unchanged": len(entries) - len(to_add), "retagged": len(to_retag)}
+
+
+def update_chapter_vector_store(
+    embedding_adapter,
+    chapter_text: str,
+    filepath: str,
+    chapter_number: int,
+    split_func: Callable[[str], List[str]] = split_chapter_for_index,
+    volume: Optional[int] = None,
+    character_names: Optional[Sequence[str]] = None
+) -> Dict[str, int]:
+    """
+    finalize_chapter 使用的增量更新入口：重复定稿同一章时只 embedding 改动过的切块。
+    :param volume: 所属卷号（可选），写入切块元数据
+    :param character_names: 已知人物名（可选），切块中出现的人物写入 characters 元数据
+    """
+    store = open_local_vector_store(filepath, embedding_adapter)
+    extra_metadata = {"volume": volume} if volume is not None else None
+    stats = upsert_chapter_chunks(store, filepath, chapter_number, split_func(chapter_text), extra_metadata, character_names)
+    logging.info(f"[update_chapter_vector_store] 第{chapter_number}章向量更新: 新增{stats['added']}，删除{stats['deleted']}，未变{stats['unchanged']}")
+    return stats
@@ -0,0 +1,316 @@
+# novel_generator/chapter_pipeline.py
+# -*- coding: utf-8 -*-
+"""
+流水线式的连续章节生成：第 N 章定稿与第 N+1 章的准备工作重叠执行。
+
+草稿提示词里「前文摘要」「角色状态」依赖上一章的定稿结果；
+当前章节摘要、检索关键词与知识检索只依赖前几章正文和章节目录，
+因此拆成两类节点：
+
+    draft(N) ──┬── finalize(N) ──────────┐
+               └── prep(N+1) ────────────┴── draft(N+1) ── ...
+
+prep 节点记录它读取过的输入文件指纹；draft 节点使用前重新校验，
+若输入在此期间被修改（例如定稿时扩写了上一章正文），则重新执行 prep。
+检索结果的本地预过滤要剔除与前文摘要重合的片段，而前文摘要正由上一章定稿改写，
+因此预过滤与随后的知识过滤调用放在 draft 节点中执行（见 filter_chapter_context）。
+传入步骤日志时，draft / finalize 的执行记入日志，已完成的章节在重跑时跳过（prep 随之跳过）。
+"""
+import os
+import re
+import logging
+from typing import Callable, Dict, List, Optional
+
+from llm_adapters import create_llm_adapter
+from embedding_adapters import create_embedding_adapter
+from prompt_definitions import (
+    knowledge_filter_prompt,
+    knowledge_search_prompt,
+    next_chapter_draft_prompt,
+    summarize_recent_chapters_prompt
+)
+from .blueprint_index import CHAPTER_INFO_FIELDS, get_blueprint_index
+from .chapter_cache import get_chapter_cache
+from .character_store import load_character_store, select_character_state
+from .context_prefilter import prefilter_retrieved_texts
+from .local_vectorstore import load_local_vector_store
+from .metadata_index import SOURCE_KNOWLEDGE
+from .retrieval import parse_keyword_groups
+from .retrieval_cache import cached_multi_query_search, chapter_inputs_hash, memoize_keywords, memoize_recent_summary
+from .step_journal import StepJournal, file_digest
+from .summary_store import summary_context_for_chapter
+from .task_graph import TaskGraph
+
+RECENT_CHAPTERS = 3
+PREVIOUS_EXCERPT_CHARS = 800
+
+
+def chapter_file(filepath: str, chapter_number: int) -> str:
+    return os.path.join(filepath, "chapters", f"chapter_{chapter_number}.txt")
+
+
+def fingerprint_files(paths: List[str]) -> Dict[str, str]:
+    """按内容计算指纹，不存在的文件记为空串。"""
+    return {path: file_digest(path) for path in paths}
+
+
+def changed_inputs(fingerprints: Dict[str, str]) -> List[str]:
+    current = fingerprint_files(list(fingerprints))
+    return [path for path, digest in fingerprints.items() if current[path] != digest]
+
+
+def prep_input_files(filepath: str, chapter_number: int) -> List[str]:
+    recent = [chapter_file(filepath, n) for n in range(max(1, chapter_number - RECENT_CHAPTERS), chapter_number)]
+    return recent + [os.path.join(filepath, "Novel_directory.txt")]
+
+
+def get_chapter_info(filepath: str, chapter_number: int) -> dict:
+    info = get_blueprint_index(filepath).chapter_info(chapter_number)
+    return {field: info[field] for field in CHAPTER_INFO_FIELDS}
+
+
+def retrieval_filter(chapter_number: int) -> dict:
+    """
+    知识库切块与前两章之前的章节切块。上一章的内容已通过前章结尾与当前章节摘要进入提示词，
+    排除它使检索结果不受上一章定稿时的向量写入影响。
+    """
+    return {"$or": [{"source": SOURCE_KNOWLEDGE}, {"chapter": {"$lte": chapter_number - 2}}]}
+
+
+def _prefixed(info: dict, prefix: str) -> dict:
+    return {f"{prefix}{field[len('chapter_'):] if field.startswith('chapter_') else field}": value for field, value in info.items()}
+
+
+def prepare_chapter_context(settings: dict, chapter_number: int, llm_adapter, embedding_adapter) -> dict:
+    """
+    生成第 chapter_number 章草稿前、与上一章定稿结果无关的全部上下文。
+    返回 {"fingerprints", "short_summary", "retrieved_texts", "previous_chapter_excerpt", "chapter_info", "next_chapter_info"}；
+    retrieved_texts 为尚未过滤的检索结果，由 filter_chapter_context 整理为知识库上下文。
+    """
+    params = settings["params"]
+    filepath = params["filepath"]
+    inputs = prep_input_files(filepath, chapter_number)
+    fingerprints = fingerprint_files(inputs)
+
+    chapters_dir = os.path.join(filepath, "chapters")
+    chapters = get_chapter_cache(chapters_dir)
+    recent_texts = chapters.last_n_texts(chapter_number, RECENT_CHAPTERS)
+    info = get_chapter_info(filepath, chapter_number)
+    next_info = get_chapter_info(filepath, chapter_number + 1)
+
+    user_inputs = {key: params[key] for key in
+                   ("characters_involved", "key_items", "scene_location", "time_constraint", "user_guidance")}
+    # 只用确定的输入做缓存键：近章摘要由 LLM 生成，每次都不同，不能进入键中
+    inputs_hash = chapter_inputs_hash(
+        chapter_number=chapter_number,
+        chapter_info=info,
+        next_chapter_info=next_info,
+        params=user_inputs,
+        recent_chapters={os.path.basename(path): digest for path, digest in fingerprints.items()
+                         if os.path.dirname(path) == chapters_dir}
+    )
+    summary_response = memoize_recent_summary(filepath, inputs_hash, lambda: llm_adapter.invoke(
+        summarize_recent_chapters_prompt.format(
+            combined_text="\n".join(t for t in recent_texts if t),
+            novel_number=chapter_number,
+            next_chapter_number=chapter_number + 1,
+            **info,
+            **_prefixed(next_info, "next_chapter_")
+        )) or "")
+    short_summary = re.sub(r'^\s*当前章节摘要\s*[:：]\s*', '', summary_response.strip())
+
+    keyword_inputs = dict(
+        chapter_number=chapter_number,
+        short_summary=short_summary,
+        characters_involved=params["characters_involved"],
+        key_items=params["key_items"],
+        scene_location=params["scene_location"],
+        time_constraint=params["time_constraint"],
+        user_guidance=params["user_guidance"],
+        chapter_title=info["chapter_title"],
+        chapter_role=info["chapter_role"],
+        chapter_purpose=info["chapter_purpose"],
+        foreshadowing=info["foreshadowing"]
+    )
+    keywords = memoize_keywords(filepath, inputs_hash,
+                                lambda: llm_adapter.invoke(knowledge_search_prompt.format(**keyword_inputs)))
+
+    retrieved_texts = []
+    store = load_local_vector_store(embedding_adapter, filepath)
+    queries = parse_keyword_groups(keywords or "")
+    if store is not None and queries:
+        extra_terms = [params["characters_involved"], params["key_items"], params["scene_location"]]
+        docs = cached_multi_query_search(store, queries, k=int(settings["embedding"]["retrieval_k"]),
+                                         extra_terms=extra_terms, where=retrieval_filter(chapter_number))
+        retrieved_texts = [doc.page_content for doc in docs]
+
+    return {
+        "fingerprints": fingerprints,
+        "short_summary": short_summary,
+        "retrieved_texts": retrieved_texts,
+        "previous_chapter_excerpt": chapters.tail(chapter_number - 1, PREVIOUS_EXCERPT_CHARS) if chapter_number > 1 else "",
+        "chapter_info": info,
+        "next_chapter_info": next_info
+    }
+
+
+def filter_chapter_context(settings: dict, chapter_number: int, context: dict, llm_adapter) -> str:
+    """
+    对 prepare_chapter_context 的检索结果做本地预过滤（去重、剔除与前文摘要重合的片段），
+    再经 knowledge_filter 调用整理为知识库上下文。读取前文摘要，须在上一章定稿完成后调用。
+    """
+    filepath = settings["params"]["filepath"]
+    kept = prefilter_retrieved_texts(context["retrieved_texts"], summary_context_for_chapter(filepath, chapter_number))["texts"]
+    filtered_context = ""
+    if kept:
+        info = context["chapter_info"]
+        chapter_info_text = f"第{chapter_number}章《{info['chapter_title']}》：{info['chapter_summary']}\n当前章节摘要：{context['short_summary']}"
+        filtered_context = (llm_adapter.invoke(knowledge_filter_prompt.format(
+            retrieved_texts="\n\n".join(kept), chapter_info=chapter_info_text)) or "").strip()
+    return filtered_context or "（无相关知识库内容）"
+
+
+def build_draft_prompt(settings: dict, chapter_number: int, context: dict) -> str:
+    """
+    用准备好的上下文（含 filter_chapter_context 得到的 filtered_context）与当前（已定稿更新的）前文摘要、角色状态组装草稿提示词。
+    角色状态只保留点名角色、其一度关联角色以及上一章结尾/摘要/检索结果中出现的角色。
+    """
+    params = settings["params"]
+    filepath = params["filepath"]
+    return next_chapter_draft_prompt.format(
+        global_summary=summary_context_for_chapter(filepath, chapter_number),
+        character_state=select_character_state(
+            load_character_store(filepath),
+            params["characters_involved"],
+            [context["previous_chapter_excerpt"], context["short_summary"], context["filtered_context"]]
+        ),
+        previous_chapter_excerpt=context["previous_chapter_excerpt"],
+        short_summary=context["short_summary"],
+        filtered_context=context["filtered_context"],
+        user_guidance=params["user_guidance"],
+        characters_involved=params["characters_involved"],
+        key_items=params["key_items"],
+        scene_location=params["scene_location"],
+        time_constraint=params["time_constraint"],
+        word_number=int(params["word_number"]),
+        novel_number=chapter_number,
+        next_chapter_number=chapter_number + 1,
+        **context["chapter_info"],
+        **_prefixed(context["next_chapter_info"], "next_chapter_")
+    )
+
+
+def create_adapters(settings: dict):
+    """按运行配置创建 (llm_adapter, embedding_adapter)。"""
+    from .runner import _llm_kwargs
+    llm_kwargs = _llm_kwargs(settings)
+    llm_adapter = create_llm_adapter(
+        interface_format=llm_kwargs["interface_format"],
+        base_url=llm_kwargs["base_url"],
+        model_name=settings["llm"]["model_name"],
+        api_key=llm_kwargs["api_key"],
+        temperature=llm_kwargs["temperature"],
+        max_tokens=llm_kwargs["max_tokens"],
+        timeout=llm_kwargs["timeout"]
+    )
+    emb = settings["embedding"]
+    embedding_adapter = create_embedding_adapter(settings["embedding_interface_format"], emb["api_key"], emb["base_url"], emb["model_name"])
+    return llm_adapter, embedding_adapter
+
+
+def build_chapter_draft_prompt(settings: dict, chapter_number: int) -> str:
+    """非流水线模式使用：当场准备上下文（含本地预过滤）并组装第 chapter_number 章的草稿提示词。"""
+    llm_adapter, embedding_adapter = create_adapters(settings)
+    context = prepare_chapter_context(settings, chapter_number, llm_adapter, embedding_adapter)
+    context["filtered_context"] = filter_chapter_context(settings, chapter_number, context, llm_adapter)
+    return build_draft_prompt(settings, chapter_number, context)
+
+
+def run_chapters_pipelined(
+    settings: dict,
+    chapter_start: int,
+    chapter_end: int,
+    emit: Callable[[dict], None] = lambda event: None,
+    retries: int = 0,
+    journal: Optional[StepJournal] = None,
+    resume: bool = True
+) -> Dict[str, dict]:
+    """
+    以流水线方式生成 chapter_start..chapter_end 章（草稿 + 定稿），返回各节点结果（见 TaskGraph.run）。
+    任一节点失败时，依赖它的后续章节节点全部跳过。
+    草稿与定稿节点与顺序模式一样经 _run_step 执行，输出相同的 step_start / step_done / step_failed 事件。
+    """
+    from .runner import STEP_DRAFT, STEP_FINALIZE, _run_step, journal_done, journaled, run_draft, run_finalize
+
+    llm_adapter, embedding_adapter = create_adapters(settings)
+
+    def skip(step: str, n: int) -> bool:
+        if journal is None or not resume or not journal_done(journal, settings, step, n):
+            return False
+        emit({"event": "step_skipped", "step": step, "chapter": n, "reason": "journal"})
+        return True
+
+    def run_step(step: str, n: int, func: Callable[[], object]):
+        """记入步骤日志并输出步骤事件；失败时重新抛出原异常，使依赖它的节点被跳过。"""
+        outcome = {}
+
+        def body():
+            try:
+                outcome["result"] = journaled(journal, settings, step, func, n)() if journal is not None else func()
+            except Exception as e:
+                outcome["error"] = e
+                raise
+
+        if not _run_step(emit, step, body, n):
+            raise outcome["error"]
+        return outcome.get("result")
+
+    def prep(n: int):
+        def run(inputs):
+            if journal is not None and resume and journal.committed(STEP_DRAFT, n):
+                # 草稿已有记录时多半会被跳过；若草稿的输入已变化，draft 节点自行按常规方式生成
+                return None
+            return prepare_chapter_context(settings, n, llm_adapter, embedding_adapter)
+        return run
+
+    def draft(n: int):
+        def run(inputs):
+            if skip(STEP_DRAFT, n):
+                return None
+            context = inputs.get(f"prep_{n}")
+            if context is None:
+                return run_step(STEP_DRAFT, n, lambda: run_draft(settings, n, emit=emit))
+
+            def generate():
+                nonlocal context
+                changed = changed_inputs(context["fingerprints"])
+                if changed:
+                    emit({"event": "step_rerun", "step": "prep", "chapter": n, "changed": changed})
+                    logging.info(f"[chapter_pipeline] 第{n}章准备阶段的输入已变化，重新准备: {changed}")
+                    context = prepare_chapter_context(settings, n, llm_adapter, embedding_adapter)
+                # 上一章定稿已完成，此时读取的前文摘要是确定的
+                context = dict(context, filtered_context=filter_chapter_context(settings, n, context, llm_adapter))
+                prompt = build_draft_prompt(settings, n, context)
+                return run_draft(settings, n, custom_prompt_text=prompt, emit=emit)
+            return run_step(STEP_DRAFT, n, generate)
+        return run
+
+    def finalize(n: int):
+        def run(inputs):
+            if skip(STEP_FINALIZE, n):
+                return None
+            return run_step(STEP_FINALIZE, n, lambda: run_finalize(settings, n, emit))
+        return run
+
+    graph = TaskGraph("chapter_pipeline")
+    for n in range(chapter_start, chapter_end + 1):
+        has_previous = n > chapter_start
+        draft_deps = []
+        if n > 1:
+            graph.add(f"prep_{n}", prep(n), deps=[f"draft_{n - 1}"] if has_previous else [], retries=retries)
+            draft_deps.append(f"prep_{n}")
+        if has_previous:
+            draft_deps.append(f"finalize_{n - 1}")
+        graph.add(f"draft_{n}", draft(n), deps=draft_deps, retries=retries)
+        graph.add(f"finalize_{n}", finalize(n), deps=[f"draft_{n}"], retries=retries)
+    return graph.run(max_workers=3, emit=emit)
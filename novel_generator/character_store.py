@@ -0,0 +1,317 @@
+# novel_generator/character_store.py
+# -*- coding: utf-8 -*-
+"""
+结构化的角色状态（<filepath>/character_state.json），character_state.txt 由它渲染而来：
+
+    {
+      "characters": {
+        "张三": {
+          "物品": {"青衫": "..."}, "能力": {...}, "状态": {"身体状态": "...", "心理状态": "..."},
+          "主要角色间关系网": {...}, "触发或加深的事件": {...}
+        }
+      },
+      "minor_characters": {"路人甲": "一句话信息"},
+      "last_seen": {"张三": 12}
+    }
+
+定稿时只把本章出场角色的当前状态发给 LLM，要求返回增量（JSON），在本地合并后再渲染成原有的树状文本，
+定稿的提示词长度只与本章出场人数有关，不再随全书角色数增长。
+首次使用时从已有的 character_state.txt（Character_Import_Prompt / create_character_state_prompt 的格式）解析。
+"""
+import os
+import re
+import json
+import logging
+from typing import Dict, Iterable, List, Optional, Set
+
+from prompt_definitions import character_state_delta_prompt
+from utils import read_file, save_data_to_json, save_string_to_txt
+
+STORE_FILE = "character_state.json"
+TEXT_FILE = "character_state.txt"
+CATEGORIES = ("物品", "能力", "状态", "主要角色间关系网", "触发或加深的事件")
+MINOR_SECTION = "新出场角色"
+
+_TREE_LINE_RE = re.compile(r'^([│|\s]*)[├└]──\s*(.*)$')
+_JSON_BLOCK_RE = re.compile(r'\{.*\}', re.DOTALL)
+_NAME_SEP_RE = re.compile(r'[、，,；;/|\s]+')
+_NAME_NOTE_RE = re.compile(r'[（(【\[].*?[）)】\]]')
+
+
+def empty_store() -> dict:
+    return {"characters": {}, "minor_characters": {}, "last_seen": {}}
+
+
+def _split_entry(text: str):
+    for i, ch in enumerate(text):
+        if ch in ":：":
+            return text[:i].strip(), text[i + 1:].strip()
+    return text.strip(), ""
+
+
+def _category_name(text: str) -> str:
+    name = text.strip().rstrip(":：").strip()
+    for category in CATEGORIES:
+        if name.startswith(category):
+            return category
+    return name
+
+
+def parse_character_state(text: str) -> dict:
+    """把树状角色状态文本解析为结构化记录；无法识别的行忽略。"""
+    store = empty_store()
+    current: Optional[dict] = None
+    category: Optional[str] = None
+    in_minor = False
+    for raw in (text or "").splitlines():
+        line = raw.rstrip()
+        stripped = line.strip()
+        if not stripped or stripped in ("...", "......", "│"):
+            continue
+        if stripped.startswith(MINOR_SECTION):
+            in_minor, current, category = True, None, None
+            continue
+        match = _TREE_LINE_RE.match(line)
+        if match:
+            if current is None:
+                continue
+            content = match.group(2).strip()
+            if not match.group(1):
+                category = _category_name(content)
+                current.setdefault(category, {})
+            elif category is not None and content:
+                key, value = _split_entry(content)
+                if key:
+                    current[category][key] = value
+            continue
+        if in_minor and stripped.startswith(("-", "•", "●")):
+            entry = stripped.lstrip("-•● ").strip()
+            if entry and not entry.startswith(("(", "（")):
+                key, value = _split_entry(entry)
+                store["minor_characters"][key] = value
+            continue
+        if stripped[-1] in ":：" and not stripped.startswith(("│", "-")):
+            name = stripped.rstrip(":：").strip()
+            if name and name != "角色名":
+                current = store["characters"].setdefault(name, {})
+                category = None
+                in_minor = False
+    return store
+
+
+def render_character_state(store: dict, names: Optional[List[str]] = None, include_minor: bool = True) -> str:
+    """渲染为原有的树状文本；names 为空时渲染全部角色。"""
+    blocks = []
+    for name, record in store["characters"].items():
+        if names is not None and name not in names:
+            continue
+        lines = [f"{name}："]
+        categories = [c for c in CATEGORIES if c in record] + [c for c in record if c not in CATEGORIES]
+        for category in categories:
+            lines.append(f"├──{category}:")
+            entries = list(record[category].items())
+            for i, (key, value) in enumerate(entries):
+                branch = "└──" if i == len(entries) - 1 else "├──"
+                lines.append(f"│  {branch}{key}: {value}" if value else f"│  {branch}{key}")
+        blocks.append("\n".join(lines))
+    if include_minor and store["minor_characters"]:
+        minor = "\n".join(f"- {key}：{value}" if value else f"- {key}" for key, value in store["minor_characters"].items())
+        blocks.append(f"{MINOR_SECTION}：\n{minor}")
+    return "\n\n".join(blocks)
+
+
+def apply_character_deltas(store: dict, deltas: dict, chapter_number: Optional[int] = None) -> Dict[str, List[str]]:
+    """
+    合并增量：条目值为 null 时删除该条目，未出现的角色/分类/条目保持不变。
+    返回 {"updated": [...], "added": [...], "removed": [...]}。
+    """
+    changes = {"updated": [], "added": [], "removed": []}
+    for name, categories in (deltas.get("characters") or {}).items():
+        if not isinstance(categories, dict):
+            continue
+        if name not in store["characters"]:
+            store["characters"][name] = {}
+            store["minor_characters"].pop(name, None)
+            changes["added"].append(name)
+        else:
+            changes["updated"].append(name)
+        record = store["characters"][name]
+        for category, entries in categories.items():
+            if not isinstance(entries, dict):
+                continue
+            target = record.setdefault(_category_name(category), {})
+            for key, value in entries.items():
+                if value is None:
+                    target.pop(key, None)
+                else:
+                    target[key] = str(value)
+        if chapter_number is not None:
+            store["last_seen"][name] = chapter_number
+    for name, info in (deltas.get("new_characters") or {}).items():
+        if name not in store["characters"]:
+            store["minor_characters"][name] = str(info or "")
+    for name in deltas.get("removed_characters") or []:
+        if store["minor_characters"].pop(name, None) is not None:
+            changes["removed"].append(name)
+    return changes
+
+
+def parse_delta_response(response: str) -> dict:
+    """从 LLM 回复中取出 JSON（允许包在代码块或说明文字中）。"""
+    match = _JSON_BLOCK_RE.search(response or "")
+    if not match:
+        raise ValueError("角色状态增量中没有 JSON")
+    data = json.loads(match.group(0))
+    if not isinstance(data, dict):
+        raise ValueError("角色状态增量不是 JSON 对象")
+    return data
+
+
+def load_character_store(filepath: str) -> dict:
+    """
+    读取结构化角色状态；尚未建立、已损坏，或 character_state.txt 在界面中被手动修改过
+    （与上次渲染结果不一致）时，从 character_state.txt 重新解析。
+    """
+    text = read_file(os.path.join(filepath, TEXT_FILE))
+    content = read_file(os.path.join(filepath, STORE_FILE))
+    if content:
+        try:
+            store = json.loads(content)
+            for key, value in empty_store().items():
+                store.setdefault(key, value)
+            if render_character_state(store).strip() == text.strip():
+                return store
+            logging.info("[character_store] character_state.txt 已被手动修改，以文本为准重新解析")
+            parsed = parse_character_state(text)
+            parsed["last_seen"] = {name: chapter for name, chapter in store["last_seen"].items() if name in parsed["characters"]}
+            return parsed
+        except json.JSONDecodeError:
+            logging.warning("[character_store] character_state.json 损坏，改为从 character_state.txt 重新解析")
+    return parse_character_state(text)
+
+
+def structured_state_available(filepath: str) -> bool:
+    """已有 character_state.json，或 character_state.txt 为空/可解析出角色时可用增量更新。"""
+    if os.path.exists(os.path.join(filepath, STORE_FILE)):
+        return True
+    text = read_file(os.path.join(filepath, TEXT_FILE)).strip()
+    return not text or bool(parse_character_state(text)["characters"])
+
+
+def save_character_store(filepath: str, store: dict):
+    save_data_to_json(store, os.path.join(filepath, STORE_FILE))
+    save_string_to_txt(render_character_state(store), os.path.join(filepath, TEXT_FILE))
+
+
+def split_names(characters_involved: str) -> List[str]:
+    """把 characters_involved（以顿号、逗号、空格等分隔，可带括号备注）拆成角色名列表。"""
+    names = []
+    for item in _NAME_SEP_RE.split(_NAME_NOTE_RE.sub("", characters_involved or "")):
+        item = item.strip().strip(":：")
+        if item and item not in names:
+            names.append(item)
+    return names
+
+
+def all_names(store: dict) -> List[str]:
+    """已登记的全部角色名（主要角色在前，其后为次要角色）。"""
+    return [name for name in list(store["characters"]) + list(store["minor_characters"]) if name]
+
+
+def mentioned_names(names: Iterable[str], texts: Iterable[str]) -> Set[str]:
+    """
+    texts 中出现的角色名。按已知角色名做最长匹配切分，名字只作为更长的已知名字的一部分出现时不算
+    （如「张三」之于「张三丰」）；以字母数字开头或结尾的名字要求两侧不紧邻字母数字（如「Al」之于「Alice」）。
+    """
+    names = sorted({name for name in names if name}, key=len, reverse=True)
+    if not names:
+        return set()
+    alternatives = []
+    for name in names:
+        pattern = re.escape(name)
+        if name[0].isascii() and name[0].isalnum():
+            pattern = r'(?<![A-Za-z0-9])' + pattern
+        if name[-1].isascii() and name[-1].isalnum():
+            pattern += r'(?![A-Za-z0-9])'
+        alternatives.append(pattern)
+    regex = re.compile("|".join(alternatives))
+    found: Set[str] = set()
+    for text in texts:
+        if text:
+            found.update(match.group(0) for match in regex.finditer(text))
+    return found
+
+
+def _involved_names(store: dict, characters_involved: str) -> Set[str]:
+    """characters_involved 点名的角色：拆分后与已知名字完全相同，或按最长匹配在其中出现（如「张三和李四」）。"""
+    return set(split_names(characters_involved)) | mentioned_names(all_names(store), [characters_involved])
+
+
+def present_characters(store: dict, chapter_text: str) -> List[str]:
+    found = mentioned_names(all_names(store), [chapter_text])
+    return [name for name in store["characters"] if name in found]
+
+
+def select_relevant_characters(store: dict, characters_involved: str = "", context_texts: Iterable[str] = ()) -> List[str]:
+    """
+    与本章相关的角色：characters_involved 中点名的角色、他们关系网中的一度关联角色，
+    以及在 context_texts（检索到的前文、上一章结尾、本章正文等）中出现的角色。
+    """
+    characters = store["characters"]
+    involved = _involved_names(store, characters_involved)
+    found = mentioned_names(all_names(store), context_texts)
+    named = [name for name in characters if name in involved]
+    selected = list(named)
+    for name in characters:
+        if name not in selected and name in found:
+            selected.append(name)
+    for name in named:
+        for other in characters[name].get("主要角色间关系网", {}):
+            if other in characters and other not in selected:
+                selected.append(other)
+    return selected
+
+
+def select_character_state(store: dict, characters_involved: str = "", context_texts: Iterable[str] = ()) -> str:
+    """只渲染相关角色（及被提到的次要角色）的状态；无从判断相关角色时返回全部。"""
+    texts = [t for t in context_texts if t]
+    names = select_relevant_characters(store, characters_involved, texts)
+    if not names:
+        return render_character_state(store)
+    involved = _involved_names(store, characters_involved)
+    found = mentioned_names(all_names(store), texts)
+    minor = {name: info for name, info in store["minor_characters"].items() if name in involved or name in found}
+    subset = {"characters": {name: store["characters"][name] for name in store["characters"] if name in names},
+              "minor_characters": minor, "last_seen": {}}
+    logging.info(f"[character_store] 角色状态按出场筛选: {len(names)}/{len(store['characters'])} 人")
+    return render_character_state(subset)
+
+
+def filter_character_state_text(character_state: str, characters_involved: str = "", context_texts: Iterable[str] = ()) -> str:
+    """对角色状态文本做同样的筛选；无法解析出角色时原样返回。"""
+    store = parse_character_state(character_state)
+    if not store["characters"]:
+        return character_state
+    return select_character_state(store, characters_involved, context_texts)
+
+
+def update_character_state_delta(llm_adapter, filepath: str, chapter_number: int, chapter_text: str) -> Dict[str, object]:
+    """
+    定稿时调用：只发送本章出场角色的状态，合并 LLM 返回的增量并写回 character_state.json / character_state.txt。
+    返回 {"present": [...], "updated": [...], "added": [...], "removed": [...], "text": 渲染后的全文}。
+    """
+    store = load_character_store(filepath)
+    present = present_characters(store, chapter_text)
+    prompt = character_state_delta_prompt.format(
+        chapter_text=chapter_text,
+        known_characters="、".join(store["characters"]) or "（暂无）",
+        present_states=render_character_state(store, names=present, include_minor=False) or "（无）"
+    )
+    response = (llm_adapter.invoke(prompt) or "").strip()
+    if not response:
+        raise RuntimeError("角色状态增量更新: LLM 返回为空")
+    deltas = parse_delta_response(response)
+    changes = apply_character_deltas(store, deltas, chapter_number)
+    save_character_store(filepath, store)
+    logging.info(f"[character_store] 第{chapter_number}章出场 {len(present)} 人，更新 {changes}")
+    return dict(changes, present=present, text=render_character_state(store))
@@ -0,0 +1,125 @@
+# novel_generator/context_prefilter.py
+# -*- coding: utf-8 -*-
+"""
+knowledge_filter_prompt 之前的本地预过滤，避免花 token 让 LLM 去重：
+1. SimHash 近重复剔除；
+2. 与前文摘要 (global_summary) 高度重合的片段剔除；
+3. 最大边际相关 (MMR) 排序，兼顾相关性与多样性；
+4. 按 token 预算截断，只有留下来的片段才进入过滤调用。
+"""
+import hashlib
+from typing import Dict, List, Optional, Sequence
+
+from utils import estimate_tokens
+from .lexical_index import tokenize_bigrams
+
+DEFAULT_TOKEN_BUDGET = 3000
+SIMHASH_MAX_DISTANCE = 3
+SUMMARY_OVERLAP_THRESHOLD = 0.6
+MMR_LAMBDA = 0.6
+
+
+def simhash(text: str, bits: int = 64) -> int:
+    """基于字符二元组的 SimHash 指纹。"""
+    weights = [0] * bits
+    for term in tokenize_bigrams(text):
+        h = int.from_bytes(hashlib.md5(term.encode('utf-8')).digest()[:8], 'big')
+        for i in range(bits):
+            weights[i] += 1 if (h >> i) & 1 else -1
+    fingerprint = 0
+    for i, w in enumerate(weights):
+        if w > 0:
+            fingerprint |= 1 << i
+    return fingerprint
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def _jaccard(a: set, b: set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def _cosine(a, b) -> float:
+    import numpy as np
+    na, nb = np.linalg.norm(a), np.linalg.norm(b)
+    if na == 0 or nb == 0:
+        return 0.0
+    return float(np.dot(a, b) / (na * nb))
+
+
+def prefilter_retrieved_texts(
+    texts: Sequence[str],
+    global_summary: str = "",
+    token_budget: int = DEFAULT_TOKEN_BUDGET,
+    query_vector: Optional[Sequence[float]] = None,
+    vectors: Optional[Sequence[Optional[Sequence[float]]]] = None,
+    lambda_mult: float = MMR_LAMBDA,
+    simhash_distance: int = SIMHASH_MAX_DISTANCE,
+    summary_overlap: float = SUMMARY_OVERLAP_THRESHOLD
+) -> Dict[str, object]:
+    """
+    :param texts: 检索结果文本，按检索排名先后排列
+    :param vectors: 与 texts 对应的向量（可选）；提供了 query_vector 时相关性用余弦相似度，
+                    否则用检索排名；片段间相似度有向量时用余弦，否则用二元组 Jaccard
+    :return: {"texts": 保留的片段, "stats": 各阶段剔除数量与 token 数}
+    """
+    stats = {"input": len(texts), "near_duplicate": 0, "summary_overlap": 0, "over_budget": 0, "tokens": 0}
+    summary_terms = set(tokenize_bigrams(global_summary)) if global_summary else set()
+
+    candidates = []  # (原始下标, 文本, 二元组集合)
+    fingerprints: List[int] = []
+    for idx, text in enumerate(texts):
+        text = (text or "").strip()
+        if not text:
+            continue
+        terms = tokenize_bigrams(text)
+        term_set = set(terms)
+        fp = simhash(text)
+        if any(hamming_distance(fp, other) <= simhash_distance for other in fingerprints):
+            stats["near_duplicate"] += 1
+            continue
+        if summary_terms and term_set and len(term_set & summary_terms) / len(term_set) >= summary_overlap:
+            stats["summary_overlap"] += 1
+            continue
+        fingerprints.append(fp)
+        candidates.append((idx, text, term_set))
+
+    if not candidates:
+        return {"texts": [], "stats": stats}
+
+    use_vectors = vectors is not None and all(vectors[idx] is not None and len(vectors[idx]) for idx, _, _ in candidates)
+    n = len(candidates)
+    if use_vectors and query_vector is not None:
+        relevance = [_cosine(vectors[idx], query_vector) for idx, _, _ in candidates]
+    else:
+        relevance = [1.0 - pos / n for pos in range(n)]
+
+    def similarity(i: int, j: int) -> float:
+        if use_vectors:
+            return _cosine(vectors[candidates[i][0]], vectors[candidates[j][0]])
+        return _jaccard(candidates[i][2], candidates[j][2])
+
+    selected: List[int] = []
+    remaining = list(range(n))
+    used_tokens = 0
+    while remaining:
+        best, best_score = None, None
+        for i in remaining:
+            redundancy = max((similarity(i, j) for j in selected), default=0.0)
+            score = lambda_mult * relevance[i] - (1 - lambda_mult) * redundancy
+            if best_score is None or score > best_score:
+                best, best_score = i, score
+        remaining.remove(best)
+        cost = estimate_tokens(candidates[best][1])
+        if used_tokens + cost > token_budget:
+            stats["over_budget"] += 1
+            continue
+        selected.append(best)
+        used_tokens += cost
+
+    stats["tokens"] = used_tokens
+    return {"texts": [candidates[i][1] for i in selected], "stats": stats}
@@ -0,0 +1,283 @@
+# novel_generator/draft_quality.py
+# -*- coding: utf-8 -*-
+"""
+草稿生成后的本地质量检查（不调用 LLM），在进入一致性审校与定稿之前拦下明显有问题的草稿：
+- empty       正文为空（接口报错被吞掉时常见）
+- too_short   字数远低于 word_number
+- truncated   结尾停在半句话上（达到 max_tokens 被截断）
+- markdown    出现 markdown 标记或分节小标题
+- repetition  大段重复（n-gram 重复占比过高）
+
+每项问题按严重程度扣分，报告中给出建议的处理方式：
+格式问题在本地清理，字数不足或截断时续写，空白或大段重复时重新生成。
+配置取自 config.json 的 "draft_quality"，未设置的项使用 DEFAULT_QUALITY_CONFIG。
+
+用法：python -m novel_generator.draft_quality <小说保存路径> <章节号> [--word-number 3000]  输出检查报告。
+"""
+import os
+import re
+import sys
+import json
+import logging
+from typing import Callable, Dict, List, Optional, Tuple
+
+from prompt_definitions import chapter_continuation_prompt
+from utils import read_file, save_data_to_json
+
+QUALITY_DIR = "quality"
+DEFAULT_QUALITY_CONFIG = {
+    "enabled": True,
+    "min_length_ratio": 0.7,     # 字数低于 word_number 的该比例视为不足
+    "ngram_size": 12,            # 重复检测的 n-gram 长度（按去掉空白后的字符计）
+    "max_repeat_ratio": 0.12,    # 重复 n-gram 占比上限
+    "max_markdown_lines": 0,     # 允许出现的 markdown / 小标题行数
+    "min_score": 60,             # 总分低于该值时不通过
+    "max_attempts": 2,           # 续写 / 重新生成的最多次数（本地清理格式不计入）
+    "auto_continue": True,
+    "auto_regenerate": True,
+    "strip_markdown": True,
+    "fail_on_reject": True,      # 处理后仍不通过时草稿步骤失败，不再进入定稿与审校
+    "continuation_tail_chars": 1500
+}
+
+ACTION_ACCEPT = "accept"
+ACTION_CLEAN = "clean"
+ACTION_CONTINUE = "continue"
+ACTION_REGENERATE = "regenerate"
+
+SENTENCE_ENDINGS = "。！？!?…”」』\"'’）)】》~～—"
+# 整行删除的标记：标题、整行加粗（常用作小标题）、分隔线、代码块
+_DROP_LINE_RES = [
+    re.compile(r'^\s*#{1,6}\s*\S'),
+    re.compile(r'^\s*\*\*[^*]+\*\*\s*[:：]?\s*$'),
+    re.compile(r'^\s*(?:-{3,}|\*{3,}|_{3,}|={3,})\s*$'),
+    re.compile(r'^\s*```'),
+]
+# 去掉行首标记、保留内容：列表、引用
+_LINE_MARKER_RE = re.compile(r'^(\s*)(?:[-*+]|>)\s+(?=\S)')
+_SUBHEADING_RE = re.compile(
+    r'^\s*(?:第[一二三四五六七八九十百\d]+[节幕场部](?:分)?|场景[一二三四五六七八九十\d]+|[一二三四五六七八九十]+、|[（(][一二三四五六七八九十\d]+[)）])'
+    r'[^。！？!?，,]{0,20}$'
+)
+_CHAPTER_TITLE_RE = re.compile(r'^\s*第\s*[一二三四五六七八九十百千\d]+\s*章')
+_INLINE_MARKDOWN_RE = re.compile(r'\*\*([^*\n]+)\*\*|__([^_\n]+)__')
+
+
+def quality_config(config: Optional[dict] = None) -> dict:
+    merged = dict(DEFAULT_QUALITY_CONFIG)
+    merged.update({key: value for key, value in (config or {}).items() if value is not None})
+    return merged
+
+
+def count_words(text: str) -> int:
+    """与 word_number 的口径一致：中文按字计，即去掉空白后的字符数。"""
+    return len(re.sub(r'\s+', '', text or ""))
+
+
+def markdown_lines(text: str) -> List[str]:
+    """markdown 标记行与分节小标题行；首行的 "第N章 标题" 不计入。"""
+    found = []
+    lines = (text or "").strip().splitlines()
+    for i, line in enumerate(lines):
+        if not line.strip():
+            continue
+        if i == 0 and _CHAPTER_TITLE_RE.match(line) and not line.lstrip().startswith("#"):
+            continue
+        if any(regex.match(line) for regex in _DROP_LINE_RES) or _SUBHEADING_RE.match(line) \
+                or _LINE_MARKER_RE.match(line):
+            found.append(line.strip())
+    return found
+
+
+def repeat_ratio(text: str, ngram_size: int) -> Tuple[float, str]:
+    """返回 (重复 n-gram 占全部 n-gram 的比例, 第一个重复片段)。"""
+    compact = re.sub(r'\s+', '', text or "")
+    total = len(compact) - ngram_size + 1
+    if total <= 0:
+        return 0.0, ""
+    seen = set()
+    repeated, sample = 0, ""
+    for i in range(total):
+        gram = compact[i:i + ngram_size]
+        if gram in seen:
+            repeated += 1
+            sample = sample or gram
+        else:
+            seen.add(gram)
+    return repeated / total, sample
+
+
+def is_truncated(text: str) -> bool:
+    stripped = (text or "").rstrip()
+    return bool(stripped) and stripped[-1] not in SENTENCE_ENDINGS
+
+
+def validate_draft(text: str, word_number: int, config: Optional[dict] = None) -> dict:
+    """
+    检查草稿并打分，返回：
+        {"ok": bool, "score": 0-100, "action": accept/clean/continue/regenerate,
+         "length": 字数, "target": word_number, "length_ratio", "repeat_ratio", "markdown_lines",
+         "issues": [{"code", "severity", "message", "fix"}, ...]}
+    """
+    config = quality_config(config)
+    length = count_words(text)
+    target = max(1, int(word_number or 0))
+    issues = []
+    score = 100.0
+
+    def issue(code: str, severity: str, message: str, fix: str, penalty: float, **details):
+        nonlocal score
+        score -= penalty
+        issues.append(dict({"code": code, "severity": severity, "message": message, "fix": fix}, **details))
+
+    ratio, sample = repeat_ratio(text, int(config["ngram_size"]))
+    md_lines = markdown_lines(text)
+    if length == 0:
+        issue("empty", "error", "草稿为空", ACTION_REGENERATE, 100)
+    else:
+        length_ratio = length / target
+        if length_ratio < config["min_length_ratio"]:
+            issue("too_short", "error", f"字数 {length}，低于目标 {target} 的 {config['min_length_ratio']:.0%}",
+                  ACTION_CONTINUE, min(50.0, (1 - length_ratio) * 60), value=round(length_ratio, 3))
+        if is_truncated(text):
+            issue("truncated", "error", f"结尾不完整: …{text.rstrip()[-20:]}", ACTION_CONTINUE, 25)
+        if len(md_lines) > config["max_markdown_lines"]:
+            issue("markdown", "error", f"{len(md_lines)} 行 markdown 标记或小标题", ACTION_CLEAN,
+                  min(30.0, 5.0 * len(md_lines)), lines=md_lines[:5])
+        elif md_lines:
+            issue("markdown", "warning", f"{len(md_lines)} 行 markdown 标记或小标题", ACTION_CLEAN, 2.0 * len(md_lines),
+                  lines=md_lines[:5])
+        if ratio > config["max_repeat_ratio"]:
+            issue("repetition", "error", f"重复片段占比 {ratio:.1%}，例如「{sample}」", ACTION_REGENERATE,
+                  min(60.0, ratio * 200), value=round(ratio, 3))
+        elif ratio > config["max_repeat_ratio"] / 2:
+            issue("repetition", "warning", f"重复片段占比 {ratio:.1%}", ACTION_REGENERATE, ratio * 100, value=round(ratio, 3))
+
+    score = max(0, round(score))
+    fixes = {item["fix"] for item in issues if item["severity"] == "error"}
+    if score < config["min_score"] and not fixes:
+        fixes = {item["fix"] for item in issues}
+    # 重新生成覆盖一切；本地清理不花费调用，先于续写执行
+    action = ACTION_ACCEPT
+    for candidate in (ACTION_REGENERATE, ACTION_CLEAN, ACTION_CONTINUE):
+        if candidate in fixes:
+            action = candidate
+            break
+    return {
+        "ok": action == ACTION_ACCEPT,
+        "score": score,
+        "action": action,
+        "length": length,
+        "target": target,
+        "length_ratio": round(length / target, 3),
+        "repeat_ratio": round(ratio, 3),
+        "markdown_lines": len(md_lines),
+        "issues": issues
+    }
+
+
+def strip_markdown(text: str) -> str:
+    """去掉 markdown 标记与分节小标题行，保留正文。"""
+    kept = []
+    lines = (text or "").strip().splitlines()
+    for i, line in enumerate(lines):
+        if i == 0 and _CHAPTER_TITLE_RE.match(line) and not line.lstrip().startswith("#"):
+            kept.append(line)
+            continue
+        # 代码块只去掉 ``` 行本身（整章被包在代码块里时保留正文）
+        if any(regex.match(line) for regex in _DROP_LINE_RES) or _SUBHEADING_RE.match(line):
+            continue
+        line = _LINE_MARKER_RE.sub(r'\1', line)
+        kept.append(_INLINE_MARKDOWN_RE.sub(lambda m: m.group(1) or m.group(2), line))
+    return re.sub(r'\n{3,}', '\n\n', "\n".join(kept)).strip()
+
+
+def continue_draft(invoke: Callable[[str], str], text: str, word_number: int, chapter_number: int,
+                   chapter_title: str = "", tail_chars: int = 1500) -> str:
+    """请 LLM 从草稿结尾处续写，返回拼接后的全文；续写为空时抛出异常。"""
+    length = count_words(text)
+    prompt = chapter_continuation_prompt.format(
+        novel_number=chapter_number,
+        chapter_title=chapter_title or f"第{chapter_number}章",
+        current_length=length,
+        word_number=word_number,
+        draft_tail=text.rstrip()[-tail_chars:],
+        remaining_words=max(300, int(word_number) - length)
+    )
+    addition = (invoke(prompt) or "").strip()
+    if not addition:
+        raise RuntimeError("草稿续写: LLM 返回为空")
+    # 截断在半句话时直接接上，否则另起一段
+    separator = "" if is_truncated(text) else "\n\n"
+    return text.rstrip() + separator + addition
+
+
+def ensure_draft_quality(
+    text: str,
+    word_number: int,
+    chapter_number: int,
+    regenerate: Optional[Callable[[], str]] = None,
+    invoke: Optional[Callable[[str], str]] = None,
+    config: Optional[dict] = None,
+    chapter_title: str = "",
+    emit: Callable[[dict], None] = lambda event: None
+) -> Tuple[str, dict]:
+    """
+    检查草稿并按建议自动处理：清理格式、续写（需要 invoke）或重新生成（需要 regenerate），
+    最多处理 max_attempts 次（本地清理不计入）。返回 (处理后的正文, 最终报告)，
+    报告的 "history" 中依次记录每一轮的分数、问题与处理方式。
+    """
+    config = quality_config(config)
+    history: List[Dict[str, object]] = []
+    attempts = 0
+    while True:
+        report = validate_draft(text, word_number, config)
+        action = report["action"]
+        if action == ACTION_CLEAN and config["strip_markdown"]:
+            cleaned = strip_markdown(text)
+            if cleaned != text and markdown_lines(cleaned) != markdown_lines(text):
+                history.append({"score": report["score"], "issues": [i["code"] for i in report["issues"]], "action": action})
+                text = cleaned
+                continue
+        if action == ACTION_CLEAN:
+            action = ACTION_REGENERATE
+        if action == ACTION_ACCEPT or attempts >= config["max_attempts"]:
+            break
+        if action == ACTION_CONTINUE and config["auto_continue"] and invoke is not None:
+            next_text = lambda: continue_draft(invoke, text, word_number, chapter_number, chapter_title,
+                                               int(config["continuation_tail_chars"]))
+        elif config["auto_regenerate"] and regenerate is not None:
+            action, next_text = ACTION_REGENERATE, regenerate
+        else:
+            break
+        history.append({"score": report["score"], "issues": [i["code"] for i in report["issues"]], "action": action})
+        emit({"event": "draft_quality_retry", "chapter": chapter_number, "action": action, "score": report["score"],
+              "issues": [i["code"] for i in report["issues"]]})
+        logging.info(f"[draft_quality] 第{chapter_number}章草稿得分 {report['score']}，处理方式: {action}")
+        attempts += 1
+        text = next_text() or ""
+    report["history"] = history
+    return text, report
+
+
+def quality_report_file(filepath: str, chapter_number: int) -> str:
+    return os.path.join(filepath, QUALITY_DIR, f"chapter_{chapter_number}.json")
+
+
+def save_quality_report(filepath: str, chapter_number: int, report: dict):
+    os.makedirs(os.path.join(filepath, QUALITY_DIR), exist_ok=True)
+    save_data_to_json(report, quality_report_file(filepath, chapter_number))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="章节草稿本地质量检查")
+    parser.add_argument("filepath", help="小说项目保存路径")
+    parser.add_argument("chapter", type=int, help="章节号")
+    parser.add_argument("--word-number", type=int, default=3000, help="每章目标字数")
+    args = parser.parse_args()
+    chapter_text = read_file(os.path.join(args.filepath, "chapters", f"chapter_{args.chapter}.txt"))
+    result = validate_draft(chapter_text, args.word_number)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    sys.exit(0 if result["ok"] else 1)
@@ -0,0 +1,148 @@
+# novel_generator/finalize_graph.py
+# -*- coding: utf-8 -*-
+"""
+以依赖图并发执行定稿的各个子步骤：
+
+    chapter_text ──────┬── summary          (分层摘要，见 summary_store -> global_summary.txt)
+    character_names ───┼── character_state  (出场角色的增量更新，见 character_store -> character_state.txt)
+                       └── vectorstore      (增量更新本地向量库，切块带卷号与出场人物元数据)
+
+character_names 在角色状态更新之前读取已登记的角色名，向量库切块的人物标注因此不随两个节点的先后而变；
+本章新登场的角色在之后重新定稿本章时补标。
+三个更新互不依赖，定稿耗时约等于最慢的单个子步骤；
+某个子步骤失败不影响其它子步骤的结果，可用 only=[...] 单独重跑。
+"""
+import os
+import logging
+from typing import Callable, Dict, Iterable, Optional
+
+from llm_adapters import create_llm_adapter
+from embedding_adapters import create_embedding_adapter
+from prompt_definitions import update_character_state_prompt
+from utils import read_file, save_string_to_txt
+from .blueprint_index import get_blueprint_index
+from .chapter_indexing import update_chapter_vector_store
+from .character_store import all_names, load_character_store, structured_state_available, update_character_state_delta
+from .summary_store import ARC_SIZE, arc_of, update_hierarchical_summary
+from .task_graph import TaskGraph
+
+NODE_CHAPTER_TEXT = "chapter_text"
+NODE_CHARACTER_NAMES = "character_names"
+NODE_SUMMARY = "summary"
+NODE_CHARACTER_STATE = "character_state"
+NODE_VECTORSTORE = "vectorstore"
+
+# 正文字数低于目标字数的该比例时，先扩写再定稿
+ENRICH_RATIO = 0.7
+
+
+def _invoke_checked(llm_adapter, prompt: str, what: str) -> str:
+    """LLM 适配器出错时返回空串，这里统一转换为异常，交给图执行器重试/隔离。"""
+    result = (llm_adapter.invoke(prompt) or "").strip()
+    if not result:
+        raise RuntimeError(f"{what}: LLM 返回为空")
+    return result
+
+
+def build_finalize_graph(
+    llm_adapter,
+    embedding_adapter,
+    filepath: str,
+    chapter_number: int,
+    word_number: int = 0,
+    retries: int = 1,
+    enrich: Optional[Callable[[str], str]] = None,
+    arc_size: int = ARC_SIZE
+) -> TaskGraph:
+    """
+    :param enrich: 正文过短时的扩写函数 (text -> text)，为空则不扩写
+    :param arc_size: 每多少章汇总一次阶段摘要
+    """
+    chapter_file = os.path.join(filepath, "chapters", f"chapter_{chapter_number}.txt")
+    character_state_file = os.path.join(filepath, "character_state.txt")
+
+    def load_chapter_text(_inputs) -> str:
+        text = read_file(chapter_file).strip()
+        if not text:
+            raise RuntimeError(f"第{chapter_number}章正文为空: {chapter_file}")
+        if enrich and word_number and len(text) < ENRICH_RATIO * word_number:
+            enriched = (enrich(text) or "").strip()
+            if enriched:
+                text = enriched
+                save_string_to_txt(text, chapter_file)
+        return text
+
+    def update_summary(inputs) -> str:
+        return update_hierarchical_summary(llm_adapter, filepath, chapter_number, inputs[NODE_CHAPTER_TEXT], arc_size)["context"]
+
+    def update_character_state(inputs) -> str:
+        if structured_state_available(filepath):
+            return update_character_state_delta(llm_adapter, filepath, chapter_number, inputs[NODE_CHAPTER_TEXT])["text"]
+        # 无法解析的旧格式角色状态，仍按整篇重写
+        prompt = update_character_state_prompt.format(chapter_text=inputs[NODE_CHAPTER_TEXT], old_state=read_file(character_state_file))
+        new_state = _invoke_checked(llm_adapter, prompt, "角色状态更新")
+        save_string_to_txt(new_state, character_state_file)
+        return new_state
+
+    def update_vectorstore(inputs) -> Dict[str, int]:
+        # 目录未分卷时，按分层摘要的分段（每 arc_size 章一卷）记录卷号
+        volume = get_blueprint_index(filepath).volume_of(chapter_number) or arc_of(chapter_number, arc_size)
+        return update_chapter_vector_store(embedding_adapter, inputs[NODE_CHAPTER_TEXT], filepath, chapter_number,
+                                           volume=volume, character_names=inputs[NODE_CHARACTER_NAMES])
+
+    graph = TaskGraph(f"finalize_chapter_{chapter_number}")
+    graph.add(NODE_CHAPTER_TEXT, load_chapter_text)
+    graph.add(NODE_CHARACTER_NAMES, lambda _inputs: all_names(load_character_store(filepath)))
+    graph.add(NODE_SUMMARY, update_summary, deps=[NODE_CHAPTER_TEXT], retries=retries)
+    graph.add(NODE_CHARACTER_STATE, update_character_state, deps=[NODE_CHAPTER_TEXT, NODE_CHARACTER_NAMES], retries=retries)
+    graph.add(NODE_VECTORSTORE, update_vectorstore, deps=[NODE_CHAPTER_TEXT, NODE_CHARACTER_NAMES], retries=retries)
+    return graph
+
+
+def finalize_chapter_graph(
+    novel_number: int,
+    word_number: int,
+    api_key: str,
+    base_url: str,
+    model_name: str,
+    temperature: float,
+    filepath: str,
+    embedding_api_key: str,
+    embedding_url: str,
+    embedding_interface_format: str,
+    embedding_model_name: str,
+    interface_format: str,
+    max_tokens: int,
+    timeout: int = 600,
+    retries: int = 1,
+    arc_size: int = ARC_SIZE,
+    only: Optional[Iterable[str]] = None,
+    previous: Optional[Dict[str, dict]] = None,
+    emit: Callable[[dict], None] = lambda event: None
+) -> Dict[str, dict]:
+    """
+    与 finalize_chapter 参数一致的并发版本，返回各节点的状态与耗时。
+    only / previous 用于只重跑失败的子步骤，例如：
+        results = finalize_chapter_graph(...)
+        finalize_chapter_graph(..., only=failed_nodes(results), previous=results)
+    """
+    llm_adapter = create_llm_adapter(
+        interface_format=interface_format,
+        base_url=base_url,
+        model_name=model_name,
+        api_key=api_key,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        timeout=timeout
+    )
+    embedding_adapter = create_embedding_adapter(embedding_interface_format, embedding_api_key, embedding_url, embedding_model_name)
+
+    def enrich(text: str) -> str:
+        from .finalization import enrich_chapter_text
+        return enrich_chapter_text(text, word_number, api_key, base_url, model_name, temperature, interface_format, max_tokens, timeout)
+
+    graph = build_finalize_graph(llm_adapter, embedding_adapter, filepath, novel_number, word_number, retries, enrich, arc_size)
+    results = graph.run(emit=emit, only=only, previous=previous)
+    timing = ", ".join(f"{name} {r['seconds']:.1f}s/{r['status']}" for name, r in results.items())
+    logging.info(f"[finalize_chapter_graph] 第{novel_number}章定稿: {timing}")
+    return results
@@ -0,0 +1,284 @@
+# novel_generator/job_queue.py
+# -*- coding: utf-8 -*-
+"""
+多项目任务队列与工作线程池（供 server.py 使用）：
+- 任务与进度事件持久化在 SQLite 中，服务重启后排队中的任务继续执行，执行到一半的任务重新排队
+  （步骤日志会跳过已完成的步骤，见 step_journal）；
+- 同一项目同时只执行一个任务，避免多个任务同时改写同一目录下的文件；
+- 按 LLM 接口（config 中的 last_interface_format）限制同时进行的 LLM 调用数（所有任务合计，
+  包括任务内部并行的调用，见 utils.set_provider_call_limits），吞吐随各家配额扩展。
+"""
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from config_manager import load_config
+from utils import set_provider_call_limits
+from .runner import STEP_ARCHITECTURE, STEP_BLUEPRINT, resolve_run_settings, run_pipeline
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+STATUS_CANCELLED = "cancelled"
+
+DEFAULT_PROVIDER_LIMIT = 2
+PROGRESS_EVENTS = ("step_done", "step_skipped", "step_failed")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    project TEXT NOT NULL,
+    config TEXT NOT NULL,
+    steps TEXT NOT NULL,
+    chapter_start INTEGER NOT NULL,
+    chapter_end INTEGER NOT NULL,
+    options TEXT NOT NULL,
+    provider TEXT NOT NULL,
+    status TEXT NOT NULL,
+    progress_done INTEGER NOT NULL DEFAULT 0,
+    progress_total INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    error TEXT,
+    result TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id);
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id INTEGER NOT NULL,
+    ts REAL NOT NULL,
+    event TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS events_job ON events (job_id, id);
+"""
+
+
+def count_job_steps(steps: List[str], chapter_start: int, chapter_end: int) -> int:
+    """任务包含的步骤总数（架构/目录各一次，其余每章一次），用于进度显示。"""
+    global_steps = [s for s in steps if s in (STEP_ARCHITECTURE, STEP_BLUEPRINT)]
+    chapter_steps = [s for s in steps if s not in global_steps]
+    return len(global_steps) + len(chapter_steps) * max(0, chapter_end - chapter_start + 1)
+
+
+class JobQueue:
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+    def _row_to_job(self, row: sqlite3.Row) -> dict:
+        job = dict(row)
+        for key in ("steps", "options", "result"):
+            job[key] = json.loads(job[key]) if job[key] else None
+        job["progress"] = {"done": job.pop("progress_done"), "total": job.pop("progress_total")}
+        return job
+
+    def enqueue(self, project: str, steps: List[str], config: str = "config.json",
+                chapter_start: int = 1, chapter_end: Optional[int] = None, options: Optional[dict] = None) -> dict:
+        """
+        加入一个任务；接口类型与默认结束章节从配置中解析。
+        options: overrides（覆盖 other_params）、quality（覆盖 draft_quality）、skip_existing、keep_going、pipeline、
+        parallel_blueprint、resume。
+        """
+        options = dict(options or {})
+        overrides = dict(options.get("overrides") or {}, filepath=project)
+        settings = resolve_run_settings(load_config(config), overrides)
+        chapter_end = int(chapter_end or settings["params"]["num_chapters"])
+        total = count_job_steps(steps, chapter_start, chapter_end)
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO jobs (project, config, steps, chapter_start, chapter_end, options, provider, status,"
+                " progress_total, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (os.path.abspath(project), config, json.dumps(steps), chapter_start, chapter_end,
+                 json.dumps(options, ensure_ascii=False), settings["interface_format"], STATUS_QUEUED, total, time.time())
+            )
+            job_id = cursor.lastrowid
+        return self.get(job_id)
+
+    def claim(self) -> Optional[dict]:
+        """取出最早的可执行任务（所属项目没有执行中的任务）并标记为执行中。"""
+        with self._lock:
+            running = self._conn.execute("SELECT project FROM jobs WHERE status = ?", (STATUS_RUNNING,)).fetchall()
+            busy_projects = {row["project"] for row in running}
+            queued = self._conn.execute("SELECT id, project FROM jobs WHERE status = ? ORDER BY id",
+                                        (STATUS_QUEUED,)).fetchall()
+            for row in queued:
+                if row["project"] in busy_projects:
+                    continue
+                self._conn.execute("UPDATE jobs SET status = ?, started_at = ? WHERE id = ?",
+                                   (STATUS_RUNNING, time.time(), row["id"]))
+                break
+            else:
+                return None
+        return self.get(row["id"])
+
+    def add_event(self, job_id: int, event: dict):
+        with self._lock:
+            self._conn.execute("INSERT INTO events (job_id, ts, event) VALUES (?, ?, ?)",
+                               (job_id, time.time(), json.dumps(event, ensure_ascii=False)))
+            if event.get("event") in PROGRESS_EVENTS and event.get("step") != "prep":
+                self._conn.execute("UPDATE jobs SET progress_done = progress_done + 1 WHERE id = ?", (job_id,))
+
+    def finish(self, job_id: int, status: str, result: Optional[dict] = None, error: Optional[str] = None):
+        with self._lock:
+            self._conn.execute("UPDATE jobs SET status = ?, finished_at = ?, result = ?, error = ? WHERE id = ?",
+                               (status, time.time(), json.dumps(result, ensure_ascii=False) if result is not None else None,
+                                error, job_id))
+
+    def cancel(self, job_id: int) -> bool:
+        """取消排队中的任务；执行中的任务不能取消，返回 False。"""
+        with self._lock:
+            cursor = self._conn.execute("UPDATE jobs SET status = ?, finished_at = ? WHERE id = ? AND status = ?",
+                                        (STATUS_CANCELLED, time.time(), job_id, STATUS_QUEUED))
+            return cursor.rowcount == 1
+
+    def requeue_running(self) -> int:
+        """服务启动时调用：上次退出时仍在执行的任务重新排队，返回数量。"""
+        with self._lock:
+            cursor = self._conn.execute("UPDATE jobs SET status = ?, started_at = NULL, progress_done = 0 WHERE status = ?",
+                                        (STATUS_QUEUED, STATUS_RUNNING))
+            return cursor.rowcount
+
+    def get(self, job_id: int) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def list(self, status: Optional[str] = None, project: Optional[str] = None, limit: int = 100) -> List[dict]:
+        query, args = "SELECT * FROM jobs WHERE 1 = 1", []
+        if status:
+            query += " AND status = ?"
+            args.append(status)
+        if project:
+            query += " AND project = ?"
+            args.append(os.path.abspath(project))
+        query += " ORDER BY id DESC LIMIT ?"
+        args.append(limit)
+        with self._lock:
+            rows = self._conn.execute(query, args).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def events(self, job_id: int, since: int = 0, limit: int = 500) -> List[dict]:
+        """id 大于 since 的进度事件，按顺序返回；轮询时把上次最后一个事件的 id 作为 since。"""
+        with self._lock:
+            rows = self._conn.execute("SELECT id, ts, event FROM events WHERE job_id = ? AND id > ? ORDER BY id LIMIT ?",
+                                      (job_id, since, limit)).fetchall()
+        return [dict(json.loads(row["event"]), id=row["id"], ts=round(row["ts"], 3)) for row in rows]
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        return {row["status"]: row["n"] for row in rows}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def run_job(job: dict, emit: Callable[[dict], None]) -> Dict[str, List]:
+    """按任务记录执行 run_pipeline（与 cli.py 的参数含义相同）。"""
+    options = job["options"] or {}
+    overrides = dict(options.get("overrides") or {}, filepath=job["project"])
+    settings = resolve_run_settings(load_config(job["config"]), overrides)
+    settings["quality"].update(options.get("quality") or {})
+    return run_pipeline(
+        settings,
+        job["steps"],
+        chapter_start=job["chapter_start"],
+        chapter_end=job["chapter_end"],
+        emit=emit,
+        skip_existing=bool(options.get("skip_existing")),
+        stop_on_error=not options.get("keep_going"),
+        pipelined=bool(options.get("pipeline")),
+        parallel_blueprint=bool(options.get("parallel_blueprint")),
+        resume=options.get("resume", True)
+    )
+
+
+class JobWorkerPool:
+    """
+    调度线程从队列中取任务交给线程池执行；max_workers 为同时执行的任务数上限。
+    provider_limits 为各接口（如 {"OpenAI": 4, "DeepSeek": 2}）同时进行的 LLM 调用数上限，未列出的接口使用 default_limit；
+    限制作用在适配器的每次调用上，任务内部并行生成（流水线、并行目录等）时同样生效。
+    """
+
+    def __init__(self, queue: JobQueue, max_workers: int = 4, provider_limits: Optional[Dict[str, int]] = None,
+                 default_limit: int = DEFAULT_PROVIDER_LIMIT, poll_interval: float = 1.0,
+                 job_runner: Callable[[dict, Callable[[dict], None]], Dict[str, List]] = run_job):
+        self.queue = queue
+        self.max_workers = max_workers
+        self.provider_limits = dict(provider_limits or {})
+        self.default_limit = default_limit
+        self.poll_interval = poll_interval
+        self.job_runner = job_runner
+        set_provider_call_limits(self.provider_limits, default_limit)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._active = 0
+        self._active_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._dispatcher: Optional[threading.Thread] = None
+
+    def start(self):
+        requeued = self.queue.requeue_running()
+        if requeued:
+            logging.info(f"[job_queue] {requeued} 个中断的任务重新排队")
+        self._dispatcher = threading.Thread(target=self._dispatch, name="job-dispatcher", daemon=True)
+        self._dispatcher.start()
+
+    def wake(self):
+        """有新任务或任务结束时唤醒调度线程。"""
+        self._wakeup.set()
+
+    def stop(self, wait: bool = True):
+        self._stopping.set()
+        self._wakeup.set()
+        if self._dispatcher is not None:
+            self._dispatcher.join()
+        self._executor.shutdown(wait=wait)
+
+    def active_count(self) -> int:
+        with self._active_lock:
+            return self._active
+
+    def _dispatch(self):
+        while not self._stopping.is_set():
+            job = None
+            if self.active_count() < self.max_workers:
+                job = self.queue.claim()
+            if job is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+            with self._active_lock:
+                self._active += 1
+            self._executor.submit(self._run, job)
+
+    def _run(self, job: dict):
+        job_id = job["id"]
+        logging.info(f"[job_queue] 任务 {job_id} 开始: {job['project']} {job['steps']}")
+        self.queue.add_event(job_id, {"event": "job_start", "provider": job["provider"]})
+        result, error = None, None
+        try:
+            result = self.job_runner(job, lambda event: self.queue.add_event(job_id, event))
+            status = STATUS_FAILED if result["failed"] else STATUS_DONE
+        except Exception as e:
+            logging.error(f"[job_queue] 任务 {job_id} 异常: {traceback.format_exc()}")
+            status, error = STATUS_FAILED, str(e)
+        self.queue.add_event(job_id, {"event": "job_done", "status": status, "error": error})
+        self.queue.finish(job_id, status, result=result, error=error)
+        logging.info(f"[job_queue] 任务 {job_id} 结束: {status}")
+        with self._active_lock:
+            self._active -= 1
+        self.wake()
@@ -0,0 +1,171 @@
+# novel_generator/knowledge_parallel.py
+# -*- coding: utf-8 -*-
+"""
+多文件知识库并行导入：
+- 进程池并行读取、切分文件（CPU 密集部分随核数扩展）；
+- 切分结果汇入共享的批量 embedding 队列，由线程池并发请求 Embedding 接口；
+- 只有一个写入者（调用线程）按顺序写入本地向量库，避免并发写冲突；
+- 报告 文件/秒、片段/秒 与 等待 embedding 的时间；
+- 单个文件解析或 embedding 失败时记录到 errors 并继续导入其它文件，失败的文件不写检查点，重新导入时重做。
+注意：Windows 下使用进程池时，调用方入口需要放在 if __name__ == "__main__" 之下。
+"""
+import os
+import glob
+import time
+import logging
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+from .local_vectorstore import open_local_vector_store
+from .knowledge_stream import (
+    EMBED_BATCH_SIZE,
+    _checkpoint_path,
+    _file_fingerprint,
+    _load_checkpoint,
+    _save_checkpoint,
+)
+from .text_splitter import ChineseSentenceSplitter, DEFAULT_CHUNK_TOKENS, DEFAULT_OVERLAP_TOKENS
+
+DEFAULT_PATTERN = "*.txt"
+EMBED_THREADS = 4
+
+
+def resolve_knowledge_files(source: str, pattern: str = DEFAULT_PATTERN) -> List[str]:
+    """source 为目录时递归匹配 pattern；否则把 source 本身当作 glob 表达式。"""
+    if os.path.isdir(source):
+        files = glob.glob(os.path.join(source, "**", pattern), recursive=True)
+    else:
+        files = glob.glob(source, recursive=True)
+    return sorted(f for f in files if os.path.isfile(f))
+
+
+def _parse_file(path: str, chunk_tokens: int) -> Tuple[str, str, List[str]]:
+    """进程池任务：读取并切分单个文件，返回 (路径, 文件指纹, 片段)。"""
+    fingerprint = _file_fingerprint(path)
+    with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+        text = f.read()
+    return path, fingerprint, ChineseSentenceSplitter(chunk_tokens, DEFAULT_OVERLAP_TOKENS).split_text(text)
+
+
+def import_knowledge_directory(
+    embedding_adapter,
+    source: str,
+    filepath: str,
+    pattern: str = DEFAULT_PATTERN,
+    workers: Optional[int] = None,
+    embed_threads: int = EMBED_THREADS,
+    batch_size: int = EMBED_BATCH_SIZE,
+    chunk_tokens: int = DEFAULT_CHUNK_TOKENS,
+    progress_callback: Optional[Callable[[dict], None]] = None
+) -> Dict[str, object]:
+    """
+    并行导入目录（或 glob）下的全部知识文件。已完整导入过的文件（检查点为 done）会被跳过。
+    返回统计：files、skipped、failed、chunks、seconds、files_per_sec、chunks_per_sec、embed_wait_seconds，
+    以及 errors（[{"file", "error"}]，失败的文件）。
+    """
+    files = resolve_knowledge_files(source, pattern)
+    store = open_local_vector_store(filepath, embedding_adapter)
+    stats = {"files": 0, "skipped": 0, "failed": 0, "chunks": 0, "seconds": 0.0, "embed_wait_seconds": 0.0, "errors": []}
+    start_time = time.time()
+
+    pending_files = []
+    for path in files:
+        if _load_checkpoint(_checkpoint_path(filepath, _file_fingerprint(path))).get("done"):
+            stats["skipped"] += 1
+        else:
+            pending_files.append(path)
+
+    # 每个文件尚未写入的片段数；归零时写入 done 检查点
+    remaining: Dict[str, int] = {}
+    file_info: Dict[str, Tuple[str, int]] = {}
+    failed = set()
+
+    def report_error(path: str, error: Exception):
+        logging.error(f"[import_knowledge_directory] 文件导入失败，已跳过: {path}: {error}")
+        stats["failed"] += 1
+        stats["errors"].append({"file": path, "error": str(error)})
+        if progress_callback:
+            progress_callback({"file": path, "error": str(error), "files_done": stats["files"],
+                               "files_total": len(pending_files), "chunks": stats["chunks"]})
+
+    inflight: Deque[Tuple[List[str], List[dict], List[str], List[str], object]] = deque()
+    buffer_texts: List[str] = []
+    buffer_metas: List[dict] = []
+    buffer_ids: List[str] = []
+    buffer_owner: List[str] = []
+
+    def write_oldest():
+        texts, metas, ids, owners, future = inflight.popleft()
+        wait_start = time.time()
+        try:
+            embeddings = future.result()
+        except Exception as e:
+            embeddings = None
+            for owner in dict.fromkeys(owners):
+                if owner not in failed:
+                    failed.add(owner)
+                    report_error(file_info[owner][0], e)
+        stats["embed_wait_seconds"] += time.time() - wait_start
+        if embeddings is not None:
+            keep = [i for i, owner in enumerate(owners) if owner not in failed]
+            if keep:
+                store.add_texts([texts[i] for i in keep], metadatas=[metas[i] for i in keep], ids=[ids[i] for i in keep],
+                                embeddings=[embeddings[i] for i in keep])
+                stats["chunks"] += len(keep)
+        for owner in owners:
+            remaining[owner] -= 1
+            if remaining[owner] == 0 and owner not in failed:
+                path, total = file_info[owner]
+                _save_checkpoint(_checkpoint_path(filepath, owner), {"file": os.path.abspath(path), "offset": os.path.getsize(path), "chunks": total, "done": True})
+                stats["files"] += 1
+                if progress_callback:
+                    elapsed = max(time.time() - start_time, 1e-6)
+                    progress_callback({"file": path, "files_done": stats["files"], "files_total": len(pending_files),
+                                       "chunks": stats["chunks"], "files_per_sec": stats["files"] / elapsed,
+                                       "chunks_per_sec": stats["chunks"] / elapsed})
+
+    def submit_buffer(embed_pool):
+        nonlocal buffer_texts, buffer_metas, buffer_ids, buffer_owner
+        if not buffer_texts:
+            return
+        future = embed_pool.submit(embedding_adapter.embed_documents, buffer_texts)
+        inflight.append((buffer_texts, buffer_metas, buffer_ids, buffer_owner, future))
+        buffer_texts, buffer_metas, buffer_ids, buffer_owner = [], [], [], []
+        # 限制在途批次数量，保证内存有界
+        while len(inflight) > embed_threads * 2:
+            write_oldest()
+
+    with ProcessPoolExecutor(max_workers=workers) as pool, ThreadPoolExecutor(max_workers=embed_threads) as embed_pool:
+        futures = {pool.submit(_parse_file, path, chunk_tokens): path for path in pending_files}
+        for future in as_completed(futures):
+            try:
+                path, fingerprint, chunks = future.result()
+            except Exception as e:
+                report_error(futures[future], e)
+                continue
+            if not chunks:
+                continue
+            remaining[fingerprint] = len(chunks)
+            file_info[fingerprint] = (path, len(chunks))
+            source_name, source_path = os.path.basename(path), os.path.abspath(path)
+            for i, chunk in enumerate(chunks):
+                buffer_texts.append(chunk)
+                buffer_metas.append({"source": "knowledge", "file": source_name, "path": source_path, "chunk_index": i})
+                buffer_ids.append(f"knowledge_{fingerprint[:12]}_{i}")
+                buffer_owner.append(fingerprint)
+                if len(buffer_texts) >= batch_size:
+                    submit_buffer(embed_pool)
+        submit_buffer(embed_pool)
+        while inflight:
+            write_oldest()
+
+    elapsed = max(time.time() - start_time, 1e-6)
+    stats["seconds"] = elapsed
+    stats["files_per_sec"] = stats["files"] / elapsed
+    stats["chunks_per_sec"] = stats["chunks"] / elapsed
+    logging.info(
+        f"[import_knowledge_directory] 导入 {stats['files']} 个文件（跳过 {stats['skipped']}，失败 {stats['failed']}），{stats['chunks']} 个片段，"
+        f"{stats['files_per_sec']:.2f} 文件/秒，{stats['chunks_per_sec']:.1f} 片段/秒，等待 embedding {stats['embed_wait_seconds']:.1f}s"
+    )
+    return stats
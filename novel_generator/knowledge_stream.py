@@ -0,0 +1,161 @@
+# novel_generator/knowledge_stream.py
+# -*- coding: utf-8 -*-
+"""
+流式、内存有界的知识库导入：
+- 按固定字节块流式读取文件，逐块切分，不把整个文件读入内存；
+- 按批次 embedding 并写入本地向量库，每个读块写完后记录检查点；
+- 导入中途失败时，重新导入同一文件会从最后一次提交的字节偏移处继续。
+"""
+import os
+import json
+import time
+import hashlib
+import logging
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from .local_vectorstore import get_local_vectorstore_dir, open_local_vector_store
+from .text_splitter import ChineseSentenceSplitter, DEFAULT_CHUNK_TOKENS, DEFAULT_OVERLAP_TOKENS
+
+READ_BLOCK_BYTES = 1 << 20
+EMBED_BATCH_SIZE = 64
+
+
+def _file_fingerprint(path: str) -> str:
+    """用路径、大小与文件头尾内容标识文件，文件被修改后检查点自动失效。"""
+    size = os.path.getsize(path)
+    h = hashlib.sha1(f"{os.path.abspath(path)}|{size}".encode('utf-8'))
+    with open(path, 'rb') as f:
+        h.update(f.read(65536))
+        if size > 65536:
+            f.seek(max(0, size - 65536))
+            h.update(f.read(65536))
+    return h.hexdigest()
+
+
+def _checkpoint_dir(filepath: str) -> str:
+    return os.path.join(get_local_vectorstore_dir(filepath), "import_checkpoints")
+
+
+def _checkpoint_path(filepath: str, fingerprint: str) -> str:
+    return os.path.join(_checkpoint_dir(filepath), f"{fingerprint}.json")
+
+
+def _load_checkpoint(path: str) -> dict:
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        logging.warning(f"[knowledge_stream] 检查点读取失败，将从头导入: {e}")
+        return {}
+
+
+def _save_checkpoint(path: str, data: dict):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def iter_file_chunks(
+    path: str,
+    start_offset: int = 0,
+    chunk_tokens: int = DEFAULT_CHUNK_TOKENS,
+    block_bytes: int = READ_BLOCK_BYTES,
+    split_func: Optional[Callable[[str], List[str]]] = None
+) -> Iterator[Tuple[List[str], int]]:
+    """
+    从 start_offset 开始流式读取 UTF-8 文件，产出 (片段列表, 下一次可安全续读的字节偏移)。
+    每块只在最后一个换行处截断，未完成的段落留到下一块，保证偏移始终落在段落边界上。
+    默认使用句子感知的 ChineseSentenceSplitter 切分。
+    """
+    split = split_func or ChineseSentenceSplitter(chunk_tokens, DEFAULT_OVERLAP_TOKENS).split_text
+    with open(path, 'rb') as f:
+        f.seek(start_offset)
+        offset = start_offset
+        pending = b""
+        while True:
+            block = f.read(block_bytes)
+            if not block:
+                break
+            data = pending + block
+            cut = data.rfind(b"\n")
+            if cut < 0:
+                if len(data) < block_bytes * 4:
+                    pending = data
+                    continue
+                # 超长无换行文本：退回到 UTF-8 字符边界强制截断，避免缓冲无限增长
+                cut = len(data) - 1
+                while cut > 0 and (data[cut] & 0xC0) == 0x80:
+                    cut -= 1
+                cut -= 1
+            complete, pending = data[:cut + 1], data[cut + 1:]
+            offset += len(complete)
+            chunks = split(complete.decode('utf-8', errors='ignore'))
+            if chunks:
+                yield chunks, offset
+        if pending:
+            offset += len(pending)
+            chunks = split(pending.decode('utf-8', errors='ignore'))
+            if chunks:
+                yield chunks, offset
+
+
+def stream_import_knowledge_file(
+    embedding_adapter,
+    file_path: str,
+    filepath: str,
+    batch_size: int = EMBED_BATCH_SIZE,
+    chunk_tokens: int = DEFAULT_CHUNK_TOKENS,
+    progress_callback: Optional[Callable[[dict], None]] = None,
+    split_func: Optional[Callable[[str], List[str]]] = None,
+    block_bytes: int = READ_BLOCK_BYTES
+) -> dict:
+    """
+    流式导入知识文件到本地向量库，峰值内存只与 batch_size 和读块大小有关。
+    每个读块的片段写入向量库后保存检查点 {offset, chunks}；导入完成后检查点标记为 done。
+    返回导入统计。
+    """
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"知识库文件不存在: {file_path}")
+
+    store = open_local_vector_store(filepath, embedding_adapter)
+    fingerprint = _file_fingerprint(file_path)
+    ckpt_path = _checkpoint_path(filepath, fingerprint)
+    ckpt = _load_checkpoint(ckpt_path)
+    if ckpt.get("done"):
+        logging.info(f"[stream_import_knowledge_file] 文件已导入过，跳过: {file_path}")
+        return {"file": file_path, "chunks": ckpt.get("chunks", 0), "skipped": True}
+
+    offset = ckpt.get("offset", 0)
+    chunk_count = ckpt.get("chunks", 0)
+    total_bytes = os.path.getsize(file_path)
+    source_name = os.path.basename(file_path)
+    source_path = os.path.abspath(file_path)
+    start_time = time.time()
+    if offset:
+        logging.info(f"[stream_import_knowledge_file] 从偏移 {offset}/{total_bytes} 处继续导入: {file_path}")
+
+    def write_batch(texts: List[str]):
+        nonlocal chunk_count
+        ids = [f"knowledge_{fingerprint[:12]}_{chunk_count + i}" for i in range(len(texts))]
+        metadatas = [{"source": "knowledge", "file": source_name, "path": source_path, "chunk_index": chunk_count + i}
+                     for i in range(len(texts))]
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        chunk_count += len(texts)
+
+    for chunks, next_offset in iter_file_chunks(file_path, offset, chunk_tokens, block_bytes=block_bytes, split_func=split_func):
+        for i in range(0, len(chunks), batch_size):
+            write_batch(chunks[i:i + batch_size])
+        # 整块片段全部写入后才推进检查点；中途崩溃时从上一块边界重做，
+        # 片段 id 由偏移确定，重做的写入会覆盖而不会重复
+        _save_checkpoint(ckpt_path, {"file": source_path, "offset": next_offset, "chunks": chunk_count, "done": False})
+        if progress_callback:
+            progress_callback({"file": file_path, "offset": next_offset, "total_bytes": total_bytes, "chunks": chunk_count})
+
+    _save_checkpoint(ckpt_path, {"file": source_path, "offset": total_bytes, "chunks": chunk_count, "done": True})
+    elapsed = time.time() - start_time
+    logging.info(f"[stream_import_knowledge_file] 导入完成: {file_path}，共 {chunk_count} 个片段，耗时 {elapsed:.1f}s")
+    return {"file": file_path, "chunks": chunk_count, "seconds": elapsed, "skipped": False}
@@ -0,0 +1,155 @@
+# novel_generator/lexical_index.py
+# -*- coding: utf-8 -*-
+"""
+基于中文字符二元组 (bigram) 的 BM25 倒排索引。
+向量检索对人名、法宝名、地名等专有名词不敏感，二元组倒排可以精确命中这些词，
+再与向量检索结果做倒数排名融合 (RRF)，在较小的 k 下获得更好的命中率。
+"""
+import os
+import re
+import math
+import json
+import logging
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+RRF_K = 60
+# 快照文件格式版本，结构变化时递增，旧快照会被丢弃重建
+SNAPSHOT_FORMAT = 1
+
+_TOKEN_RE = re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+|[A-Za-z0-9]+')
+
+
+def tokenize_bigrams(text: str) -> List[str]:
+    """
+    中文连续片段切成重叠二元组（单字片段保留单字），英文/数字按单词小写。
+    标点与空白视为片段分隔。
+    """
+    terms: List[str] = []
+    for match in _TOKEN_RE.finditer(text):
+        run = match.group(0)
+        if run[0].isascii():
+            terms.append(run.lower())
+        elif len(run) == 1:
+            terms.append(run)
+        else:
+            terms.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return terms
+
+
+class BigramBM25Index:
+    """
+    内存中的 BM25 倒排索引，支持增量 add / remove，并可保存为 JSON 快照。
+    """
+    def __init__(self):
+        self.postings: Dict[str, Dict[str, int]] = defaultdict(dict)
+        self.doc_len: Dict[str, int] = {}
+        self.doc_terms: Dict[str, Tuple[str, ...]] = {}
+        self.total_len = 0
+        self.version = -1
+        self.store_id = ""
+
+    def __len__(self):
+        return len(self.doc_len)
+
+    def add(self, doc_id: str, text: str):
+        if doc_id in self.doc_len:
+            self.remove(doc_id)
+        counts = Counter(tokenize_bigrams(text))
+        for term, tf in counts.items():
+            self.postings[term][doc_id] = tf
+        length = sum(counts.values())
+        self.doc_len[doc_id] = length
+        self.doc_terms[doc_id] = tuple(counts.keys())
+        self.total_len += length
+
+    def remove(self, doc_id: str):
+        terms = self.doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            posting = self.postings.get(term)
+            if posting is not None:
+                posting.pop(doc_id, None)
+                if not posting:
+                    del self.postings[term]
+        self.total_len -= self.doc_len.pop(doc_id, 0)
+
+    def search(self, query: str, k: int = 10, candidates: Optional[Iterable[str]] = None) -> List[Tuple[str, float]]:
+        """返回 [(doc_id, bm25 分数)]，分数降序；candidates 不为空时只在其中打分。"""
+        n_docs = len(self.doc_len)
+        if n_docs == 0 or k <= 0:
+            return []
+        allowed = set(candidates) if candidates is not None else None
+        avg_len = self.total_len / n_docs if n_docs else 1.0
+        scores: Dict[str, float] = defaultdict(float)
+        for term, qtf in Counter(tokenize_bigrams(query)).items():
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            df = len(posting)
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            for doc_id, tf in posting.items():
+                if allowed is not None and doc_id not in allowed:
+                    continue
+                norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * self.doc_len[doc_id] / avg_len)
+                scores[doc_id] += qtf * idf * tf * (BM25_K1 + 1) / norm
+        ranked = sorted(scores.items(), key=lambda x: x[1], reverse=True)
+        return ranked[:k]
+
+    # ----------------- 快照 -----------------
+    def save(self, path: str, version: int, store_id: str = ""):
+        """以 JSON 保存倒排表与文档长度；doc_terms / total_len 在加载时由倒排表推出。"""
+        self.version = version
+        self.store_id = store_id
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                "format": SNAPSHOT_FORMAT,
+                "store_id": store_id,
+                "version": version,
+                "postings": self.postings,
+                "doc_len": self.doc_len,
+            }, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["BigramBM25Index"]:
+        """读取 JSON 快照；文件缺失、损坏或格式不符时返回 None，由调用方重建。"""
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("format") != SNAPSHOT_FORMAT:
+                raise ValueError(f"未知的快照格式: {data.get('format')!r}")
+            index = cls()
+            terms = defaultdict(list)
+            for term, posting in data["postings"].items():
+                index.postings[term] = {doc_id: int(tf) for doc_id, tf in posting.items()}
+                for doc_id in posting:
+                    terms[doc_id].append(term)
+            index.doc_len = {doc_id: int(length) for doc_id, length in data["doc_len"].items()}
+            index.doc_terms = {doc_id: tuple(terms.get(doc_id, ())) for doc_id in index.doc_len}
+            index.total_len = sum(index.doc_len.values())
+            index.version = int(data["version"])
+            index.store_id = str(data.get("store_id", ""))
+        except Exception as e:
+            logging.warning(f"[BigramBM25Index] 快照读取失败，将重建: {e}")
+            return None
+        return index
+
+
+def reciprocal_rank_fusion(ranked_lists: Sequence[Sequence[str]], k: int = RRF_K, weights: Optional[Sequence[float]] = None) -> List[Tuple[str, float]]:
+    """
+    倒数排名融合：score(d) = Σ w_i / (k + rank_i(d))，rank 从 1 开始。
+    """
+    if weights is None:
+        weights = [1.0] * len(ranked_lists)
+    fused: Dict[str, float] = defaultdict(float)
+    for ranked, weight in zip(ranked_lists, weights):
+        for rank, doc_id in enumerate(ranked, start=1):
+            fused[doc_id] += weight / (k + rank)
+    return sorted(fused.items(), key=lambda x: x[1], reverse=True)
@@ -0,0 +1,763 @@
+# novel_generator/local_vectorstore.py
+# -*- coding: utf-8 -*-
+"""
+轻量级本地向量库，可替代 chromadb / langchain_chroma：
+- 向量保存为内存映射的 float32 矩阵 (vectors.f32)，冷启动只需 mmap，不做反序列化；
+- 文本与元数据保存在追加写的元数据表 (meta.jsonl)，删除以墓碑记录表示；
+- 小集合使用 NumPy 暴力检索，超过阈值且安装了 hnswlib 时自动构建 HNSW 图索引；
+- compact() 把存活数据重写为新一代的致密文件：向量连续存放，元数据写成一次 json.load 即可读入的列式快照；
+- open_local_vector_store() 在进程内按项目缓存已打开的实例，避免每个生成步骤重复冷启动。
+对外提供与 vectorstore_utils 中 Chroma 用法一致的 add / search / delete 接口。
+"""
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .lexical_index import BigramBM25Index
+from .metadata_index import MetadataIndex
+
+try:
+    import hnswlib
+except ImportError:  # hnswlib 为可选依赖，缺失时始终使用暴力检索
+    hnswlib = None
+
+VECTORS_FILE = "vectors.f32"
+META_FILE = "meta.jsonl"
+SNAPSHOT_FILE = "snapshot.json"
+HEADER_FILE = "store.json"
+HNSW_FILE = "hnsw.bin"
+LEXICAL_FILE = "lexical.json"
+
+DEFAULT_HNSW_THRESHOLD = 20000
+# 墓碑行占比超过该值时建议压缩
+COMPACTION_DEAD_RATIO = 0.2
+COPY_BATCH_ROWS = 65536
+# 二元组索引随写入增量维护，落后磁盘快照超过该版本数时才重写快照；其余时候在压缩/关闭时保存
+LEXICAL_SNAPSHOT_INTERVAL = 64
+
+
+class LocalDocument:
+    """
+    检索结果文档，字段与 langchain 的 Document 保持一致 (page_content / metadata)。
+    """
+    __slots__ = ("page_content", "metadata", "id")
+
+    def __init__(self, page_content: str, metadata: Optional[dict] = None, id: Optional[str] = None):
+        self.page_content = page_content
+        self.metadata = metadata or {}
+        self.id = id
+
+    def __repr__(self):
+        return f"LocalDocument(id={self.id!r}, page_content={self.page_content[:30]!r}...)"
+
+
+def get_local_vectorstore_dir(filepath: str) -> str:
+    """返回项目下本地向量库的存储目录。"""
+    return os.path.join(filepath, "vectorstore", "local")
+
+
+class LocalVectorStore:
+    """
+    内存映射的本地向量库。
+    :param persist_directory: 存储目录
+    :param embedding_function: 任何实现了 embed_documents / embed_query 的对象（如 BaseEmbeddingAdapter）
+    :param hnsw_threshold: 存活向量数超过该值时使用 HNSW 索引（需要 hnswlib）
+    """
+    def __init__(self, persist_directory: str, embedding_function=None, hnsw_threshold: int = DEFAULT_HNSW_THRESHOLD):
+        self.persist_directory = persist_directory
+        self.embedding_function = embedding_function
+        self.hnsw_threshold = hnsw_threshold
+        self._lock = threading.RLock()
+
+        self.dim: Optional[int] = None
+        self.version = 0
+        self.generation = 0
+        # 库标识：首次写入时记入 store.json；目录被删除后重建的库得到新的标识，version 从 0 重新计数
+        self.store_id = uuid.uuid4().hex
+        self._ids: List[str] = []
+        self._texts: List[str] = []
+        self._metadatas: List[dict] = []
+        self._alive: List[bool] = []
+        self._id_to_row: Dict[str, int] = {}
+        self._dead_rows: List[int] = []  # 尚未同步到 HNSW 的墓碑行
+        self._matrix_cache: Optional[np.ndarray] = None
+        self._hnsw = None
+        self._hnsw_rows = 0
+        self._lexical: Optional[BigramBM25Index] = None
+        self._meta_index: Optional[MetadataIndex] = None
+
+        os.makedirs(self.persist_directory, exist_ok=True)
+        self._load()
+
+    # ----------------- 持久化 -----------------
+    def _path(self, name: str) -> str:
+        return os.path.join(self.persist_directory, name)
+
+    @staticmethod
+    def _generation_name(name: str, generation: int) -> str:
+        """第 0 代沿用原文件名，压缩后的第 n 代为 name.n.ext。"""
+        if generation == 0:
+            return name
+        base, ext = os.path.splitext(name)
+        return f"{base}.{generation}{ext}"
+
+    def _vectors_path(self, generation: Optional[int] = None) -> str:
+        return self._path(self._generation_name(VECTORS_FILE, self.generation if generation is None else generation))
+
+    def _meta_path(self, generation: Optional[int] = None) -> str:
+        return self._path(self._generation_name(META_FILE, self.generation if generation is None else generation))
+
+    def _snapshot_path(self, generation: Optional[int] = None) -> str:
+        return self._path(self._generation_name(SNAPSHOT_FILE, self.generation if generation is None else generation))
+
+    def _load(self):
+        header_path = self._path(HEADER_FILE)
+        if os.path.exists(header_path):
+            with open(header_path, 'r', encoding='utf-8') as f:
+                header = json.load(f)
+            self.dim = header.get("dim")
+            self.version = header.get("version", 0)
+            self.generation = header.get("generation", 0)
+            self.store_id = header.get("store_id") or self.store_id
+
+        # 压缩快照：列式 JSON，一次顺序读入
+        snapshot_path = self._snapshot_path()
+        if os.path.exists(snapshot_path):
+            with open(snapshot_path, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+            self._ids = snapshot["ids"]
+            self._texts = snapshot["texts"]
+            self._metadatas = snapshot["metadatas"]
+            self._alive = [True] * len(self._ids)
+            self._id_to_row = {doc_id: row for row, doc_id in enumerate(self._ids)}
+
+        meta_path = self._meta_path()
+        if os.path.exists(meta_path):
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # 写入中途崩溃可能留下半行，忽略即可
+                        logging.warning(f"[LocalVectorStore] 跳过损坏的元数据行: {line[:80]}")
+                        continue
+                    self._replay(record)
+
+        # 以向量文件的实际行数为准，丢弃没有向量的元数据行
+        stored_rows = self._stored_rows()
+        if stored_rows < len(self._ids):
+            for row in range(stored_rows, len(self._ids)):
+                self._id_to_row.pop(self._ids[row], None)
+            del self._ids[stored_rows:]
+            del self._texts[stored_rows:]
+            del self._metadatas[stored_rows:]
+            del self._alive[stored_rows:]
+        elif stored_rows > len(self._ids):
+            # 向量已写入但元数据未落盘，截掉多余的向量行以保持行号对齐
+            with open(self._vectors_path(), 'r+b') as f:
+                f.truncate(len(self._ids) * 4 * self.dim)
+
+    def _replay(self, record: dict):
+        op = record.get("op")
+        if op == "add":
+            row = len(self._ids)
+            doc_id = record["id"]
+            old_row = self._id_to_row.get(doc_id)
+            if old_row is not None:
+                self._kill_row(old_row)
+            self._ids.append(doc_id)
+            self._texts.append(record.get("text", ""))
+            self._metadatas.append(record.get("metadata") or {})
+            self._alive.append(True)
+            self._id_to_row[doc_id] = row
+            if self._meta_index is not None:
+                self._meta_index.add(row, self._metadatas[row])
+        elif op == "del":
+            for doc_id in record.get("ids", []):
+                row = self._id_to_row.pop(doc_id, None)
+                if row is not None:
+                    self._kill_row(row)
+
+    def _kill_row(self, row: int):
+        self._alive[row] = False
+        self._dead_rows.append(row)
+        if self._meta_index is not None:
+            self._meta_index.remove(row, self._metadatas[row])
+
+    def _stored_rows(self) -> int:
+        if not self.dim:
+            return 0
+        vec_path = self._vectors_path()
+        if not os.path.exists(vec_path):
+            return 0
+        return os.path.getsize(vec_path) // (4 * self.dim)
+
+    def _write_header(self):
+        header = {"dim": self.dim, "version": self.version, "rows": len(self._ids), "generation": self.generation,
+                  "store_id": self.store_id}
+        tmp_path = self._path(HEADER_FILE + ".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(header, f)
+        os.replace(tmp_path, self._path(HEADER_FILE))
+
+    def _append_meta(self, records: Iterable[dict]):
+        with open(self._meta_path(), 'a', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def _matrix(self) -> np.ndarray:
+        """以只读方式 mmap 向量矩阵，写入后缓存失效。"""
+        if self._matrix_cache is None:
+            rows = len(self._ids)
+            if rows == 0 or not self.dim:
+                self._matrix_cache = np.zeros((0, self.dim or 0), dtype=np.float32)
+            else:
+                self._matrix_cache = np.memmap(self._vectors_path(), dtype=np.float32, mode='r', shape=(rows, self.dim))
+        return self._matrix_cache
+
+    # ----------------- 写入 -----------------
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def _embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.embedding_function is None:
+            raise ValueError("LocalVectorStore 未设置 embedding_function，无法自动计算向量。")
+        return self.embedding_function.embed_documents(texts)
+
+    def _embed_query(self, query: str) -> List[float]:
+        if self.embedding_function is None:
+            raise ValueError("LocalVectorStore 未设置 embedding_function，无法自动计算向量。")
+        return self.embedding_function.embed_query(query)
+
+    def add_texts(
+        self,
+        texts: Sequence[str],
+        metadatas: Optional[Sequence[dict]] = None,
+        ids: Optional[Sequence[str]] = None,
+        embeddings: Optional[Sequence[Sequence[float]]] = None
+    ) -> List[str]:
+        """
+        写入文本（已存在的 id 视为更新，旧行会被标记删除）。
+        embedding 为空的文本会被跳过，返回实际写入的 id 列表。
+        """
+        texts = list(texts)
+        if not texts:
+            return []
+        metadatas = list(metadatas) if metadatas is not None else [{} for _ in texts]
+        ids = list(ids) if ids is not None else [str(uuid.uuid4()) for _ in texts]
+        if embeddings is None:
+            embeddings = self._embed_documents(texts)
+
+        rows: List[Tuple[str, str, dict, List[float]]] = []
+        for text, meta, doc_id, emb in zip(texts, metadatas, ids, embeddings):
+            if not emb:
+                logging.warning(f"[LocalVectorStore] 文本 embedding 为空，已跳过: {text[:30]}...")
+                continue
+            rows.append((doc_id, text, dict(meta or {}), emb))
+        if not rows:
+            return []
+
+        vectors = np.asarray([r[3] for r in rows], dtype=np.float32)
+        with self._lock:
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"向量维度不一致: 库中为 {self.dim}，写入为 {vectors.shape[1]}。切换 Embedding 模型后请清空向量库。")
+
+            vectors = self._normalize(vectors)
+            with open(self._vectors_path(), 'ab') as f:
+                f.write(vectors.astype(np.float32).tobytes())
+
+            records = []
+            for doc_id, text, meta, _ in rows:
+                record = {"op": "add", "id": doc_id, "text": text, "metadata": meta}
+                self._replay(record)
+                records.append(record)
+                if self._lexical is not None:
+                    self._lexical.add(doc_id, text)
+            self._append_meta(records)
+
+            self.version += 1
+            self._write_header()
+            self._matrix_cache = None
+            self._sync_hnsw_after_write()
+        return [r[0] for r in rows]
+
+    def add_documents(self, documents: Sequence[Any], ids: Optional[Sequence[str]] = None) -> List[str]:
+        """写入 Document 对象（只需具备 page_content / metadata 属性）。"""
+        texts = [doc.page_content for doc in documents]
+        metadatas = [getattr(doc, "metadata", None) or {} for doc in documents]
+        return self.add_texts(texts, metadatas=metadatas, ids=ids)
+
+    def delete(self, ids: Optional[Sequence[str]] = None, where: Optional[dict] = None) -> int:
+        """按 id 或元数据过滤条件删除（两者同时给出时取交集），返回实际删除的条数。"""
+        if where:
+            allowed = self.filter_ids(where)
+            if ids is not None:
+                allowed_set = set(allowed)
+                allowed = [doc_id for doc_id in ids if doc_id in allowed_set]
+            ids = allowed
+        if not ids:
+            return 0
+        with self._lock:
+            existing = [doc_id for doc_id in ids if doc_id in self._id_to_row]
+            if not existing:
+                return 0
+            record = {"op": "del", "ids": existing}
+            self._replay(record)
+            self._append_meta([record])
+            if self._lexical is not None:
+                for doc_id in existing:
+                    self._lexical.remove(doc_id)
+            if self._hnsw is not None:
+                self._mark_hnsw_deleted()
+            self.version += 1
+            self._write_header()
+        return len(existing)
+
+    # ----------------- 查询 -----------------
+    def count(self) -> int:
+        return len(self._id_to_row)
+
+    def __len__(self):
+        return self.count()
+
+    def get(self, ids: Optional[Sequence[str]] = None, where: Optional[dict] = None) -> Dict[str, list]:
+        """返回与 chroma collection.get() 相同结构的字典；where 为元数据过滤条件。"""
+        with self._lock:
+            if ids is None:
+                rows = self.filter_rows(where) if where else [row for row, alive in enumerate(self._alive) if alive]
+            else:
+                rows = [self._id_to_row[i] for i in ids if i in self._id_to_row]
+                if where:
+                    allowed = set(self.filter_rows(where))
+                    rows = [r for r in rows if r in allowed]
+            return {
+                "ids": [self._ids[r] for r in rows],
+                "documents": [self._texts[r] for r in rows],
+                "metadatas": [self._metadatas[r] for r in rows],
+            }
+
+    def get_document(self, doc_id: str) -> Optional[LocalDocument]:
+        row = self._id_to_row.get(doc_id)
+        return self._make_doc(row) if row is not None else None
+
+    def get_vectors(self, ids: Sequence[str]) -> Dict[str, np.ndarray]:
+        """按 id 取出已归一化的向量（不存在的 id 会被忽略）。"""
+        with self._lock:
+            matrix = self._matrix()
+            return {doc_id: np.array(matrix[self._id_to_row[doc_id]]) for doc_id in ids if doc_id in self._id_to_row}
+
+    def lexical_index(self) -> BigramBM25Index:
+        """
+        返回与当前库内容同步的二元组 BM25 索引。
+        首次调用时优先加载与库标识、版本一致的快照，否则按存活文本重建并保存快照；之后随写入增量维护，
+        内存索引领先快照 LEXICAL_SNAPSHOT_INTERVAL 个版本时才重写快照，避免每次写入后的检索都整体序列化。
+        """
+        with self._lock:
+            if self._lexical is None:
+                path = self._path(LEXICAL_FILE)
+                index = BigramBM25Index.load(path)
+                if index is None or index.version != self.version or index.store_id != self.store_id:
+                    index = BigramBM25Index()
+                    for row, alive in enumerate(self._alive):
+                        if alive:
+                            index.add(self._ids[row], self._texts[row])
+                    index.save(path, self.version, self.store_id)
+                self._lexical = index
+            elif self.version - self._lexical.version >= LEXICAL_SNAPSHOT_INTERVAL:
+                self._lexical.save(self._path(LEXICAL_FILE), self.version, self.store_id)
+            return self._lexical
+
+    def save_lexical_snapshot(self):
+        """内存中的二元组索引比磁盘快照新时写出快照（压缩、关闭实例时调用）。"""
+        with self._lock:
+            if self._lexical is not None and self._lexical.version != self.version:
+                self._lexical.save(self._path(LEXICAL_FILE), self.version, self.store_id)
+
+    def lexical_search(self, query: str, k: int = 10, candidates: Optional[Iterable[str]] = None) -> List[Tuple[str, float]]:
+        """
+        BM25 检索（见 BigramBM25Index.search）。倒排表随 add_texts / delete 原地修改，
+        检索必须与写入在同一把锁下进行，流水线中定稿写入与下一章检索并发时才不会读到修改中的倒排表。
+        """
+        with self._lock:
+            return self.lexical_index().search(query, k=k, candidates=candidates)
+
+    def metadata_index(self) -> MetadataIndex:
+        """元数据倒排索引，首次使用时按存活行构建，之后随写入/删除增量维护。"""
+        with self._lock:
+            if self._meta_index is None:
+                index = MetadataIndex()
+                for row, alive in enumerate(self._alive):
+                    if alive:
+                        index.add(row, self._metadatas[row])
+                self._meta_index = index
+            return self._meta_index
+
+    def filter_rows(self, where: Optional[dict]) -> List[int]:
+        """满足 where 的存活行号（升序）；where 为空时返回全部存活行。"""
+        with self._lock:
+            if not where:
+                return [row for row, alive in enumerate(self._alive) if alive]
+            return sorted(self.metadata_index().match(where))
+
+    def filter_ids(self, where: Optional[dict]) -> List[str]:
+        return [self._ids[row] for row in self.filter_rows(where)]
+
+    def _make_doc(self, row: int) -> LocalDocument:
+        return LocalDocument(self._texts[row], dict(self._metadatas[row]), self._ids[row])
+
+    def _search_rows_batch(self, queries: np.ndarray, k: int, where: Optional[dict] = None) -> List[List[Tuple[int, float]]]:
+        """
+        批量检索：queries 为 (Q, dim) 的已归一化矩阵，暴力检索时只做一次 (Q, N) 矩阵乘法。
+        有 where 时先由元数据索引求出候选行，只在候选行上计算相似度。
+        返回每个查询的 [(row, 余弦相似度)]，降序。
+        """
+        matrix = self._matrix()
+        alive = self.count()
+        if matrix.shape[0] == 0 or k <= 0 or alive == 0 or queries.shape[0] == 0:
+            return [[] for _ in range(queries.shape[0])]
+
+        if where:
+            rows = np.asarray(self.filter_rows(where), dtype=np.int64)
+            if rows.size == 0:
+                return [[] for _ in range(queries.shape[0])]
+            k = min(k, int(rows.size))
+            # 候选集仍然很大时交给 HNSW 的过滤检索，否则只对候选行做暴力检索
+            if rows.size >= self.hnsw_threshold and self._use_hnsw():
+                return self._search_hnsw(queries, k, rows)
+            sims = queries @ np.asarray(matrix[rows]).T
+            return self._top_k(sims, k, rows)
+
+        k = min(k, alive)
+        if self._use_hnsw():
+            return self._search_hnsw(queries, k)
+
+        sims = queries @ matrix.T
+        alive_mask = np.asarray(self._alive, dtype=bool)
+        sims[:, ~alive_mask] = -np.inf
+        return self._top_k(sims, k)
+
+    @staticmethod
+    def _top_k(sims: np.ndarray, k: int, rows: Optional[np.ndarray] = None) -> List[List[Tuple[int, float]]]:
+        """对 (Q, M) 相似度矩阵逐行取前 k；rows 给出列号到库行号的映射。"""
+        if k < sims.shape[1]:
+            top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+        else:
+            top = np.tile(np.arange(sims.shape[1]), (sims.shape[0], 1))
+        results = []
+        for qi in range(sims.shape[0]):
+            col_top = top[qi][np.argsort(-sims[qi, top[qi]])]
+            results.append([(int(rows[c]) if rows is not None else int(c), float(sims[qi, c]))
+                            for c in col_top if np.isfinite(sims[qi, c])])
+        return results
+
+    def _prepare_queries(self, embeddings: Sequence[Sequence[float]]) -> Tuple[np.ndarray, List[int]]:
+        """过滤空向量并归一化，返回 (矩阵, 对应的原始下标)。"""
+        valid = [i for i, emb in enumerate(embeddings) if emb]
+        if not valid or self.dim is None:
+            return np.zeros((0, self.dim or 0), dtype=np.float32), []
+        queries = np.asarray([embeddings[i] for i in valid], dtype=np.float32)
+        if queries.shape[1] != self.dim:
+            raise ValueError(f"查询向量维度 {queries.shape[1]} 与库中维度 {self.dim} 不一致。")
+        return self._normalize(queries), valid
+
+    def similarity_search_by_vectors_with_score(
+        self,
+        embeddings: Sequence[Sequence[float]],
+        k: int = 4,
+        where: Optional[dict] = None
+    ) -> List[List[Tuple[LocalDocument, float]]]:
+        """多个查询向量一次检索，返回与输入顺序对应的结果列表（空向量对应空结果）。"""
+        results: List[List[Tuple[LocalDocument, float]]] = [[] for _ in embeddings]
+        queries, valid = self._prepare_queries(embeddings)
+        if not valid:
+            return results
+        with self._lock:
+            for idx, hits in zip(valid, self._search_rows_batch(queries, k, where)):
+                results[idx] = [(self._make_doc(row), score) for row, score in hits]
+        return results
+
+    def similarity_search_by_vector_with_score(self, embedding: Sequence[float], k: int = 4, where: Optional[dict] = None) -> List[Tuple[LocalDocument, float]]:
+        return self.similarity_search_by_vectors_with_score([embedding], k, where)[0]
+
+    def similarity_search_by_vector(self, embedding: Sequence[float], k: int = 4, where: Optional[dict] = None) -> List[LocalDocument]:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k, where)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, where: Optional[dict] = None) -> List[Tuple[LocalDocument, float]]:
+        """返回 (文档, 余弦相似度) 列表，相似度越大越相关。"""
+        return self.similarity_search_by_vector_with_score(self._embed_query(query), k, where)
+
+    def similarity_search(self, query: str, k: int = 4, where: Optional[dict] = None) -> List[LocalDocument]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, where)]
+
+    # ----------------- 压缩 -----------------
+    def stats(self) -> Dict[str, Any]:
+        """返回行数、存活数、墓碑占比与磁盘占用。"""
+        total = len(self._ids)
+        alive = self.count()
+        size = 0
+        for name in os.listdir(self.persist_directory):
+            path = self._path(name)
+            if os.path.isfile(path):
+                size += os.path.getsize(path)
+        return {
+            "rows": total,
+            "alive": alive,
+            "dead_ratio": (total - alive) / total if total else 0.0,
+            "generation": self.generation,
+            "version": self.version,
+            "disk_bytes": size,
+        }
+
+    def needs_compaction(self, dead_ratio: float = COMPACTION_DEAD_RATIO) -> bool:
+        return self.stats()["dead_ratio"] > dead_ratio
+
+    def compact(self) -> Dict[str, Any]:
+        """
+        把存活行重写为新一代的致密文件（向量 + 列式元数据快照 + 空的增量日志），
+        最后原子替换 store.json 切换到新一代，再删除旧文件；中途崩溃时旧一代仍然完整可用。
+        """
+        with self._lock:
+            before = self.stats()
+            new_gen = self.generation + 1
+            alive_rows = [row for row, alive in enumerate(self._alive) if alive]
+            matrix = self._matrix()
+
+            with open(self._vectors_path(new_gen), 'wb') as f:
+                for start in range(0, len(alive_rows), COPY_BATCH_ROWS):
+                    f.write(np.asarray(matrix[alive_rows[start:start + COPY_BATCH_ROWS]], dtype=np.float32).tobytes())
+            with open(self._snapshot_path(new_gen), 'w', encoding='utf-8') as f:
+                json.dump({
+                    "ids": [self._ids[r] for r in alive_rows],
+                    "texts": [self._texts[r] for r in alive_rows],
+                    "metadatas": [self._metadatas[r] for r in alive_rows],
+                }, f, ensure_ascii=False)
+            open(self._meta_path(new_gen), 'w', encoding='utf-8').close()
+
+            old_files = [self._vectors_path(), self._meta_path(), self._snapshot_path(), self._path(HNSW_FILE), self._path(LEXICAL_FILE)]
+            self._matrix_cache = None
+            self._hnsw = None
+            self._hnsw_rows = 0
+            self._meta_index = None
+            self.generation = new_gen
+            self.version += 1
+            self._write_header()
+            for path in old_files:
+                try:
+                    if os.path.exists(path):
+                        os.remove(path)
+                except OSError as e:
+                    # Windows 下旧文件可能仍被 mmap 占用，下次压缩时再清理
+                    logging.warning(f"[LocalVectorStore] 旧文件删除失败: {path}: {e}")
+
+            self._ids, self._texts, self._metadatas, self._alive = [], [], [], []
+            self._id_to_row, self._dead_rows = {}, []
+            self._load()
+            # 存活文档不变，内存中的二元组索引仍然有效，按新版本号重写快照
+            self.save_lexical_snapshot()
+            after = self.stats()
+        logging.info(f"[LocalVectorStore] 压缩完成: {before['rows']} 行 -> {after['rows']} 行，"
+                     f"磁盘 {before['disk_bytes']} -> {after['disk_bytes']} 字节")
+        return {"before": before, "after": after}
+
+    # ----------------- HNSW -----------------
+    def _use_hnsw(self) -> bool:
+        return hnswlib is not None and self.count() >= self.hnsw_threshold
+
+    def _sync_hnsw_after_write(self):
+        if not self._use_hnsw():
+            return
+        if self._hnsw is None:
+            self._build_hnsw()
+            return
+        total = len(self._ids)
+        if total > self._hnsw_rows:
+            matrix = self._matrix()
+            if total > self._hnsw.get_max_elements():
+                self._hnsw.resize_index(max(total, self._hnsw.get_max_elements() * 2))
+            self._hnsw.add_items(np.asarray(matrix[self._hnsw_rows:total]), np.arange(self._hnsw_rows, total))
+            self._hnsw_rows = total
+        self._mark_hnsw_deleted()
+        self._hnsw.save_index(self._path(HNSW_FILE))
+
+    def _mark_hnsw_deleted(self):
+        for row in self._dead_rows:
+            try:
+                self._hnsw.mark_deleted(row)
+            except RuntimeError:
+                pass  # 已标记过
+        self._dead_rows = []
+
+    def _build_hnsw(self):
+        matrix = self._matrix()
+        total = matrix.shape[0]
+        index = hnswlib.Index(space='ip', dim=self.dim)
+        hnsw_path = self._path(HNSW_FILE)
+        loaded = False
+        if os.path.exists(hnsw_path):
+            try:
+                index.load_index(hnsw_path, max_elements=max(total, 1))
+                loaded = index.get_current_count() == total
+            except Exception as e:
+                logging.warning(f"[LocalVectorStore] HNSW 索引加载失败，将重建: {e}")
+        if not loaded:
+            index = hnswlib.Index(space='ip', dim=self.dim)
+            index.init_index(max_elements=max(total * 2, 1024), ef_construction=200, M=16)
+            index.add_items(np.asarray(matrix), np.arange(total))
+            index.save_index(hnsw_path)
+        self._hnsw = index
+        self._hnsw_rows = total
+        self._dead_rows = [row for row, alive in enumerate(self._alive) if not alive]
+        self._mark_hnsw_deleted()
+
+    def _search_hnsw(self, queries: np.ndarray, k: int, rows: Optional[np.ndarray] = None) -> List[List[Tuple[int, float]]]:
+        if self._hnsw is None:
+            self._build_hnsw()
+        self._hnsw.set_ef(max(k * 4, 64))
+        if rows is not None:
+            allowed = set(rows.tolist())
+            labels, distances = self._hnsw.knn_query(queries, k=k, filter=lambda label: label in allowed)
+        else:
+            labels, distances = self._hnsw.knn_query(queries, k=k)
+        # 内积空间下 hnswlib 返回 1 - dot
+        return [[(int(r), float(1.0 - d)) for r, d in zip(row_labels, row_dist)] for row_labels, row_dist in zip(labels, distances)]
+
+    # ----------------- 构造 -----------------
+    @classmethod
+    def from_texts(
+        cls,
+        texts: Sequence[str],
+        embedding,
+        metadatas: Optional[Sequence[dict]] = None,
+        ids: Optional[Sequence[str]] = None,
+        persist_directory: str = "",
+        **kwargs
+    ) -> "LocalVectorStore":
+        store = cls(persist_directory, embedding_function=embedding, **kwargs)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store
+
+    @classmethod
+    def from_documents(cls, documents: Sequence[Any], embedding, ids: Optional[Sequence[str]] = None, persist_directory: str = "", **kwargs) -> "LocalVectorStore":
+        store = cls(persist_directory, embedding_function=embedding, **kwargs)
+        store.add_documents(documents, ids=ids)
+        return store
+
+
+_open_stores: Dict[str, LocalVectorStore] = {}
+_open_stores_lock = threading.Lock()
+
+
+def _read_store_id(store_dir: str) -> Optional[str]:
+    """store.json 中记录的库标识；文件不存在时返回 None，旧版本未记录标识时返回空串。"""
+    try:
+        with open(os.path.join(store_dir, HEADER_FILE), 'r', encoding='utf-8') as f:
+            return json.load(f).get("store_id") or ""
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError):
+        return ""
+
+
+def _is_stale(store: LocalVectorStore, store_dir: str) -> bool:
+    """
+    缓存实例是否已与磁盘上的库脱节：目录被删除、已落盘的库的 store.json 被删除，
+    或目录被清空后由其它实例/进程重建（store.json 中的库标识与实例不同）。与实例中的行数无关。
+    """
+    if not os.path.isdir(store_dir):
+        return True
+    disk_id = _read_store_id(store_dir)
+    if disk_id is None:
+        return store.dim is not None
+    return bool(disk_id) and disk_id != store.store_id
+
+
+def open_local_vector_store(filepath: str, embedding_adapter=None) -> LocalVectorStore:
+    """
+    返回项目本地向量库的进程内共享实例：首次调用冷启动并缓存，之后直接复用。
+    传入 embedding_adapter 时会替换实例上的 embedding_function（配置可能在两次调用间被修改）。
+    """
+    store_dir = os.path.abspath(get_local_vectorstore_dir(filepath))
+    with _open_stores_lock:
+        store = _open_stores.get(store_dir)
+        # 目录被外部删除或重建（例如清空向量库）后缓存实例已失效，需要重新打开
+        stale = store is not None and _is_stale(store, store_dir)
+        if store is None or stale:
+            start = time.perf_counter()
+            store = LocalVectorStore(store_dir, embedding_function=embedding_adapter)
+            _open_stores[store_dir] = store
+            logging.info(f"[open_local_vector_store] 冷启动 {store.count()} 条，耗时 {(time.perf_counter() - start) * 1000:.1f}ms")
+        elif embedding_adapter is not None:
+            store.embedding_function = embedding_adapter
+    return store
+
+
+def close_local_vector_store(filepath: Optional[str] = None):
+    """
+    从进程内缓存中移除实例（filepath 为空时移除全部），下次打开会重新从磁盘加载。
+    移除前写出尚未落盘的二元组索引快照。
+    """
+    with _open_stores_lock:
+        if filepath is None:
+            stores = list(_open_stores.values())
+            _open_stores.clear()
+        else:
+            store = _open_stores.pop(os.path.abspath(get_local_vectorstore_dir(filepath)), None)
+            stores = [store] if store is not None else []
+    for store in stores:
+        try:
+            store.save_lexical_snapshot()
+        except OSError as e:
+            # 目录可能已被外部删除（清空向量库），快照丢失只会导致下次重建
+            logging.warning(f"[close_local_vector_store] 二元组索引快照保存失败: {e}")
+
+
+def load_local_vector_store(embedding_adapter, filepath: str) -> Optional[LocalVectorStore]:
+    """
+    打开项目的本地向量库；库为空时返回 None（与 load_vector_store 的约定一致）。
+    """
+    store_dir = get_local_vectorstore_dir(filepath)
+    if not os.path.exists(os.path.join(store_dir, HEADER_FILE)):
+        return None
+    try:
+        return open_local_vector_store(filepath, embedding_adapter)
+    except Exception as e:
+        logging.warning(f"[load_local_vector_store] 打开本地向量库失败: {e}")
+        return None
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="本地向量库维护工具")
+    parser.add_argument("command", choices=["stats", "compact"], help="stats: 查看状态；compact: 压缩重写")
+    parser.add_argument("filepath", help="小说项目保存路径")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    target = open_local_vector_store(args.filepath)
+    print(f"冷启动耗时: {(time.perf_counter() - start) * 1000:.1f}ms")
+    if args.command == "compact":
+        print(json.dumps(target.compact(), ensure_ascii=False, indent=2))
+        close_local_vector_store(args.filepath)
+        start = time.perf_counter()
+        open_local_vector_store(args.filepath)
+        print(f"压缩后冷启动耗时: {(time.perf_counter() - start) * 1000:.1f}ms")
+    else:
+        print(json.dumps(target.stats(), ensure_ascii=False, indent=2))
+    start = time.perf_counter()
+    open_local_vector_store(args.filepath)
+    print(f"热启动耗时: {(time.perf_counter() - start) * 1000:.3f}ms")
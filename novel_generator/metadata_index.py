@@ -0,0 +1,134 @@
+# novel_generator/metadata_index.py
+# -*- coding: utf-8 -*-
+"""
+本地向量库的元数据倒排索引：
+- (字段, 取值) -> 行号集合；列表型取值（如 characters）按元素分别建索引；
+- 过滤条件沿用 chroma 的 where 语法子集：等值、$eq/$ne/$in/$nin/$gt/$gte/$lt/$lte/$contains、$and/$or；
+- 检索前先求出候选行，再只在候选行上做向量/词法检索。
+"""
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+SOURCE_CHAPTER = "chapter"
+SOURCE_KNOWLEDGE = "knowledge"
+
+_RANGE_OPS = {
+    "$gt": lambda v, x: v > x,
+    "$gte": lambda v, x: v >= x,
+    "$lt": lambda v, x: v < x,
+    "$lte": lambda v, x: v <= x,
+}
+
+
+def _hashable(value: Any) -> bool:
+    return isinstance(value, (str, int, float, bool)) or value is None
+
+
+class MetadataIndex:
+    """只索引存活行；由 LocalVectorStore 在写入/删除时增量维护。"""
+    def __init__(self):
+        self.postings: Dict[Tuple[str, Any], Set[int]] = defaultdict(set)
+        self.values: Dict[str, Set[Any]] = defaultdict(set)
+        self.rows: Set[int] = set()
+
+    def _entries(self, metadata: dict) -> Iterable[Tuple[str, Any]]:
+        for key, value in (metadata or {}).items():
+            if isinstance(value, (list, tuple)):
+                for item in value:
+                    if _hashable(item):
+                        yield key, item
+            elif _hashable(value):
+                yield key, value
+
+    def add(self, row: int, metadata: dict):
+        self.rows.add(row)
+        for key, value in self._entries(metadata):
+            self.postings[(key, value)].add(row)
+            self.values[key].add(value)
+
+    def remove(self, row: int, metadata: dict):
+        self.rows.discard(row)
+        for key, value in self._entries(metadata):
+            posting = self.postings.get((key, value))
+            if posting is None:
+                continue
+            posting.discard(row)
+            if not posting:
+                del self.postings[(key, value)]
+                self.values[key].discard(value)
+
+    def _rows_for_value(self, key: str, value: Any) -> Set[int]:
+        return self.postings.get((key, value), set())
+
+    def _match_field(self, key: str, condition: Any) -> Set[int]:
+        if not isinstance(condition, dict):
+            return set(self._rows_for_value(key, condition))
+        result: Optional[Set[int]] = None
+        for op, operand in condition.items():
+            if op in ("$eq", "$contains"):
+                rows = set(self._rows_for_value(key, operand))
+            elif op == "$ne":
+                rows = self.rows - self._rows_for_value(key, operand)
+            elif op == "$in":
+                rows = set().union(*(self._rows_for_value(key, v) for v in operand)) if operand else set()
+            elif op == "$nin":
+                rows = self.rows - set().union(*(self._rows_for_value(key, v) for v in operand)) if operand else set(self.rows)
+            elif op in _RANGE_OPS:
+                # 在该字段的不同取值上比较（章节号、卷号等取值数远小于行数）
+                matched = [v for v in self.values.get(key, ()) if isinstance(v, (int, float)) and not isinstance(v, bool) and _RANGE_OPS[op](v, operand)]
+                rows = set().union(*(self._rows_for_value(key, v) for v in matched)) if matched else set()
+            else:
+                raise ValueError(f"不支持的过滤操作符: {op}")
+            result = rows if result is None else result & rows
+        return result if result is not None else set(self.rows)
+
+    def match(self, where: dict) -> Set[int]:
+        """返回满足 where 的存活行号集合。"""
+        result: Optional[Set[int]] = None
+        for key, condition in where.items():
+            if key == "$and":
+                rows = self.rows
+                for sub in condition:
+                    rows = rows & self.match(sub)
+            elif key == "$or":
+                rows = set().union(*(self.match(sub) for sub in condition)) if condition else set()
+            else:
+                rows = self._match_field(key, condition)
+            result = set(rows) if result is None else result & rows
+        return result if result is not None else set(self.rows)
+
+
+def build_metadata_filter(
+    source: Optional[str] = None,
+    chapter_range: Optional[Tuple[Optional[int], Optional[int]]] = None,
+    volume: Optional[int] = None,
+    characters: Optional[List[str]] = None
+) -> Optional[dict]:
+    """
+    组合常用过滤条件，返回 where 字典（无条件时返回 None）：
+    - source: "chapter" / "knowledge"
+    - chapter_range: (起始章, 结束章)，两端均包含，任一端可为 None
+    - volume: 卷号
+    - characters: 切块中出现了其中任一人物
+    """
+    clauses = []
+    if source:
+        clauses.append({"source": source})
+    if chapter_range:
+        start, end = chapter_range
+        if start is not None:
+            clauses.append({"chapter": {"$gte": start}})
+        if end is not None:
+            clauses.append({"chapter": {"$lte": end}})
+    if volume is not None:
+        clauses.append({"volume": volume})
+    if characters:
+        clauses.append({"characters": {"$in": list(characters)}})
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+def recent_chapters_filter(current_chapter: int, n: int) -> dict:
+    """current_chapter 之前最近 n 章的章节切块。"""
+    return build_metadata_filter(source=SOURCE_CHAPTER, chapter_range=(max(1, current_chapter - n), current_chapter - 1))
@@ -0,0 +1,129 @@
+# novel_generator/retrieval.py
+# -*- coding: utf-8 -*-
+"""
+知识检索：向量检索 + 二元组 BM25 的混合检索，供 get_filtered_knowledge_context 使用。
+两路检索都支持 where 元数据过滤（见 metadata_index），只在候选切块中召回。
+"""
+import re
+import logging
+from typing import List, Optional, Sequence
+
+from .local_vectorstore import LocalDocument, LocalVectorStore
+from .lexical_index import reciprocal_rank_fusion, RRF_K
+
+# 每一路召回的候选数 = k * CANDIDATE_MULTIPLIER
+CANDIDATE_MULTIPLIER = 4
+# knowledge_search_prompt 最多生成 5 组检索词
+MAX_KEYWORD_GROUPS = 5
+
+
+def build_lexical_query(query: str, extra_terms: Optional[Sequence[str]] = None) -> str:
+    """
+    关键道具、场景地点、核心人物等专有名词直接拼入词法查询，
+    即便向量检索没有召回，也能通过二元组精确命中。
+    """
+    terms = [t.strip() for t in (extra_terms or []) if t and t.strip()]
+    return " ".join([query] + terms)
+
+
+def hybrid_search(
+    store: LocalVectorStore,
+    query: str,
+    k: int = 4,
+    extra_terms: Optional[Sequence[str]] = None,
+    rrf_k: int = RRF_K,
+    where: Optional[dict] = None
+) -> List[LocalDocument]:
+    """
+    向量召回与 BM25 召回各取 k * CANDIDATE_MULTIPLIER 条，按倒数排名融合后取前 k 条。
+    where 为元数据过滤条件，如 build_metadata_filter(source="knowledge")。
+    """
+    if store is None or store.count() == 0 or k <= 0:
+        return []
+    candidates = k * CANDIDATE_MULTIPLIER
+    allowed_ids = store.filter_ids(where) if where else None
+    if allowed_ids is not None and not allowed_ids:
+        return []
+
+    vector_ranked = []
+    try:
+        vector_ranked = [doc.id for doc, _ in store.similarity_search_with_score(query, k=candidates, where=where)]
+    except Exception as e:
+        logging.warning(f"[hybrid_search] 向量检索失败，仅使用词法检索: {e}")
+
+    lexical_query = build_lexical_query(query, extra_terms)
+    lexical_ranked = [doc_id for doc_id, _ in store.lexical_search(lexical_query, k=candidates, candidates=allowed_ids)]
+
+    fused = reciprocal_rank_fusion([vector_ranked, lexical_ranked], k=rrf_k)
+    docs = []
+    for doc_id, _ in fused[:k]:
+        doc = store.get_document(doc_id)
+        if doc is not None:
+            docs.append(doc)
+    return docs
+
+
+def parse_keyword_groups(response: str, max_groups: int = MAX_KEYWORD_GROUPS) -> List[str]:
+    """
+    解析 knowledge_search_prompt 的输出：每行一组，组内关键词以"·"连接。
+    返回去重后的检索语句（关键词以空格连接）。
+    """
+    groups: List[str] = []
+    for line in response.splitlines():
+        line = re.sub(r'^\s*(?:[-*•]|\d+[.、)])\s*', '', line).strip()
+        if not line or ('·' not in line and len(line) > 30):
+            continue
+        query = " ".join(kw.strip() for kw in line.split('·') if kw.strip())
+        if query and query not in groups:
+            groups.append(query)
+        if len(groups) >= max_groups:
+            break
+    return groups
+
+
+def multi_query_search(
+    store: LocalVectorStore,
+    queries: Sequence[str],
+    k: int = 4,
+    extra_terms: Optional[Sequence[str]] = None,
+    rrf_k: int = RRF_K,
+    embeddings: Optional[Sequence[Sequence[float]]] = None,
+    where: Optional[dict] = None
+) -> List[LocalDocument]:
+    """
+    多组检索词一次完成：一次 embed_documents 批量计算全部查询向量，
+    一次矩阵乘法完成全部向量检索；每组再与自己的 BM25 结果做倒数排名融合取前 k 条，
+    最后按文档 id 合并去重（保留最高融合分），最多返回 k * 查询组数 条。
+    embeddings 可传入预先算好的查询向量（与 queries 一一对应）；where 为元数据过滤条件。
+    """
+    queries = [q for q in queries if q and q.strip()]
+    if store is None or store.count() == 0 or not queries or k <= 0:
+        return []
+    candidates = k * CANDIDATE_MULTIPLIER
+    allowed_ids = store.filter_ids(where) if where else None
+    if allowed_ids is not None and not allowed_ids:
+        return []
+
+    vector_ranked: List[List[str]] = [[] for _ in queries]
+    try:
+        if embeddings is None:
+            embeddings = store.embedding_function.embed_documents(list(queries))
+        for qi, hits in enumerate(store.similarity_search_by_vectors_with_score(embeddings, k=candidates, where=where)):
+            vector_ranked[qi] = [doc.id for doc, _ in hits]
+    except Exception as e:
+        logging.warning(f"[multi_query_search] 批量向量检索失败，仅使用词法检索: {e}")
+
+    best: dict = {}
+    for qi, query in enumerate(queries):
+        lexical_query = build_lexical_query(query, extra_terms)
+        lexical_ranked = [doc_id for doc_id, _ in store.lexical_search(lexical_query, k=candidates, candidates=allowed_ids)]
+        for doc_id, score in reciprocal_rank_fusion([vector_ranked[qi], lexical_ranked], k=rrf_k)[:k]:
+            if score > best.get(doc_id, 0.0):
+                best[doc_id] = score
+
+    docs = []
+    for doc_id, _ in sorted(best.items(), key=lambda x: x[1], reverse=True):
+        doc = store.get_document(doc_id)
+        if doc is not None:
+            docs.append(doc)
+    return docs
@@ -0,0 +1,169 @@
+# novel_generator/retrieval_cache.py
+# -*- coding: utf-8 -*-
+"""
+草稿重试时的检索缓存：
+- 检索结果按 (向量库, 查询文本, 库标识与版本, k) 缓存，向量库有任何写入都会使版本号变化，旧结果随之失效；
+  库被删除后重建时版本号从 0 重新计数，库标识 store_id 随之改变，不会命中旧库的结果；
+- 查询向量按 (Embedding 模型, 文本) 缓存，与库版本无关；
+- 近章摘要 (summarize_recent_chapters_prompt) 与关键词生成 (knowledge_search_prompt) 的 LLM 输出
+  按章节输入的哈希持久化到项目目录；哈希只取确定的输入（目录信息、用户参数、近几章正文摘要），
+  重试同一章时两次调用都直接命中。
+"""
+import os
+import json
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Sequence
+
+from utils import read_file, save_string_to_txt
+from .local_vectorstore import LocalDocument, LocalVectorStore
+from .retrieval import multi_query_search
+
+MAX_RESULT_ENTRIES = 256
+MAX_EMBEDDING_ENTRIES = 1024
+KEYWORD_CACHE_FILE = "keyword_cache.json"
+
+
+class _LRU:
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._data: "OrderedDict" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def drop(self, predicate: Callable[[tuple], bool]):
+        with self._lock:
+            for key in [k for k in self._data if predicate(k)]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+_result_cache = _LRU(MAX_RESULT_ENTRIES)
+_embedding_cache = _LRU(MAX_EMBEDDING_ENTRIES)
+
+
+def _embedding_model_key(embedding_function) -> str:
+    model = getattr(embedding_function, "model_name", None) or getattr(getattr(embedding_function, "_embedding", None), "model", None)
+    return f"{type(embedding_function).__name__}:{model}"
+
+
+def embed_queries_cached(embedding_function, queries: Sequence[str]) -> List[List[float]]:
+    """只对未缓存的查询文本调用一次 embed_documents。"""
+    model_key = _embedding_model_key(embedding_function)
+    vectors: List[Optional[List[float]]] = [_embedding_cache.get((model_key, q)) for q in queries]
+    missing = [i for i, v in enumerate(vectors) if v is None]
+    if missing:
+        fresh = embedding_function.embed_documents([queries[i] for i in missing])
+        for i, vec in zip(missing, fresh):
+            vectors[i] = vec
+            if vec:
+                _embedding_cache.put((model_key, queries[i]), vec)
+    return [v or [] for v in vectors]
+
+
+def _copy_docs(docs: Sequence[LocalDocument]) -> List[LocalDocument]:
+    return [LocalDocument(doc.page_content, dict(doc.metadata), doc.id) for doc in docs]
+
+
+def cached_multi_query_search(
+    store: LocalVectorStore,
+    queries: Sequence[str],
+    k: int = 4,
+    extra_terms: Optional[Sequence[str]] = None,
+    where: Optional[dict] = None
+) -> List[LocalDocument]:
+    """
+    multi_query_search 的缓存版本。命中时不做任何 embedding 与检索；
+    库版本变化后，同一向量库的旧版本结果会被清除。缓存与返回的是各自的副本，调用方修改结果不影响缓存。
+    """
+    if store is None:
+        return []
+    store_key = os.path.abspath(store.persist_directory)
+    where_key = json.dumps(where, ensure_ascii=False, sort_keys=True) if where else ""
+    store_version = (store.store_id, store.version)
+    key = (store_key, tuple(queries), tuple(extra_terms or ()), store_version, k, where_key)
+    cached = _result_cache.get(key)
+    if cached is not None:
+        return _copy_docs(cached)
+
+    _result_cache.drop(lambda old: old[0] == store_key and old[3] != store_version)
+    embeddings = embed_queries_cached(store.embedding_function, list(queries)) if store.embedding_function else None
+    docs = multi_query_search(store, queries, k=k, extra_terms=extra_terms, embeddings=embeddings, where=where)
+    _result_cache.put(key, _copy_docs(docs))
+    return docs
+
+
+def invalidate_retrieval_cache(store: Optional[LocalVectorStore] = None):
+    """清除检索结果缓存；传入 store 时只清除该库的结果。"""
+    if store is None:
+        _result_cache.clear()
+        return
+    store_key = os.path.abspath(store.persist_directory)
+    _result_cache.drop(lambda old: old[0] == store_key)
+
+
+# ----------------- 章节准备阶段的 LLM 输出缓存 -----------------
+def chapter_inputs_hash(**inputs) -> str:
+    """对章节输入（章节号、目录信息、用户参数、近几章正文的摘要等）做稳定哈希；不要传入 LLM 的输出。"""
+    payload = json.dumps(inputs, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def _keyword_cache_path(filepath: str) -> str:
+    return os.path.join(filepath, "vectorstore", KEYWORD_CACHE_FILE)
+
+
+def memoize_llm_output(filepath: str, inputs_hash: str, generate: Callable[[], str], max_entries: int = 64) -> str:
+    """
+    按输入哈希缓存 LLM 输出；输入未变化时直接返回上次的输出。
+    空输出不缓存，避免把接口异常固化下来。
+    """
+    path = _keyword_cache_path(filepath)
+    cache: Dict[str, str] = {}
+    content = read_file(path)
+    if content:
+        try:
+            cache = json.loads(content)
+        except json.JSONDecodeError:
+            logging.warning("[memoize_llm_output] 缓存文件损坏，已忽略")
+            cache = {}
+    if inputs_hash in cache:
+        return cache[inputs_hash]
+
+    result = generate()
+    if result and result.strip():
+        cache[inputs_hash] = result
+        # 保留最近 max_entries 条（dict 保持插入顺序）
+        while len(cache) > max_entries:
+            cache.pop(next(iter(cache)))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        save_string_to_txt(json.dumps(cache, ensure_ascii=False, indent=2), path)
+    return result
+
+
+def memoize_keywords(filepath: str, inputs_hash: str, generate: Callable[[], str], max_entries: int = 64) -> str:
+    """关键词生成结果的缓存，见 memoize_llm_output。"""
+    return memoize_llm_output(filepath, f"keywords:{inputs_hash}", generate, max_entries)
+
+
+def memoize_recent_summary(filepath: str, inputs_hash: str, generate: Callable[[], str], max_entries: int = 64) -> str:
+    """近章摘要（当前章节摘要）的缓存，见 memoize_llm_output。"""
+    return memoize_llm_output(filepath, f"summary:{inputs_hash}", generate, max_entries)
@@ -0,0 +1,439 @@
+# novel_generator/runner.py
+# -*- coding: utf-8 -*-
+"""
+无界面的生成流程编排，供命令行 (cli.py) 与服务端批量任务复用：
+- 从 config.json（与 GUI 相同的结构）解析 LLM / Embedding / 小说参数；
+- 依次执行 架构 -> 目录 -> 第 N..M 章草稿与定稿（定稿的子步骤按依赖图并发执行）；
+- 每一步通过 emit 回调输出结构化进度事件，不依赖 tkinter；
+- 每一步的开始/完成记入项目的步骤日志（见 step_journal），中断后重跑跳过已完成且输入未变的步骤。
+"""
+import os
+import time
+import logging
+import traceback
+from typing import Callable, Dict, Iterable, List, Optional
+
+from .step_journal import StepJournal, file_digest, value_digest
+
+STEP_ARCHITECTURE = "architecture"
+STEP_BLUEPRINT = "blueprint"
+STEP_DRAFT = "draft"
+STEP_FINALIZE = "finalize"
+STEP_CONSISTENCY = "consistency"
+
+ARCHITECTURE_FILE = "Novel_architecture.txt"
+BLUEPRINT_FILE = "Novel_directory.txt"
+SUMMARY_FILE = "global_summary.txt"
+CHARACTER_STATE_FILE = "character_state.txt"
+CHARACTER_STORE_FILE = "character_state.json"
+CONSISTENCY_DIR = "consistency"
+
+DEFAULT_LLM_CONFIG = {
+    "api_key": "",
+    "base_url": "https://api.openai.com/v1",
+    "model_name": "gpt-4o-mini",
+    "temperature": 0.7,
+    "max_tokens": 8192,
+    "timeout": 600
+}
+DEFAULT_EMBEDDING_CONFIG = {
+    "api_key": "",
+    "base_url": "https://api.openai.com/v1",
+    "model_name": "text-embedding-ada-002",
+    "retrieval_k": 4
+}
+DEFAULT_NOVEL_PARAMS = {
+    "topic": "",
+    "genre": "玄幻",
+    "num_chapters": 10,
+    "word_number": 3000,
+    "filepath": "",
+    "user_guidance": "",
+    "characters_involved": "",
+    "key_items": "",
+    "scene_location": "",
+    "time_constraint": ""
+}
+
+
+def resolve_run_settings(config: dict, overrides: Optional[dict] = None) -> dict:
+    """
+    按 GUI 的取值规则从配置中选出当前 LLM / Embedding 配置与小说参数，
+    overrides 中非 None 的值覆盖 other_params 中的同名项。
+    """
+    config = config or {}
+    llm_format = config.get("last_interface_format", "OpenAI")
+    embedding_format = config.get("last_embedding_interface_format", "OpenAI")
+    llm_conf = dict(DEFAULT_LLM_CONFIG, **config.get("llm_configs", {}).get(llm_format, {}))
+    emb_conf = dict(DEFAULT_EMBEDDING_CONFIG, **config.get("embedding_configs", {}).get(embedding_format, {}))
+    params = dict(DEFAULT_NOVEL_PARAMS, **config.get("other_params", {}))
+    for key, value in (overrides or {}).items():
+        if value is not None:
+            params[key] = value
+    return {
+        "interface_format": llm_format,
+        "llm": llm_conf,
+        "embedding_interface_format": embedding_format,
+        "embedding": emb_conf,
+        "params": params,
+        "quality": dict(config.get("draft_quality") or {})
+    }
+
+
+def _llm_kwargs(settings: dict) -> dict:
+    llm = settings["llm"]
+    return {
+        "interface_format": settings["interface_format"],
+        "api_key": llm["api_key"],
+        "base_url": llm["base_url"],
+        "temperature": float(llm["temperature"]),
+        "max_tokens": int(llm["max_tokens"]),
+        "timeout": int(llm["timeout"])
+    }
+
+
+def run_architecture(settings: dict, emit: Callable[[dict], None] = lambda event: None):
+    """各阶段按依赖并发生成并逐阶段保存检查点（见 architecture_graph）。"""
+    from .architecture_graph import Novel_architecture_generate_graph
+    params = settings["params"]
+    Novel_architecture_generate_graph(
+        llm_model=settings["llm"]["model_name"],
+        topic=params["topic"],
+        genre=params["genre"],
+        number_of_chapters=int(params["num_chapters"]),
+        word_number=int(params["word_number"]),
+        filepath=params["filepath"],
+        user_guidance=params["user_guidance"],
+        emit=emit,
+        **_llm_kwargs(settings)
+    )
+
+
+def run_blueprint(settings: dict, parallel: bool = False):
+    """parallel 时先生成分块骨架，再并发生成各章节区间（见 blueprint_parallel）。"""
+    if parallel:
+        from .blueprint_parallel import Chapter_blueprint_generate_parallel as Chapter_blueprint_generate
+    else:
+        from .blueprint import Chapter_blueprint_generate
+    params = settings["params"]
+    Chapter_blueprint_generate(
+        llm_model=settings["llm"]["model_name"],
+        filepath=params["filepath"],
+        number_of_chapters=int(params["num_chapters"]),
+        user_guidance=params["user_guidance"],
+        **_llm_kwargs(settings)
+    )
+
+
+def run_draft(settings: dict, chapter_number: int, custom_prompt_text: Optional[str] = None,
+              emit: Callable[[dict], None] = lambda event: None) -> str:
+    """
+    未给出提示词时（非流水线模式）按 chapter_pipeline 的方式准备上下文并组装提示词，第 1 章沿用 generate_chapter_draft 的默认提示词。
+    生成草稿后做本地质量检查（见 draft_quality）：格式问题本地清理，字数不足或截断时续写，
+    空白或大段重复时重新生成；处理后仍不通过且配置了 fail_on_reject 时抛出异常，不再进入定稿与审校。
+    """
+    from .chapter import generate_chapter_draft
+    from .draft_quality import ensure_draft_quality, quality_config, save_quality_report
+    params, emb = settings["params"], settings["embedding"]
+    llm_kwargs = _llm_kwargs(settings)
+    if custom_prompt_text is None and chapter_number > 1:
+        # 与流水线模式相同的上下文准备：检索结果先经本地预过滤（去重、剔除与前文摘要重合的片段）再进入过滤调用
+        from .chapter_pipeline import build_chapter_draft_prompt
+        custom_prompt_text = build_chapter_draft_prompt(settings, chapter_number)
+
+    def generate() -> str:
+        return generate_chapter_draft(
+            model_name=settings["llm"]["model_name"],
+            filepath=params["filepath"],
+            novel_number=chapter_number,
+            word_number=int(params["word_number"]),
+            user_guidance=params["user_guidance"],
+            characters_involved=params["characters_involved"],
+            key_items=params["key_items"],
+            scene_location=params["scene_location"],
+            time_constraint=params["time_constraint"],
+            embedding_api_key=emb["api_key"],
+            embedding_url=emb["base_url"],
+            embedding_interface_format=settings["embedding_interface_format"],
+            embedding_model_name=emb["model_name"],
+            embedding_retrieval_k=int(emb["retrieval_k"]),
+            custom_prompt_text=custom_prompt_text,
+            **llm_kwargs
+        )
+
+    draft = generate()
+    quality = quality_config(settings.get("quality"))
+    if not quality["enabled"]:
+        return draft
+
+    def invoke(prompt: str) -> str:
+        from llm_adapters import create_llm_adapter
+        return create_llm_adapter(
+            interface_format=llm_kwargs["interface_format"],
+            base_url=llm_kwargs["base_url"],
+            model_name=settings["llm"]["model_name"],
+            api_key=llm_kwargs["api_key"],
+            temperature=llm_kwargs["temperature"],
+            max_tokens=llm_kwargs["max_tokens"],
+            timeout=llm_kwargs["timeout"]
+        ).invoke(prompt)
+
+    from utils import save_string_to_txt
+    from .blueprint_index import get_blueprint_index
+    filepath = params["filepath"]
+    checked, report = ensure_draft_quality(
+        draft,
+        int(params["word_number"]),
+        chapter_number,
+        regenerate=generate,
+        invoke=invoke,
+        config=quality,
+        chapter_title=get_blueprint_index(filepath).chapter_info(chapter_number)["chapter_title"],
+        emit=emit
+    )
+    if checked != draft:
+        # 重新生成时 generate_chapter_draft 已写入文件；清理与续写的结果在这里写回
+        save_string_to_txt(checked, os.path.join(filepath, "chapters", f"chapter_{chapter_number}.txt"))
+    save_quality_report(filepath, chapter_number, report)
+    emit({"event": "draft_quality", "chapter": chapter_number, "ok": report["ok"], "score": report["score"],
+          "issues": [issue["code"] for issue in report["issues"]], "fixes": [item["action"] for item in report["history"]]})
+    if not report["ok"] and quality["fail_on_reject"]:
+        details = "；".join(issue["message"] for issue in report["issues"] if issue["severity"] == "error")
+        raise RuntimeError(f"第{chapter_number}章草稿未通过质量检查（{report['score']}分）: {details}")
+    return checked
+
+
+def run_finalize(settings: dict, chapter_number: int, emit: Callable[[dict], None] = lambda event: None):
+    """并发定稿（见 finalize_graph）；任一子步骤最终失败时抛出异常，节点事件经 emit 输出。"""
+    from .finalize_graph import finalize_chapter_graph
+    from .task_graph import failed_nodes
+    params, emb = settings["params"], settings["embedding"]
+    results = finalize_chapter_graph(
+        novel_number=chapter_number,
+        word_number=int(params["word_number"]),
+        model_name=settings["llm"]["model_name"],
+        filepath=params["filepath"],
+        embedding_api_key=emb["api_key"],
+        embedding_url=emb["base_url"],
+        embedding_interface_format=settings["embedding_interface_format"],
+        embedding_model_name=emb["model_name"],
+        emit=lambda event: emit(dict(event, chapter=chapter_number)),
+        **_llm_kwargs(settings)
+    )
+    failed = failed_nodes(results)
+    if failed:
+        details = ", ".join(f"{name}({results[name]['error']})" for name in failed)
+        raise RuntimeError(f"定稿子步骤失败: {details}")
+
+
+def consistency_report_file(filepath: str, chapter_number: int) -> str:
+    return os.path.join(filepath, CONSISTENCY_DIR, f"chapter_{chapter_number}.txt")
+
+
+def run_consistency(settings: dict, chapter_number: int) -> str:
+    """对已定稿的章节做一致性审校，结果写入 consistency/chapter_N.txt 并返回。"""
+    from consistency_checker import check_consistency
+    from utils import read_file, save_string_to_txt
+    from .summary_store import summary_context_for_chapter
+    params = settings["params"]
+    filepath = params["filepath"]
+    chapter_text = read_file(os.path.join(filepath, "chapters", f"chapter_{chapter_number}.txt")).strip()
+    if not chapter_text:
+        raise RuntimeError(f"第{chapter_number}章正文为空，无法审校")
+    llm_kwargs = _llm_kwargs(settings)
+    report = check_consistency(
+        novel_setting=read_file(os.path.join(filepath, ARCHITECTURE_FILE)),
+        character_state=read_file(os.path.join(filepath, CHARACTER_STATE_FILE)),
+        global_summary=summary_context_for_chapter(filepath, chapter_number),
+        chapter_text=chapter_text,
+        api_key=llm_kwargs["api_key"],
+        base_url=llm_kwargs["base_url"],
+        model_name=settings["llm"]["model_name"],
+        temperature=llm_kwargs["temperature"],
+        interface_format=llm_kwargs["interface_format"],
+        max_tokens=llm_kwargs["max_tokens"],
+        timeout=llm_kwargs["timeout"],
+        characters_involved=params["characters_involved"]
+    )
+    os.makedirs(os.path.join(filepath, CONSISTENCY_DIR), exist_ok=True)
+    save_string_to_txt(report, consistency_report_file(filepath, chapter_number))
+    return report
+
+
+def journal_spec(journal: StepJournal, settings: dict, step: str, chapter: Optional[int] = None) -> dict:
+    """
+    步骤在日志中的 inputs（摘要）、outputs（commit 时记录的文件）、verify（跳过前需校验未被改动的文件）
+    与 snapshot（执行前快照的共享文件）。
+    """
+    params = settings["params"]
+    filepath = params["filepath"]
+    architecture_file = os.path.join(filepath, ARCHITECTURE_FILE)
+    blueprint_file = os.path.join(filepath, BLUEPRINT_FILE)
+    character_state_file = os.path.join(filepath, CHARACTER_STATE_FILE)
+    if step == STEP_ARCHITECTURE:
+        inputs = {"params": value_digest([params["topic"], params["genre"], int(params["num_chapters"]),
+                                          int(params["word_number"]), params["user_guidance"]])}
+        return {"inputs": inputs, "outputs": [architecture_file, character_state_file], "verify": [architecture_file], "snapshot": []}
+    if step == STEP_BLUEPRINT:
+        inputs = {"architecture": file_digest(architecture_file),
+                  "params": value_digest([int(params["num_chapters"]), params["user_guidance"]])}
+        return {"inputs": inputs, "outputs": [blueprint_file], "verify": [blueprint_file], "snapshot": []}
+
+    chapter_file = os.path.join(filepath, "chapters", f"chapter_{chapter}.txt")
+    if step == STEP_DRAFT:
+        inputs = {
+            "blueprint": file_digest(blueprint_file),
+            "previous_chapter": file_digest(os.path.join(filepath, "chapters", f"chapter_{chapter - 1}.txt")),
+            "params": value_digest([int(params["word_number"]), params["user_guidance"], params["characters_involved"],
+                                    params["key_items"], params["scene_location"], params["time_constraint"]])
+        }
+        return {"inputs": inputs, "outputs": [chapter_file], "verify": [chapter_file], "snapshot": []}
+    if step == STEP_CONSISTENCY:
+        report_file = consistency_report_file(filepath, chapter)
+        return {"inputs": {"chapter": file_digest(chapter_file)}, "outputs": [report_file], "verify": [report_file], "snapshot": []}
+    # 定稿可能扩写正文，因此以本章草稿的 commit 序号而非正文摘要作为输入：草稿重新生成后定稿随之失效
+    draft = journal.committed(STEP_DRAFT, chapter)
+    shared = [os.path.join(filepath, SUMMARY_FILE), character_state_file, os.path.join(filepath, CHARACTER_STORE_FILE)]
+    inputs = {"draft": str(draft["seq"]) if draft else "", "params": value_digest([int(params["word_number"])])}
+    return {"inputs": inputs, "outputs": [chapter_file] + shared, "verify": [chapter_file], "snapshot": [chapter_file] + shared}
+
+
+def journal_done(journal: StepJournal, settings: dict, step: str, chapter: Optional[int] = None) -> bool:
+    spec = journal_spec(journal, settings, step, chapter)
+    return journal.is_done(step, chapter, spec["inputs"], spec["verify"])
+
+
+def journaled(journal: StepJournal, settings: dict, step: str, func: Callable[[], object], chapter: Optional[int] = None):
+    """包装 func：执行前记录 start，成功后记录 commit，异常时记录 fail 并继续抛出。"""
+    def run():
+        spec = journal_spec(journal, settings, step, chapter)
+        journal.begin(step, chapter, spec["inputs"], spec["snapshot"])
+        try:
+            result = func()
+        except Exception as e:
+            journal.fail(step, chapter, str(e))
+            raise
+        journal.commit(step, chapter, spec["inputs"], spec["outputs"])
+        return result
+    return run
+
+
+def _run_step(emit: Callable[[dict], None], step: str, func: Callable[[], object], chapter: Optional[int] = None) -> bool:
+    event = {"step": step}
+    if chapter is not None:
+        event["chapter"] = chapter
+    emit({"event": "step_start", **event})
+    start = time.time()
+    try:
+        func()
+    except Exception as e:
+        logging.error(f"[runner] {step} 失败: {traceback.format_exc()}")
+        emit({"event": "step_failed", **event, "seconds": round(time.time() - start, 3), "error": str(e)})
+        return False
+    emit({"event": "step_done", **event, "seconds": round(time.time() - start, 3)})
+    return True
+
+
+def run_pipeline(
+    settings: dict,
+    steps: Iterable[str],
+    chapter_start: int = 1,
+    chapter_end: Optional[int] = None,
+    emit: Callable[[dict], None] = lambda event: None,
+    skip_existing: bool = False,
+    stop_on_error: bool = True,
+    pipelined: bool = False,
+    parallel_blueprint: bool = False,
+    resume: bool = True
+) -> Dict[str, List]:
+    """
+    按 steps（architecture / blueprint / draft / finalize / consistency 的子集）执行生成流程，
+    章节步骤对 chapter_start..chapter_end 逐章执行（chapter_end 默认为总章数）。
+    skip_existing 时，架构与目录文件已存在则跳过对应步骤。
+    parallel_blueprint 时章节目录分块并行生成。
+    resume 时跳过步骤日志中已完成且输入未变的步骤（否则全部重跑，但仍记录日志）。
+    pipelined 且同时包含草稿与定稿时，章节按流水线执行（见 chapter_pipeline），失败后的章节不再继续。
+    返回 {"completed": [...], "failed": [...]}，元素为 (步骤, 章节号或 None)。
+    """
+    steps = list(steps)
+    params = settings["params"]
+    filepath = params["filepath"]
+    if not filepath:
+        raise ValueError("未指定小说保存路径 (filepath)")
+    os.makedirs(filepath, exist_ok=True)
+    chapter_end = int(chapter_end or params["num_chapters"])
+    result: Dict[str, List] = {"completed": [], "failed": []}
+    run_start = time.time()
+    journal = StepJournal(filepath)
+    recovered = journal.recover()
+    if recovered:
+        emit({"event": "journal_recovered", "steps": recovered})
+
+    def execute(step: str, func: Callable[[], object], chapter: Optional[int] = None) -> bool:
+        if resume and journal_done(journal, settings, step, chapter):
+            event = {"event": "step_skipped", "step": step, "reason": "journal"}
+            if chapter is not None:
+                event["chapter"] = chapter
+            emit(event)
+            return True
+        return _run_step(emit, step, journaled(journal, settings, step, func, chapter), chapter)
+
+    def record(ok: bool, step: str, chapter: Optional[int] = None) -> bool:
+        result["completed" if ok else "failed"].append((step, chapter))
+        return ok or not stop_on_error
+
+    for step, file_name, func in (
+        (STEP_ARCHITECTURE, ARCHITECTURE_FILE, lambda s: run_architecture(s, emit)),
+        (STEP_BLUEPRINT, BLUEPRINT_FILE, lambda s: run_blueprint(s, parallel=parallel_blueprint)),
+    ):
+        if step not in steps:
+            continue
+        if skip_existing and os.path.exists(os.path.join(filepath, file_name)):
+            emit({"event": "step_skipped", "step": step})
+            continue
+        if not record(execute(step, lambda: func(settings)), step):
+            emit({"event": "run_done", "ok": False, "seconds": round(time.time() - run_start, 3)})
+            return result
+
+    if STEP_DRAFT in steps:
+        from .blueprint_index import get_blueprint_index
+        index = get_blueprint_index(filepath)
+        index.refresh()
+        if index.problems:
+            # 格式问题会导致草稿拿不到对应章节的定位/简述，提前报告而不中断
+            emit({"event": "blueprint_problems", "problems": index.problems})
+
+    chapter_steps = [
+        (STEP_DRAFT, lambda n: run_draft(settings, n, emit=emit)),
+        (STEP_FINALIZE, lambda n: run_finalize(settings, n, emit)),
+        (STEP_CONSISTENCY, lambda n: run_consistency(settings, n)),
+    ]
+    if pipelined and STEP_DRAFT in steps and STEP_FINALIZE in steps:
+        from .chapter_pipeline import run_chapters_pipelined
+        node_results = run_chapters_pipelined(settings, chapter_start, chapter_end, emit, journal=journal, resume=resume)
+        for node, node_result in node_results.items():
+            step, chapter = node.rsplit("_", 1)
+            if step != "prep":
+                result["completed" if node_result["status"] == "done" else "failed"].append((step, int(chapter)))
+        if result["failed"] and stop_on_error:
+            emit({"event": "run_done", "ok": False, "seconds": round(time.time() - run_start, 3)})
+            return result
+        chapter_steps = [entry for entry in chapter_steps if entry[0] == STEP_CONSISTENCY]
+
+    failed_chapters = {chapter for _, chapter in result["failed"]}
+    for chapter in range(chapter_start, chapter_end + 1):
+        if chapter in failed_chapters:
+            continue
+        for step, func in chapter_steps:
+            if step not in steps:
+                continue
+            ok = execute(step, lambda: func(chapter), chapter)
+            if not record(ok, step, chapter):
+                emit({"event": "run_done", "ok": False, "seconds": round(time.time() - run_start, 3)})
+                return result
+            if not ok:
+                # 草稿失败时不再定稿本章，定稿失败时不再审校
+                break
+
+    emit({"event": "run_done", "ok": not result["failed"], "seconds": round(time.time() - run_start, 3)})
+    return result
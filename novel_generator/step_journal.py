@@ -0,0 +1,181 @@
+# novel_generator/step_journal.py
+# -*- coding: utf-8 -*-
+"""
+项目级的追加写步骤日志（<filepath>/.journal.jsonl），每行一条记录：
+
+    {"seq": 12, "event": "start",  "step": "finalize", "chapter": 3, "inputs": {...}, "ts": ...}
+    {"seq": 13, "event": "commit", "step": "finalize", "chapter": 3, "inputs": {...}, "outputs": {"chapters/chapter_3.txt": "<sha1>"}, "ts": ...}
+
+- 每条记录写入后立即 fsync，进程崩溃最多丢失正在写的那一行（加载时忽略不完整的行）；
+- 某步骤已 commit、输入摘要一致、且其输出文件仍是日志最后一次记录的内容时，视为已完成，重启后跳过；
+- begin 时可对步骤会改写的文件（正文、前文摘要、角色状态）做快照，
+  只有 start 没有 commit/fail 的步骤（中途崩溃）由 recover() 恢复快照，避免同一章被重复并入摘要。
+"""
+import os
+import json
+import time
+import shutil
+import hashlib
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional
+
+JOURNAL_FILE = ".journal.jsonl"
+SNAPSHOT_DIR = ".journal_snapshots"
+
+EVENT_START = "start"
+EVENT_COMMIT = "commit"
+EVENT_FAIL = "fail"
+
+
+def file_digest(path: str) -> str:
+    """文件内容的 sha1，不存在或为空的文件记为空串。"""
+    if not os.path.exists(path):
+        return ""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest() if os.path.getsize(path) else ""
+
+
+def value_digest(value) -> str:
+    """参数等任意可 JSON 序列化的值的摘要。"""
+    return hashlib.sha1(json.dumps(value, ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class StepJournal:
+    def __init__(self, filepath: str):
+        self.filepath = filepath
+        self.path = os.path.join(filepath, JOURNAL_FILE)
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._last: Dict[str, dict] = {}          # 步骤键 -> 最后一条记录
+        self._path_hashes: Dict[str, str] = {}    # 相对路径 -> 日志中最后一次写入后的摘要
+        self._load()
+
+    @staticmethod
+    def key(step: str, chapter: Optional[int] = None) -> str:
+        return step if chapter is None else f"{step}:{chapter}"
+
+    def _rel(self, path: str) -> str:
+        return os.path.relpath(path, self.filepath).replace(os.sep, "/")
+
+    def _abs(self, rel: str) -> str:
+        return os.path.join(self.filepath, *rel.split("/"))
+
+    def _apply(self, record: dict):
+        key = self.key(record["step"], record.get("chapter"))
+        self._seq = max(self._seq, record.get("seq", 0))
+        self._last[key] = record
+        if record["event"] == EVENT_COMMIT:
+            self._path_hashes.update(record.get("outputs") or {})
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line_no, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    self._apply(json.loads(line))
+                except (json.JSONDecodeError, KeyError):
+                    # 崩溃时写了一半的最后一行
+                    logging.warning(f"[step_journal] 忽略第{line_no}行不完整的记录: {self.path}")
+
+    def _append(self, record: dict) -> dict:
+        with self._lock:
+            self._seq += 1
+            record = dict(record, seq=self._seq, ts=round(time.time(), 3))
+            os.makedirs(self.filepath, exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._apply(record)
+        return record
+
+    def _snapshot_dir(self, step: str, chapter: Optional[int]) -> str:
+        return os.path.join(self.filepath, SNAPSHOT_DIR, self.key(step, chapter).replace(":", "_"))
+
+    def begin(self, step: str, chapter: Optional[int] = None, inputs: Optional[Dict[str, str]] = None,
+              snapshot: Iterable[str] = ()) -> dict:
+        """记录步骤开始；snapshot 中已存在的文件会被复制一份，供中途崩溃后恢复。"""
+        snapshot_dir = self._snapshot_dir(step, chapter)
+        shutil.rmtree(snapshot_dir, ignore_errors=True)
+        saved = []
+        for path in snapshot:
+            if os.path.exists(path):
+                target = os.path.join(snapshot_dir, self._rel(path))
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                shutil.copy2(path, target)
+                saved.append(self._rel(path))
+        return self._append({"event": EVENT_START, "step": step, "chapter": chapter, "inputs": inputs or {}, "snapshot": saved})
+
+    def commit(self, step: str, chapter: Optional[int] = None, inputs: Optional[Dict[str, str]] = None,
+               outputs: Iterable[str] = ()) -> dict:
+        """记录步骤完成及其输出文件的摘要，并清理快照。"""
+        record = self._append({"event": EVENT_COMMIT, "step": step, "chapter": chapter, "inputs": inputs or {},
+                               "outputs": {self._rel(p): file_digest(p) for p in outputs}})
+        shutil.rmtree(self._snapshot_dir(step, chapter), ignore_errors=True)
+        return record
+
+    def fail(self, step: str, chapter: Optional[int] = None, error: str = "") -> dict:
+        return self._append({"event": EVENT_FAIL, "step": step, "chapter": chapter, "error": error})
+
+    def committed(self, step: str, chapter: Optional[int] = None) -> Optional[dict]:
+        """该步骤最后一次 commit 记录（之后若有新的 start/fail 则返回 None）。"""
+        key = self.key(step, chapter)
+        last = self._last.get(key)
+        return last if last is not None and last["event"] == EVENT_COMMIT else None
+
+    def is_done(self, step: str, chapter: Optional[int] = None, inputs: Optional[Dict[str, str]] = None,
+                verify: Iterable[str] = ()) -> bool:
+        """
+        已 commit、输入摘要与本次一致，且 verify 中的文件自日志最后一次写入后未被改动（或删除）。
+        """
+        record = self.committed(step, chapter)
+        if record is None or record.get("inputs", {}) != (inputs or {}):
+            return False
+        for path in verify:
+            expected = self._path_hashes.get(self._rel(path))
+            if not expected or file_digest(path) != expected:
+                return False
+        return True
+
+    def interrupted(self) -> List[str]:
+        """只有 start、没有 commit/fail 的步骤键（上次运行在这些步骤中途退出）。"""
+        return [key for key, record in self._last.items() if record["event"] == EVENT_START]
+
+    def restore_snapshot(self, step: str, chapter: Optional[int] = None) -> List[str]:
+        """步骤上次中途退出时，把 begin 时快照的文件恢复原样，返回恢复的相对路径。"""
+        last = self._last.get(self.key(step, chapter))
+        if last is None or last["event"] != EVENT_START:
+            return []
+        snapshot_dir = self._snapshot_dir(step, chapter)
+        restored = []
+        for rel in last.get("snapshot") or []:
+            source = os.path.join(snapshot_dir, *rel.split("/"))
+            if os.path.exists(source):
+                shutil.copy2(source, self._abs(rel))
+                restored.append(rel)
+        if restored:
+            logging.info(f"[step_journal] {self.key(step, chapter)} 上次未完成，已恢复快照: {restored}")
+        return restored
+
+    def recover(self) -> Dict[str, List[str]]:
+        """
+        恢复所有中途退出步骤的快照并把它们记为 fail，返回 {步骤键: 恢复的文件}。
+        应在本次运行检查任何步骤之前调用一次，使被半途改写的文件回到该步骤开始前的状态；
+        记为 fail 后快照不会在以后的运行中被再次恢复。
+        """
+        recovered = {}
+        for key in self.interrupted():
+            record = self._last[key]
+            step, chapter = record["step"], record.get("chapter")
+            recovered[key] = self.restore_snapshot(step, chapter)
+            self.fail(step, chapter, "interrupted")
+            shutil.rmtree(self._snapshot_dir(step, chapter), ignore_errors=True)
+        return recovered
@@ -0,0 +1,227 @@
+# novel_generator/summary_store.py
+# -*- coding: utf-8 -*-
+"""
+分层前文摘要，存放在 <filepath>/summaries/：
+
+    chapter_{n}.txt   每章定稿时生成一次，只读本章正文（≤300 字）
+    arc_{a}.txt       每 arc_size 章汇总一次，只读该段的逐章摘要（≤500 字）
+    global.txt        每完成一段重建一次，只读各段摘要（≤2000 字）
+    legacy.txt        启用分层摘要前已有的 global_summary.txt，作为最早的一段保留
+
+每次定稿的输入只有本章正文，不再随全书长度增长；
+global_summary.txt 由 build_summary_context 按 token 预算组装（全书概要 + 近期各段 + 尚未汇总的逐章摘要），
+已有的草稿提示词无需改动即可读到细节程度合适的前文。
+"""
+import os
+import re
+import logging
+from typing import Dict, List, Optional
+
+from prompt_definitions import arc_summary_prompt, chapter_summary_prompt, global_summary_from_arcs_prompt
+from utils import estimate_tokens, read_file, save_string_to_txt
+
+SUMMARY_DIR = "summaries"
+ARC_SIZE = 10
+SUMMARY_TOKEN_BUDGET = 2000
+# 预算中先为全书概要与最近的阶段摘要预留的份额，其余留给逐章摘要，段中的十来章摘要不会挤掉全书概要
+GLOBAL_BUDGET_SHARE = 0.4
+ARC_BUDGET_SHARE = 0.25
+
+_ARC_FILE_RE = re.compile(r'^arc_(\d+)\.txt$')
+
+
+def summary_dir(filepath: str) -> str:
+    return os.path.join(filepath, SUMMARY_DIR)
+
+
+def chapter_summary_path(filepath: str, chapter_number: int) -> str:
+    return os.path.join(summary_dir(filepath), f"chapter_{chapter_number}.txt")
+
+
+def arc_summary_path(filepath: str, arc: int) -> str:
+    return os.path.join(summary_dir(filepath), f"arc_{arc}.txt")
+
+
+def arc_of(chapter_number: int, arc_size: int = ARC_SIZE) -> int:
+    return (chapter_number - 1) // arc_size + 1
+
+
+def arc_range(arc: int, arc_size: int = ARC_SIZE):
+    return (arc - 1) * arc_size + 1, arc * arc_size
+
+
+def _invoke(llm_adapter, prompt: str, what: str) -> str:
+    result = (llm_adapter.invoke(prompt) or "").strip()
+    if not result:
+        raise RuntimeError(f"{what}: LLM 返回为空")
+    return result
+
+
+def list_arcs(filepath: str) -> List[int]:
+    directory = summary_dir(filepath)
+    if not os.path.isdir(directory):
+        return []
+    return sorted(int(m.group(1)) for m in (_ARC_FILE_RE.match(name) for name in os.listdir(directory)) if m)
+
+
+def _ensure_legacy(filepath: str):
+    """首次启用分层摘要时，把已有的 global_summary.txt 保留为 legacy.txt。"""
+    directory = summary_dir(filepath)
+    if os.path.isdir(directory):
+        return
+    os.makedirs(directory, exist_ok=True)
+    legacy = read_file(os.path.join(filepath, "global_summary.txt")).strip()
+    if legacy:
+        save_string_to_txt(legacy, os.path.join(directory, "legacy.txt"))
+
+
+def summarize_chapter(llm_adapter, filepath: str, chapter_number: int, chapter_text: str) -> str:
+    summary = _invoke(llm_adapter, chapter_summary_prompt.format(novel_number=chapter_number, chapter_text=chapter_text),
+                      f"第{chapter_number}章摘要")
+    save_string_to_txt(summary, chapter_summary_path(filepath, chapter_number))
+    return summary
+
+
+def rollup_arc(llm_adapter, filepath: str, arc: int, arc_size: int = ARC_SIZE) -> str:
+    start, end = arc_range(arc, arc_size)
+    parts, missing = [], []
+    for n in range(start, end + 1):
+        text = read_file(chapter_summary_path(filepath, n)).strip()
+        if text:
+            parts.append(f"第{n}章：{text}")
+        else:
+            missing.append(n)
+    if missing:
+        logging.warning(f"[summary_store] 第{start}-{end}章缺少逐章摘要，按已有部分汇总: {missing}")
+    summary = _invoke(llm_adapter, arc_summary_prompt.format(start_chapter=start, end_chapter=end, chapter_summaries="\n".join(parts)),
+                      f"第{start}-{end}章阶段摘要")
+    save_string_to_txt(summary, arc_summary_path(filepath, arc))
+    return summary
+
+
+def _arc_sections(filepath: str, arc_size: int) -> List[str]:
+    sections = []
+    legacy = read_file(os.path.join(summary_dir(filepath), "legacy.txt")).strip()
+    if legacy:
+        sections.append(f"【早期剧情】\n{legacy}")
+    for arc in list_arcs(filepath):
+        start, end = arc_range(arc, arc_size)
+        sections.append(f"【第{start}-{end}章】\n{read_file(arc_summary_path(filepath, arc)).strip()}")
+    return sections
+
+
+def rebuild_global(llm_adapter, filepath: str, arc_size: int = ARC_SIZE) -> str:
+    summary = _invoke(llm_adapter, global_summary_from_arcs_prompt.format(arc_summaries="\n\n".join(_arc_sections(filepath, arc_size))),
+                      "全书摘要")
+    save_string_to_txt(summary, os.path.join(summary_dir(filepath), "global.txt"))
+    return summary
+
+
+def _trim_to_tokens(text: str, token_budget: int) -> str:
+    """超出预算时保留开头部分（全书概要的开头是主线与核心设定）。"""
+    if estimate_tokens(text) <= token_budget:
+        return text
+    while text and estimate_tokens(text + "…") > token_budget:
+        text = text[:max(0, min(len(text) - 1, int(len(text) * token_budget / estimate_tokens(text + "…"))))]
+    return text + "…" if text else ""
+
+
+def build_summary_context(filepath: str, next_chapter: int, token_budget: int = SUMMARY_TOKEN_BUDGET,
+                          arc_size: int = ARC_SIZE) -> str:
+    """
+    为第 next_chapter 章组装前文摘要：
+    1. 全书概要（没有时用启用分层摘要前的旧摘要），最多占预算的 GLOBAL_BUDGET_SHARE，超出时截断；
+    2. 各段摘要从最近一段往前，最多占预算的 ARC_BUDGET_SHARE；
+    3. 尚未汇总进任何一段的逐章摘要从最近一章往前，用去剩余预算；
+    4. 仍有剩余时补入更早的段摘要。
+    输出按时间顺序排列。
+    """
+    arcs = [a for a in list_arcs(filepath) if arc_range(a, arc_size)[1] < next_chapter]
+    covered_end = max((arc_range(a, arc_size)[1] for a in arcs), default=0)
+    remaining = token_budget
+
+    global_title = "全书概要"
+    global_text = read_file(os.path.join(summary_dir(filepath), "global.txt")).strip()
+    if not global_text and not arcs:
+        global_title = "早期剧情"
+        global_text = read_file(os.path.join(summary_dir(filepath), "legacy.txt")).strip()
+    if global_text:
+        global_text = _trim_to_tokens(global_text, int(token_budget * GLOBAL_BUDGET_SHARE))
+        remaining -= estimate_tokens(global_text)
+
+    arc_entries: Dict[int, str] = {}
+
+    def add_arcs(limit: int) -> int:
+        used = 0
+        for arc in reversed(arcs):
+            if arc in arc_entries:
+                continue
+            start, end = arc_range(arc, arc_size)
+            entry = f"第{start}-{end}章：{read_file(arc_summary_path(filepath, arc)).strip()}"
+            cost = estimate_tokens(entry)
+            if used + cost > limit:
+                break
+            arc_entries[arc] = entry
+            used += cost
+        return used
+
+    remaining -= add_arcs(min(remaining, int(token_budget * ARC_BUDGET_SHARE)))
+
+    recent: List[str] = []
+    for n in range(next_chapter - 1, covered_end, -1):
+        text = read_file(chapter_summary_path(filepath, n)).strip()
+        if not text:
+            continue
+        entry = f"第{n}章：{text}"
+        cost = estimate_tokens(entry)
+        if cost > remaining:
+            break
+        recent.insert(0, entry)
+        remaining -= cost
+
+    remaining -= add_arcs(remaining)
+
+    sections = []
+    if global_text:
+        sections.append(f"【{global_title}】\n{global_text}")
+    if arc_entries:
+        sections.append("【近期阶段】\n" + "\n".join(arc_entries[arc] for arc in sorted(arc_entries)))
+    if recent:
+        sections.append("【近章摘要】\n" + "\n".join(recent))
+    return "\n\n".join(sections)
+
+
+def summary_context_for_chapter(filepath: str, chapter_number: int, token_budget: int = SUMMARY_TOKEN_BUDGET,
+                                arc_size: int = ARC_SIZE) -> str:
+    """生成第 chapter_number 章时使用的前文摘要；未启用分层摘要的项目直接读取 global_summary.txt。"""
+    if not os.path.isdir(summary_dir(filepath)):
+        return read_file(os.path.join(filepath, "global_summary.txt"))
+    return build_summary_context(filepath, chapter_number, token_budget, arc_size)
+
+
+def update_hierarchical_summary(
+    llm_adapter,
+    filepath: str,
+    chapter_number: int,
+    chapter_text: str,
+    arc_size: int = ARC_SIZE,
+    token_budget: int = SUMMARY_TOKEN_BUDGET
+) -> Dict[str, object]:
+    """
+    定稿时调用：生成本章摘要；本章所在一段已写完（或此前已汇总过、本章是重新定稿）时重新汇总该段并重建全书概要；
+    最后按预算重写 global_summary.txt。返回 {"chapter_summary", "arc", "context"}，arc 为本次汇总的段号或 None。
+    重复执行结果一致（各层文件都是覆盖写），可安全重跑。
+    """
+    _ensure_legacy(filepath)
+    chapter_summary = summarize_chapter(llm_adapter, filepath, chapter_number, chapter_text)
+
+    arc = arc_of(chapter_number, arc_size)
+    rolled: Optional[int] = None
+    if chapter_number == arc_range(arc, arc_size)[1] or os.path.exists(arc_summary_path(filepath, arc)):
+        rollup_arc(llm_adapter, filepath, arc, arc_size)
+        rebuild_global(llm_adapter, filepath, arc_size)
+        rolled = arc
+
+    context = build_summary_context(filepath, chapter_number + 1, token_budget, arc_size)
+    save_string_to_txt(context, os.path.join(filepath, "global_summary.txt"))
+    return {"chapter_summary": chapter_summary, "arc": rolled, "context": context}
@@ -0,0 +1,124 @@
+# novel_generator/task_graph.py
+# -*- coding: utf-8 -*-
+"""
+轻量的依赖图执行器：
+- 节点声明依赖，依赖全部成功后立即提交到线程池，互不依赖的节点并发执行；
+- 每个节点独立计时、独立重试，失败只影响依赖它的下游节点（标记为 skipped）；
+- run(only=[...], previous=...) 可只重跑指定节点，其余节点复用上一次的成功结果。
+"""
+import time
+import logging
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+STATUS_SKIPPED = "skipped"
+
+
+class TaskGraph:
+    """
+    节点函数签名为 func(inputs: Dict[str, Any]) -> Any，inputs 为各依赖节点的返回值。
+    """
+    def __init__(self, name: str = "task_graph"):
+        self.name = name
+        self._nodes: Dict[str, dict] = {}
+
+    def add(self, name: str, func: Callable[[Dict[str, Any]], Any], deps: Iterable[str] = (), retries: int = 0) -> "TaskGraph":
+        if name in self._nodes:
+            raise ValueError(f"节点重复: {name}")
+        deps = list(deps)
+        for dep in deps:
+            if dep not in self._nodes:
+                raise ValueError(f"节点 {name} 依赖未定义的节点: {dep}")
+        self._nodes[name] = {"func": func, "deps": deps, "retries": retries}
+        return self
+
+    @property
+    def nodes(self) -> List[str]:
+        return list(self._nodes)
+
+    def _closure(self, names: Iterable[str]) -> List[str]:
+        """names 及其全部上游节点（保持添加顺序）。"""
+        needed = set()
+        stack = list(names)
+        while stack:
+            name = stack.pop()
+            if name not in self._nodes:
+                raise ValueError(f"未定义的节点: {name}")
+            if name not in needed:
+                needed.add(name)
+                stack.extend(self._nodes[name]["deps"])
+        return [n for n in self._nodes if n in needed]
+
+    def _execute(self, name: str, inputs: Dict[str, Any], emit: Callable[[dict], None]) -> dict:
+        node = self._nodes[name]
+        start = time.time()
+        attempts = 0
+        error = None
+        while attempts <= node["retries"]:
+            attempts += 1
+            emit({"event": "node_start", "graph": self.name, "node": name, "attempt": attempts})
+            try:
+                result = node["func"](inputs)
+                seconds = round(time.time() - start, 3)
+                emit({"event": "node_done", "graph": self.name, "node": name, "attempt": attempts, "seconds": seconds})
+                return {"status": STATUS_DONE, "result": result, "error": None, "seconds": seconds, "attempts": attempts}
+            except Exception as e:
+                error = str(e)
+                logging.warning(f"[{self.name}] 节点 {name} 第{attempts}次执行失败: {traceback.format_exc()}")
+        seconds = round(time.time() - start, 3)
+        emit({"event": "node_failed", "graph": self.name, "node": name, "attempt": attempts, "seconds": seconds, "error": error})
+        return {"status": STATUS_FAILED, "result": None, "error": error, "seconds": seconds, "attempts": attempts}
+
+    def run(
+        self,
+        max_workers: Optional[int] = None,
+        emit: Callable[[dict], None] = lambda event: None,
+        only: Optional[Iterable[str]] = None,
+        previous: Optional[Dict[str, dict]] = None
+    ) -> Dict[str, dict]:
+        """
+        执行图并返回 {节点名: {"status", "result", "error", "seconds", "attempts"}}。
+        :param only: 只执行这些节点（及其尚无成功结果的上游节点）
+        :param previous: 上一次 run 的返回值，其中成功的上游节点直接复用
+        """
+        targets = self._closure(only) if only is not None else self.nodes
+        results: Dict[str, dict] = {}
+        for name in targets:
+            prev = (previous or {}).get(name)
+            if only is not None and name not in set(only) and prev and prev["status"] == STATUS_DONE:
+                results[name] = prev
+
+        pending = [n for n in targets if n not in results]
+        running = {}
+        start = time.time()
+        with ThreadPoolExecutor(max_workers=max_workers or max(1, len(pending))) as pool:
+            while pending or running:
+                for name in list(pending):
+                    deps = self._nodes[name]["deps"]
+                    if any(d in results and results[d]["status"] != STATUS_DONE for d in deps):
+                        failed_deps = [d for d in deps if results.get(d, {}).get("status") != STATUS_DONE]
+                        results[name] = {"status": STATUS_SKIPPED, "result": None, "error": f"上游失败: {', '.join(failed_deps)}",
+                                         "seconds": 0.0, "attempts": 0}
+                        emit({"event": "node_skipped", "graph": self.name, "node": name, "error": results[name]["error"]})
+                        pending.remove(name)
+                    elif all(d in results for d in deps):
+                        inputs = {d: results[d]["result"] for d in deps}
+                        running[pool.submit(self._execute, name, inputs, emit)] = name
+                        pending.remove(name)
+                if not running:
+                    continue
+                done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in done:
+                    results[running.pop(future)] = future.result()
+
+        emit({"event": "graph_done", "graph": self.name, "seconds": round(time.time() - start, 3),
+              "failed": [n for n in targets if results[n]["status"] != STATUS_DONE]})
+        return {n: results[n] for n in targets}
+
+
+def failed_nodes(results: Dict[str, dict]) -> List[str]:
+    """run() 结果中未成功（失败或因上游失败被跳过）的节点。"""
+    return [name for name, r in results.items() if r["status"] != STATUS_DONE]
@@ -0,0 +1,140 @@
+# novel_generator/text_splitter.py
+# -*- coding: utf-8 -*-
+"""
+面向中文小说文本的句子感知切分器：
+- 单次线性扫描，在 。！？；… 以及换行处断句，句末紧跟的右引号/右括号归入本句；
+- 引号内部的句末标点不断句（对话整体保留在一句中），除非引号内文本过长；
+- 按目标 token 数打包句子，并可保留若干 token 的句子级重叠。
+"""
+from collections import deque
+from typing import Deque, List, Tuple
+
+from utils import estimate_tokens
+
+SENTENCE_ENDINGS = set("。！？；!?;…")
+CLOSING_MARKS = set("”’」』）)》】\"'")
+OPENING_QUOTES = set("“‘「『")
+QUOTE_PAIRS = {"“": "”", "‘": "’", "「": "」", "『": "』"}
+# 引号内超过该长度仍未闭合时，允许在句末标点处断句
+MAX_QUOTED_CHARS = 300
+
+DEFAULT_CHUNK_TOKENS = 400
+DEFAULT_OVERLAP_TOKENS = 50
+
+
+def split_sentences(text: str) -> List[str]:
+    """线性扫描断句，返回去除首尾空白后的非空句子。"""
+    sentences: List[str] = []
+    start = 0
+    quote_stack: List[str] = []
+    quote_start = 0
+    i = 0
+    n = len(text)
+    while i < n:
+        ch = text[i]
+        if ch == "\n":
+            piece = text[start:i].strip()
+            if piece:
+                sentences.append(piece)
+            start = i + 1
+            quote_stack = []
+            i += 1
+            continue
+        if ch in OPENING_QUOTES:
+            if not quote_stack:
+                quote_start = i
+            quote_stack.append(QUOTE_PAIRS[ch])
+        elif quote_stack and ch == quote_stack[-1]:
+            quote_stack.pop()
+            # 引号以句末标点收尾（如 "……了。”"）时，在右引号之后断句
+            if not quote_stack and i > 0 and text[i - 1] in SENTENCE_ENDINGS:
+                end = i + 1
+                while end < n and text[end] in CLOSING_MARKS:
+                    end += 1
+                piece = text[start:end].strip()
+                if piece:
+                    sentences.append(piece)
+                start = end
+                i = end
+                continue
+        if ch in SENTENCE_ENDINGS and (not quote_stack or i - quote_start > MAX_QUOTED_CHARS):
+            end = i + 1
+            # 连续的句末标点（如 "……"、"？！"）与紧随的右引号归入本句
+            while end < n and (text[end] in SENTENCE_ENDINGS or text[end] in CLOSING_MARKS):
+                if quote_stack and text[end] == quote_stack[-1]:
+                    quote_stack.pop()
+                end += 1
+            piece = text[start:end].strip()
+            if piece:
+                sentences.append(piece)
+            start = end
+            if quote_stack:
+                quote_stack = []
+            i = end
+            continue
+        i += 1
+    tail = text[start:].strip()
+    if tail:
+        sentences.append(tail)
+    return sentences
+
+
+def _hard_split(sentence: str, chunk_tokens: int) -> List[str]:
+    """超长句按估算 token 数硬切（仅在没有任何句末标点的长段落上发生）。"""
+    pieces = []
+    current_start = 0
+    tokens = 0.0
+    for i, ch in enumerate(sentence):
+        # 与 estimate_tokens 的口径一致：中日韩字符 1 个 token，其余 4 个字符 1 个 token
+        tokens += 1.0 if '\u3400' <= ch <= '\u9fff' else 0.25
+        if tokens >= chunk_tokens:
+            pieces.append(sentence[current_start:i + 1])
+            current_start = i + 1
+            tokens = 0.0
+    if current_start < len(sentence):
+        pieces.append(sentence[current_start:])
+    return pieces
+
+
+class ChineseSentenceSplitter:
+    """
+    :param chunk_tokens: 每个片段的目标 token 数（估算值）
+    :param overlap_tokens: 相邻片段之间的重叠 token 数，按整句保留
+    """
+    def __init__(self, chunk_tokens: int = DEFAULT_CHUNK_TOKENS, overlap_tokens: int = DEFAULT_OVERLAP_TOKENS):
+        if overlap_tokens >= chunk_tokens:
+            raise ValueError("overlap_tokens 必须小于 chunk_tokens")
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+
+    def split_text(self, text: str) -> List[str]:
+        chunks: List[str] = []
+        window: Deque[Tuple[str, int]] = deque()
+        window_tokens = 0
+        fresh = False  # 窗口中是否有尚未输出过的句子
+
+        for sentence in split_sentences(text):
+            cost = estimate_tokens(sentence)
+            parts = _hard_split(sentence, self.chunk_tokens) if cost > self.chunk_tokens else [sentence]
+            for part in parts:
+                part_cost = estimate_tokens(part) if len(parts) > 1 else cost
+                if fresh and window_tokens + part_cost > self.chunk_tokens:
+                    chunks.append("".join(s for s, _ in window))
+                    fresh = False
+                    # 只保留末尾不超过 overlap_tokens 的整句作为下一片段的开头
+                    while window and (window_tokens > self.overlap_tokens or window_tokens + part_cost > self.chunk_tokens):
+                        _, dropped = window.popleft()
+                        window_tokens -= dropped
+                window.append((part, part_cost))
+                window_tokens += part_cost
+                fresh = True
+        if fresh and window:
+            chunks.append("".join(s for s, _ in window))
+        return chunks
+
+    __call__ = split_text
+
+
+def split_text_for_index(text: str, chunk_tokens: int = DEFAULT_CHUNK_TOKENS, overlap_tokens: int = DEFAULT_OVERLAP_TOKENS) -> List[str]:
+    """便捷函数：按默认参数切分文本。"""
+    return ChineseSentenceSplitter(chunk_tokens, overlap_tokens).split_text(text)
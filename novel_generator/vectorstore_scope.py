@@ -0,0 +1,106 @@
+# novel_generator/vectorstore_scope.py
+# -*- coding: utf-8 -*-
+"""
+按命名空间清理本地向量库，代替整库清空：
+- 单个知识文件（按导入时记录的绝对路径匹配，不同目录下的同名文件互不影响）、全部知识（保留章节）、某个章节范围、全部内容；
+- 通过元数据索引定位切块后按 id 删除，其它内容无需重新 embedding；
+- 同时清理对应的章节切块清单与知识导入检查点，重新定稿/导入时会完整重建被清理的部分；
+- 删除量较大导致墓碑占比过高时自动压缩。
+"""
+import os
+import glob
+import logging
+from typing import Dict, Optional, Tuple
+
+from .chapter_indexing import get_manifest_dir
+from .knowledge_stream import _checkpoint_dir, _load_checkpoint
+from .local_vectorstore import get_local_vectorstore_dir, open_local_vector_store
+from .metadata_index import SOURCE_CHAPTER, SOURCE_KNOWLEDGE, build_metadata_filter
+
+SCOPE_KNOWLEDGE = "knowledge"
+SCOPE_CHAPTERS = "chapters"
+SCOPE_ALL = "all"
+
+
+def _remove_knowledge_checkpoints(filepath: str, file_path: Optional[str]) -> int:
+    """删除知识导入检查点；file_path 为空时删除全部，否则只删除记录的绝对路径与之相同的检查点。"""
+    removed = 0
+    target = os.path.abspath(file_path) if file_path else None
+    for path in glob.glob(os.path.join(_checkpoint_dir(filepath), "*.json")):
+        if target and _load_checkpoint(path).get("file", "") != target:
+            continue
+        os.remove(path)
+        removed += 1
+    return removed
+
+
+def _remove_chapter_manifests(filepath: str, chapter_range: Optional[Tuple[Optional[int], Optional[int]]]) -> int:
+    removed = 0
+    start, end = chapter_range or (None, None)
+    for path in glob.glob(os.path.join(get_manifest_dir(filepath), "chapter_*.json")):
+        try:
+            number = int(os.path.basename(path)[len("chapter_"):-len(".json")])
+        except ValueError:
+            continue
+        if (start is not None and number < start) or (end is not None and number > end):
+            continue
+        os.remove(path)
+        removed += 1
+    return removed
+
+
+def clear_vector_store_scope(
+    filepath: str,
+    scope: str = SCOPE_KNOWLEDGE,
+    file_path: Optional[str] = None,
+    chapter_range: Optional[Tuple[Optional[int], Optional[int]]] = None,
+    compact: bool = True
+) -> Dict[str, int]:
+    """
+    :param scope: "knowledge"（可用 file_path 限定为单个知识文件）、"chapters"（可用 chapter_range 限定范围）或 "all"
+    :param file_path: 知识文件路径（导入时的路径，或 list_knowledge_files 返回的键）
+    :param chapter_range: (起始章, 结束章)，两端均包含
+    :param compact: 删除后墓碑占比过高时是否自动压缩
+    :return: {"deleted": 删除的切块数, "manifests": 删除的清单数, "checkpoints": 删除的检查点数}
+    """
+    if scope == SCOPE_KNOWLEDGE:
+        where = build_metadata_filter(source=SOURCE_KNOWLEDGE)
+        if file_path:
+            where = {"$and": [where, {"path": os.path.abspath(file_path)}]}
+    elif scope == SCOPE_CHAPTERS:
+        where = build_metadata_filter(source=SOURCE_CHAPTER, chapter_range=chapter_range)
+    elif scope == SCOPE_ALL:
+        where = None
+    else:
+        raise ValueError(f"未知的清理范围: {scope}")
+
+    stats = {"deleted": 0, "manifests": 0, "checkpoints": 0}
+    if os.path.exists(get_local_vectorstore_dir(filepath)):
+        store = open_local_vector_store(filepath)
+        stats["deleted"] = store.delete(ids=store.filter_ids(None)) if where is None else store.delete(where=where)
+        if compact and stats["deleted"] and store.needs_compaction():
+            store.compact()
+
+    if scope in (SCOPE_KNOWLEDGE, SCOPE_ALL):
+        stats["checkpoints"] = _remove_knowledge_checkpoints(filepath, file_path if scope == SCOPE_KNOWLEDGE else None)
+    if scope in (SCOPE_CHAPTERS, SCOPE_ALL):
+        stats["manifests"] = _remove_chapter_manifests(filepath, chapter_range if scope == SCOPE_CHAPTERS else None)
+
+    logging.info(f"[clear_vector_store_scope] 清理范围 {scope} (file={file_path}, chapters={chapter_range}): "
+                 f"删除 {stats['deleted']} 个切块，{stats['manifests']} 个章节清单，{stats['checkpoints']} 个导入检查点")
+    return stats
+
+
+def list_knowledge_files(filepath: str) -> Dict[str, int]:
+    """
+    返回向量库中各知识文件的切块数，供界面选择要清理的文件；
+    键为导入时记录的绝对路径，可直接作为 clear_vector_store_scope 的 file_path。
+    """
+    counts: Dict[str, int] = {}
+    if not os.path.exists(get_local_vectorstore_dir(filepath)):
+        return counts
+    store = open_local_vector_store(filepath)
+    for meta in store.get(where={"source": SOURCE_KNOWLEDGE})["metadatas"]:
+        name = meta.get("path", "")
+        counts[name] = counts.get(name, 0) + 1
+    return counts
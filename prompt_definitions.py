@@ -357,6 +357,59 @@ chunked_chapter_blueprint_prompt = """\
 仅给出最终文本，不要解释任何内容。
 """
 
+# 5.1 分块并行生成：先生成弧线骨架，再由各分块独立展开
+chapter_blueprint_skeleton_prompt = """\
+基于以下元素：
+- 内容指导：{user_guidance}
+- 小说架构：
+{novel_architecture}
+
+全书共{number_of_chapters}章，已划分为以下章节区间：
+{chunk_ranges}
+
+请为每个区间设计弧线骨架，保证整体悬念曲线连贯、在第{number_of_chapters}章之前不出现结局。
+
+输出格式（每个区间一段，严格按给定区间顺序，不要增删区间）：
+第a-b章：[阶段目标，一句话]
+首章第a章：[一句话概括]
+末章第b章：[一句话概括]
+
+仅给出最终文本，不要解释任何内容。
+"""
+
+chunked_chapter_blueprint_from_skeleton_prompt = """\
+基于以下元素：
+- 内容指导：{user_guidance}
+- 小说架构：
+{novel_architecture}
+
+全书弧线骨架：
+{skeleton}
+
+前一章（第{prev_chapter}章）概要：{prev_summary}
+后一章（第{next_chapter}章）概要：{next_summary}
+
+现在请只设计第{n}章到第{m}章的节奏分布，须承接前一章、为后一章铺垫，并服务于骨架中本区间的阶段目标：
+1. 每3-5章构成一个悬念单元，包含完整的小高潮
+2. 每章明确章节定位、核心悬念类型、情感基调迁移、伏笔操作、认知颠覆强度
+
+输出格式示例：
+第n章 - [标题]
+本章定位：[角色/事件/主题/...]
+核心作用：[推进/转折/揭示/...]
+悬念密度：[紧凑/渐进/爆发/...]
+伏笔操作：埋设(A线索)→强化(B矛盾)...
+认知颠覆：★☆☆☆☆
+本章简述：[一句话概括]
+
+要求：
+- 必须且只能输出第{n}章到第{m}章，章节号连续。
+- 使用精炼语言描述，每章字数控制在100字以内。
+- 在第{number_of_chapters}章之前不要出现结局章节。
+
+仅给出最终文本，不要解释任何内容。
+"""
+
 # =============== 6. 前文摘要更新 ===================
 summary_prompt = """\
 以下是新完成的章节文本：
@@ -375,6 +428,47 @@ summary_prompt = """\
 仅返回前文摘要文本，不要解释任何内容。
 """
 
+# =============== 6.1 分层摘要（章 -> 卷 -> 全书）===================
+chapter_summary_prompt = """\
+以下是第{novel_number}章的正文：
+{chapter_text}
+
+请为本章写一段摘要。
+要求：
+- 写清本章发生的关键事件、人物行动与结果、新出现的人物/物品/伏笔
+- 客观描绘，不展开联想或解释
+- 字数控制在300字以内
+
+仅返回本章摘要文本，不要解释任何内容。
+"""
+
+arc_summary_prompt = """\
+以下是第{start_chapter}章到第{end_chapter}章的逐章摘要：
+{chapter_summaries}
+
+请把它们合并为这一段剧情的阶段摘要。
+要求：
+- 按时间顺序写清主线推进、主要冲突的变化与阶段结果
+- 保留仍未回收的伏笔与人物关系的重要变化，省略琐碎细节
+- 字数控制在500字以内
+
+仅返回阶段摘要文本，不要解释任何内容。
+"""
+
+global_summary_from_arcs_prompt = """\
+以下是全书已完成部分的各阶段摘要（按时间顺序）：
+{arc_summaries}
+
+请据此写出全书至今的前文摘要。
+要求：
+- 以简洁、连贯的语言描述全书进展，越早的阶段写得越概括
+- 保留仍影响后续剧情的设定、伏笔与人物关系
+- 客观描绘，不展开联想或解释
+- 总字数控制在2000字以内
+
+仅返回前文摘要文本，不要解释任何内容。
+"""
+
 # =============== 7. 角色状态更新 ===================
 create_character_state_prompt = """\
 依据当前角色动力学设定：{character_dynamics}
@@ -487,6 +581,39 @@ update_character_state_prompt = """\
 仅返回更新后的角色状态文本，不要解释任何内容。
 """
 
+# =============== 7.1 角色状态增量更新 ===================
+character_state_delta_prompt = """\
+以下是新完成的章节文本：
+{chapter_text}
+
+已登记的全部角色名：{known_characters}
+
+本章出场角色的当前状态：
+{present_states}
+
+请只针对本章中状态发生变化的角色，给出角色状态的增量修改，使用 JSON 格式：
+{{
+  "characters": {{
+    "角色名": {{
+      "物品": {{"条目名": "新描述"}},
+      "能力": {{"条目名": "新描述"}},
+      "状态": {{"身体状态": "新描述", "心理状态": "新描述"}},
+      "主要角色间关系网": {{"其他角色名": "新描述"}},
+      "触发或加深的事件": {{"事件名": "简要描述及影响"}}
+    }}
+  }},
+  "new_characters": {{"新出场的次要角色名": "一句话基本信息"}},
+  "removed_characters": ["已淡出视线、可删除的次要角色名"]
+}}
+
+要求：
+- 角色名必须与已登记的角色名完全一致；首次登场的主要角色直接写入 characters
+- 只写有变化的分类与条目，没有变化的省略；条目值写 null 表示删除该条目（例如物品遗失）
+- 本章没有任何变化时返回 {{"characters": {{}}}}
+
+仅返回 JSON，不要解释任何内容。
+"""
+
 # =============== 8. 章节正文写作 ===================
 
 # 8.1 第一章草稿提示
@@ -623,6 +750,20 @@ next_chapter_draft_prompt = """\
 - 不要使用markdown格式。
 """
 
+# 8.3 草稿续写（本地质量检查发现字数不足或结尾截断时使用）
+chapter_continuation_prompt = """\
+以下是第 {novel_number} 章《{chapter_title}》的草稿，目前约 {current_length} 字，目标约 {word_number} 字，
+草稿在结尾处中断或篇幅不足：
+
+草稿结尾部分：
+{draft_tail}
+
+请紧接着草稿的最后一个字继续写作，约 {remaining_words} 字，要求：
+- 从中断处自然衔接（若最后一句不完整，先把这句话写完），不要重复已有内容；
+- 保持原有的叙事视角、人物语气和文风，按本章的情节走向写完并收束本章；
+- 仅返回续写的正文文本，不使用小标题，不要使用markdown格式，不要解释任何内容。
+"""
+
 Character_Import_Prompt = """\
 根据以下文本内容，分析出所有角色及其属性信息，严格按照以下格式要求：
 
@@ -0,0 +1,185 @@
+# server.py
+# -*- coding: utf-8 -*-
+"""
+本地多项目任务服务（JSON over HTTP，不导入 tkinter / customtkinter）：
+
+    python server.py --config config.json --workers 4 --provider-limit OpenAI=3 --provider-limit DeepSeek=2
+
+接口：
+    POST /jobs                 加入任务，请求体见 parse_job_request，返回任务记录
+    GET  /jobs?status=&project= 任务列表
+    GET  /jobs/<id>?since=<事件id> 任务状态、进度与 since 之后的进度事件
+    POST /jobs/<id>/cancel     取消排队中的任务
+    GET  /health               队列各状态的任务数与执行中的任务数
+
+任务与进度事件保存在 SQLite（--db）中，服务重启后排队中的任务继续执行。
+"""
+import sys
+import json
+import logging
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from cli import ALL_STEPS, parse_steps
+from novel_generator.job_queue import DEFAULT_PROVIDER_LIMIT, JobQueue, JobWorkerPool
+
+MAX_BODY_BYTES = 1024 * 1024
+JOB_OPTIONS = ("overrides", "quality", "skip_existing", "keep_going", "pipeline", "parallel_blueprint", "resume")
+
+
+def parse_job_request(body: dict, default_config: str) -> dict:
+    """
+    请求体：
+        {"project": "./novels/book1", "steps": "all" 或 ["draft", "finalize"], "from": 1, "to": 20,
+         "config": "config.json", "overrides": {"topic": "...", "word_number": 3000}, "quality": {"max_attempts": 1},
+         "skip_existing": false, "keep_going": false, "pipeline": false, "parallel_blueprint": false, "resume": true}
+    只有 project 必填；参数不合法时抛出 ValueError。
+    """
+    if not isinstance(body, dict):
+        raise ValueError("请求体必须是 JSON 对象")
+    project = body.get("project")
+    if not project or not isinstance(project, str):
+        raise ValueError("缺少 project（小说保存路径）")
+    steps = body.get("steps", ALL_STEPS)
+    try:
+        steps = parse_steps(",".join(steps) if isinstance(steps, list) else str(steps))
+    except argparse.ArgumentTypeError as e:
+        raise ValueError(str(e))
+    if not steps:
+        raise ValueError("steps 为空")
+    chapter_start = int(body.get("from", 1))
+    chapter_end = int(body["to"]) if body.get("to") is not None else None
+    if chapter_start < 1 or (chapter_end is not None and chapter_end < chapter_start):
+        raise ValueError("章节范围不合法")
+    for key in ("overrides", "quality"):
+        if not isinstance(body.get(key) or {}, dict):
+            raise ValueError(f"{key} 必须是 JSON 对象")
+    return {
+        "project": project,
+        "steps": steps,
+        "config": body.get("config") or default_config,
+        "chapter_start": chapter_start,
+        "chapter_end": chapter_end,
+        "options": {key: body[key] for key in JOB_OPTIONS if key in body}
+    }
+
+
+def parse_provider_limit(value: str):
+    name, sep, limit = value.partition("=")
+    if not sep or not name.strip() or not limit.strip().isdigit() or int(limit) < 1:
+        raise argparse.ArgumentTypeError(f"格式应为 接口名=并发数: {value}")
+    return name.strip(), int(limit)
+
+
+class JobRequestHandler(BaseHTTPRequestHandler):
+    queue: JobQueue = None
+    pool: JobWorkerPool = None
+    default_config = "config.json"
+
+    def log_message(self, format, *args):
+        logging.debug(f"[server] {self.address_string()} {format % args}")
+
+    def _send(self, status: int, data):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            raise ValueError("请求体过大")
+        raw = self.rfile.read(length) if length else b"{}"
+        try:
+            return json.loads(raw.decode("utf-8") or "{}")
+        except (UnicodeDecodeError, json.JSONDecodeError):
+            raise ValueError("请求体不是合法的 JSON")
+
+    def _job_id(self, part: str):
+        return int(part) if part.isdigit() else None
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        parts = [p for p in url.path.split("/") if p]
+        if parts == ["health"]:
+            self._send(200, {"ok": True, "jobs": self.queue.counts(), "active": self.pool.active_count()})
+        elif parts == ["jobs"]:
+            self._send(200, {"jobs": self.queue.list(status=query.get("status"), project=query.get("project"))})
+        elif len(parts) == 2 and parts[0] == "jobs" and self._job_id(parts[1]) is not None:
+            job = self.queue.get(self._job_id(parts[1]))
+            if job is None:
+                self._send(404, {"error": "任务不存在"})
+                return
+            since = int(query.get("since", "0")) if query.get("since", "0").isdigit() else 0
+            self._send(200, dict(job, events=self.queue.events(job["id"], since=since)))
+        else:
+            self._send(404, {"error": "未知路径"})
+
+    def do_POST(self):
+        parts = [p for p in urlparse(self.path).path.split("/") if p]
+        if parts == ["jobs"]:
+            try:
+                request = parse_job_request(self._read_json(), self.default_config)
+                job = self.queue.enqueue(**request)
+            except (TypeError, ValueError) as e:
+                self._send(400, {"error": str(e)})
+                return
+            self.pool.wake()
+            self._send(201, job)
+        elif len(parts) == 3 and parts[0] == "jobs" and parts[2] == "cancel" and self._job_id(parts[1]) is not None:
+            job_id = self._job_id(parts[1])
+            if self.queue.get(job_id) is None:
+                self._send(404, {"error": "任务不存在"})
+            elif self.queue.cancel(job_id):
+                self._send(200, self.queue.get(job_id))
+            else:
+                self._send(409, {"error": "只能取消排队中的任务", "job": self.queue.get(job_id)})
+        else:
+            self._send(404, {"error": "未知路径"})
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="AI 小说生成器本地多项目任务服务")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址（默认只接受本机访问）")
+    parser.add_argument("--port", type=int, default=8765, help="监听端口")
+    parser.add_argument("--db", default="jobs.db", help="任务队列的 SQLite 文件")
+    parser.add_argument("--config", default="config.json", help="任务未指定 config 时使用的配置文件")
+    parser.add_argument("--workers", type=int, default=4, help="同时执行的任务数上限（同一项目的任务依次执行）")
+    parser.add_argument("--provider-limit", type=parse_provider_limit, action="append", default=[],
+                        help="单个 LLM 接口同时进行的调用数（所有任务合计），如 OpenAI=3，可重复指定")
+    parser.add_argument("--default-provider-limit", type=int, default=DEFAULT_PROVIDER_LIMIT,
+                        help="未单独指定的接口同时进行的调用数")
+    parser.add_argument("--log-level", default="INFO", help="标准错误上的日志级别")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(stream=sys.stderr, level=getattr(logging, args.log_level.upper(), logging.INFO),
+                        format="%(asctime)s [%(levelname)s] %(message)s")
+
+    queue = JobQueue(args.db)
+    pool = JobWorkerPool(queue, max_workers=args.workers, provider_limits=dict(args.provider_limit),
+                         default_limit=args.default_provider_limit)
+    JobRequestHandler.queue = queue
+    JobRequestHandler.pool = pool
+    JobRequestHandler.default_config = args.config
+    server = ThreadingHTTPServer((args.host, args.port), JobRequestHandler)
+    pool.start()
+    logging.info(f"[server] 监听 http://{args.host}:{args.port}，任务队列: {args.db}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        # 等待执行中的任务结束；强制退出时这些任务在下次启动时重新排队，已完成的步骤由步骤日志跳过
+        logging.info("[server] 等待执行中的任务结束（再次 Ctrl+C 强制退出）")
+        pool.stop(wait=True)
+        queue.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
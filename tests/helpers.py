@@ -0,0 +1,44 @@
+# tests/helpers.py
+# -*- coding: utf-8 -*-
+"""测试用的确定性 Embedding 与 LLM：不访问网络，结果只取决于输入文本。"""
+import hashlib
+from typing import Callable, List, Optional
+
+EMBEDDING_DIM = 16
+
+
+def text_vector(text: str, dim: int = EMBEDDING_DIM) -> List[float]:
+    """按二元组哈希累加得到的向量，内容相近的文本向量也相近。"""
+    vector = [0.0] * dim
+    for i in range(max(1, len(text) - 1)):
+        digest = hashlib.md5(text[i:i + 2].encode("utf-8")).digest()
+        vector[digest[0] % dim] += 1.0
+    return vector
+
+
+class HashEmbedding:
+    def __init__(self):
+        self.calls = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        return [text_vector(t) for t in texts]
+
+    def embed_query(self, query: str) -> List[float]:
+        self.calls += 1
+        return text_vector(query)
+
+
+class ScriptedLLM:
+    """按顺序返回预设回复（或按提示词计算回复），记录收到的提示词。"""
+
+    def __init__(self, responses=None, respond: Optional[Callable[[str], str]] = None):
+        self.responses = list(responses or [])
+        self.respond = respond
+        self.prompts: List[str] = []
+
+    def invoke(self, prompt: str) -> str:
+        self.prompts.append(prompt)
+        if self.respond is not None:
+            return self.respond(prompt)
+        return self.responses.pop(0) if self.responses else ""
@@ -0,0 +1,92 @@
+# tests/test_architecture_graph.py
+# -*- coding: utf-8 -*-
+import json
+import os
+import threading
+
+import pytest
+
+from novel_generator import architecture_graph
+from novel_generator.architecture_graph import ARCHITECTURE_CHECKPOINT, Novel_architecture_generate_graph
+from utils import read_file
+
+from helpers import ScriptedLLM
+
+
+def stage_of(prompt):
+    """按各阶段提示词模板的特征判断当前是哪个阶段。"""
+    if prompt.startswith("作为专业作家"):
+        return "core_seed"
+    if prompt.startswith("依据当前角色动力学"):
+        return "character_state"
+    if "角色体系：" in prompt:
+        return "plot_architecture"
+    if "核心冲突：" in prompt:
+        return "world_building"
+    return "character_dynamics"
+
+
+def generate(filepath, llm, monkeypatch, topic="修仙"):
+    monkeypatch.setattr(architecture_graph, "create_llm_adapter", lambda **kwargs: llm)
+    return Novel_architecture_generate_graph(
+        interface_format="OpenAI", api_key="", base_url="", llm_model="m", topic=topic, genre="玄幻",
+        number_of_chapters=10, word_number=3000, filepath=filepath, retries=0)
+
+
+def test_independent_stages_run_concurrently_and_outputs_are_assembled(tmp_path, monkeypatch):
+    filepath = str(tmp_path)
+    barrier = threading.Barrier(2, timeout=5)
+
+    def respond(prompt):
+        stage = stage_of(prompt)
+        if stage in ("character_dynamics", "world_building"):
+            barrier.wait()  # 角色动力学与世界观必须同时在生成
+        return f"<{stage}>"
+
+    llm = ScriptedLLM(respond=respond)
+    generate(filepath, llm, monkeypatch)
+
+    assert sorted(stage_of(p) for p in llm.prompts) == sorted(architecture_graph.STAGES)
+    plot_prompt = next(p for p in llm.prompts if stage_of(p) == "plot_architecture")
+    assert "<character_dynamics>" in plot_prompt and "<world_building>" in plot_prompt
+    architecture = read_file(os.path.join(filepath, "Novel_architecture.txt"))
+    assert architecture.index("<core_seed>") < architecture.index("<world_building>") < architecture.index("<plot_architecture>")
+    assert read_file(os.path.join(filepath, "character_state.txt")) == "<character_state>"
+    assert not os.path.exists(os.path.join(filepath, ARCHITECTURE_CHECKPOINT))
+
+
+def test_failed_stage_keeps_checkpoint_and_rerun_generates_only_missing(tmp_path, monkeypatch):
+    filepath = str(tmp_path)
+    broken = {"on": True}
+
+    def respond(prompt):
+        stage = stage_of(prompt)
+        return "" if stage == "plot_architecture" and broken["on"] else f"<{stage}>"
+
+    with pytest.raises(RuntimeError):
+        generate(filepath, ScriptedLLM(respond=respond), monkeypatch)
+    with open(os.path.join(filepath, ARCHITECTURE_CHECKPOINT), encoding="utf-8") as f:
+        saved = json.load(f)
+    assert saved["core_seed_result"] == "<core_seed>" and "plot_arch_result" not in saved
+
+    broken["on"] = False
+    llm = ScriptedLLM(respond=respond)
+    generate(filepath, llm, monkeypatch)
+    assert [stage_of(p) for p in llm.prompts] == ["plot_architecture"]
+    assert "<plot_architecture>" in read_file(os.path.join(filepath, "Novel_architecture.txt"))
+
+
+def test_changed_inputs_discard_old_checkpoint(tmp_path, monkeypatch):
+    filepath = str(tmp_path)
+
+    def failing_plot(prompt):
+        stage = stage_of(prompt)
+        return "" if stage == "plot_architecture" else f"<{stage}>"
+
+    with pytest.raises(RuntimeError):
+        generate(filepath, ScriptedLLM(respond=failing_plot), monkeypatch)
+
+    llm = ScriptedLLM(respond=lambda prompt: f"<{stage_of(prompt)}>")
+    generate(filepath, llm, monkeypatch, topic="都市")
+    assert len(llm.prompts) == len(architecture_graph.STAGES)
+    assert "都市" in llm.prompts[0]
@@ -0,0 +1,86 @@
+# tests/test_blueprint_index.py
+# -*- coding: utf-8 -*-
+import os
+
+from novel_generator.blueprint_index import FIELD_DEFAULTS, BlueprintIndex, parse_block, split_blocks
+from novel_generator.blueprint_parallel import split_chapters
+from utils import save_string_to_txt
+
+
+def chapter_block(n, summary="林风下山。", title=None):
+    return (f"第{n}章 - [{title or f'标题{n}'}]\n本章定位：[主线推进]\n核心作用：[铺垫]\n悬念密度：[紧凑]\n"
+            f"伏笔操作：埋设(玉佩)\n认知颠覆：★★☆☆☆\n本章简述：[{summary}]\n")
+
+
+def test_parse_block_reads_fields_and_multiline_values():
+    record, problems = parse_block("**第3章 - 【雪夜】**\n本章定位：转折\n本章简述：林风夜行，\n遇见故人。\n")
+    assert problems == ["缺少字段: 核心作用、悬念密度、伏笔操作、认知颠覆"]
+    assert record["chapter_number"] == 3
+    assert record["chapter_title"] == "雪夜"
+    assert record["chapter_role"] == "转折"
+    assert record["chapter_summary"] == "林风夜行，\n遇见故人。"
+    # 缺少的字段取默认值，而不是空串
+    assert record["chapter_purpose"] == FIELD_DEFAULTS["chapter_purpose"]
+    assert record["plot_twist_level"] == "★☆☆☆☆"
+
+
+def test_line_starting_with_chapter_number_inside_summary_is_not_a_heading():
+    text = (chapter_block(1) + "\n"
+            + "第2章 - [重逢]\n本章定位：[主线]\n本章简述：林风回忆往事，\n第1章里的约定终于兑现，\n第5章的伏笔在此埋下。\n\n"
+            + chapter_block(3))
+    _, blocks = split_blocks(text)
+    assert len(blocks) == 3
+    assert set(split_chapters(text)) == {1, 2, 3}
+
+    record, _ = parse_block(blocks[1][2])
+    assert record["chapter_summary"].endswith("第5章的伏笔在此埋下。")
+
+
+def test_heading_without_fields_is_kept_when_sequential():
+    text = chapter_block(1) + "\n第2章 - [空章]\n\n" + chapter_block(3)
+    _, blocks = split_blocks(text)
+    assert len(blocks) == 3
+    record, problems = parse_block(blocks[1][2])
+    assert record["chapter_title"] == "空章"
+    assert record["chapter_role"] == "常规章节"
+    assert problems == ["缺少字段: 本章定位、核心作用、悬念密度、伏笔操作、认知颠覆、本章简述"]
+
+
+def test_index_lookup_problems_and_update(tmp_path):
+    filepath = str(tmp_path)
+    path = os.path.join(filepath, "Novel_directory.txt")
+    save_string_to_txt("\n".join([chapter_block(1), chapter_block(2), chapter_block(2, "重复"), chapter_block(4)]), path)
+    index = BlueprintIndex(filepath)
+
+    assert index.chapter_numbers() == [1, 2, 4]
+    assert index.chapter_info(2)["chapter_summary"] == "林风下山。"
+    assert index.chapter_info(9)["chapter_role"] == "常规章节"
+    problems = {p["problem"] for p in index.problems}
+    assert "章节号重复，保留第一次出现的内容" in problems
+    assert "缺少章节: [3]" in problems
+
+    # 插入缺失的第 3 章：按顺序写回，只解析新块
+    index.update_block(3, chapter_block(3, "雪原"))
+    assert index.chapter_numbers() == [1, 2, 3, 4]
+    assert index.reparsed_blocks == 1
+    assert index.chapter_info(3)["chapter_summary"] == "雪原"
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    assert text.index("第3章") < text.index("第4章")
+
+
+def test_volume_headings_assign_volumes_without_joining_blocks(tmp_path):
+    filepath = str(tmp_path)
+    path = os.path.join(filepath, "Novel_directory.txt")
+    save_string_to_txt("## 第一卷 下山\n" + chapter_block(1) + "\n第二卷：北境风雪\n\n" + chapter_block(2) + chapter_block(3), path)
+    index = BlueprintIndex(filepath)
+
+    assert [index.volume_of(n) for n in (1, 2, 3, 9)] == [1, 2, 2, None]
+    assert index.problems == []
+    # 分卷行不并入上一章的简述，替换章节块时也不会被删掉
+    assert index.chapter_info(1)["chapter_summary"] == "林风下山。"
+    index.update_block(1, chapter_block(1, "改写"))
+    assert index.volume_of(2) == 2
+    assert BlueprintIndex(filepath).volume_of(12) is None
+    _, blocks = split_blocks("第十二卷 终章\n" + chapter_block(40))
+    assert len(blocks) == 1
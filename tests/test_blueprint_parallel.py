@@ -0,0 +1,79 @@
+# tests/test_blueprint_parallel.py
+# -*- coding: utf-8 -*-
+import os
+import re
+
+import pytest
+
+from novel_generator import blueprint_parallel
+from novel_generator.blueprint_parallel import (
+    Chapter_blueprint_generate_parallel,
+    chunk_ranges,
+    compute_chunk_size,
+    split_chapters,
+    validate_chunk
+)
+from utils import read_file, save_string_to_txt
+
+from helpers import ScriptedLLM
+
+_RANGE_RE = re.compile(r'只设计第(\d+)章到第(\d+)章')
+
+
+def _blocks(numbers) -> str:
+    return "\n\n".join(f"第{n}章 - 标题{n}\n本章定位：事件\n本章简述：第{n}章简述" for n in numbers)
+
+
+def _fake_llm(monkeypatch, drop=()):
+    """骨架请求返回固定骨架；区间请求返回该区间的章节块，drop 中的章节始终缺失。"""
+    def respond(prompt: str) -> str:
+        match = _RANGE_RE.search(prompt)
+        if match is None:
+            return "第1-10章：开篇\n首章第1章：出发\n末章第10章：入门"
+        start, end = int(match.group(1)), int(match.group(2))
+        return _blocks(n for n in range(start, end + 1) if n not in drop)
+
+    llm = ScriptedLLM(respond=respond)
+    monkeypatch.setattr(blueprint_parallel, "create_llm_adapter", lambda **kwargs: llm)
+    return llm
+
+
+def _generate(filepath: str):
+    return Chapter_blueprint_generate_parallel("OpenAI", "", "", "model", filepath, 20, chunk_size=10, max_workers=2)
+
+
+def test_chunking_and_validation_helpers():
+    assert compute_chunk_size(120, 4096) == 20
+    assert chunk_ranges(25, 10) == [(1, 10), (11, 20), (21, 25)]
+    text = _blocks([1, 2, 2, 4])
+    assert sorted(split_chapters(text)) == [1, 2, 4]
+    assert validate_chunk(text, 1, 3) == ["缺少章节 [3]", "越界章节 [4]"]
+
+
+def test_parallel_blueprint_writes_directory_in_order(tmp_path, monkeypatch):
+    filepath = str(tmp_path)
+    save_string_to_txt("架构", os.path.join(filepath, "Novel_architecture.txt"))
+    llm = _fake_llm(monkeypatch)
+    stats = _generate(filepath)
+    assert stats == {"chunks": 2, "generated": 2, "repaired": 0}
+    assert sorted(split_chapters(read_file(os.path.join(filepath, "Novel_directory.txt")))) == list(range(1, 21))
+
+    calls = len(llm.prompts)
+    assert _generate(filepath)["generated"] == 0
+    assert len(llm.prompts) == calls
+
+
+def test_missing_chapters_after_repair_fail_without_writing(tmp_path, monkeypatch):
+    filepath = str(tmp_path)
+    save_string_to_txt("架构", os.path.join(filepath, "Novel_architecture.txt"))
+    _fake_llm(monkeypatch, drop={15})
+    with pytest.raises(RuntimeError, match=r"\[15\]"):
+        _generate(filepath)
+    assert not os.path.exists(os.path.join(filepath, "Novel_directory.txt"))
+
+    # 重新运行只重新生成不合格的区间，骨架与合格区间来自缓存
+    llm = _fake_llm(monkeypatch)
+    stats = _generate(filepath)
+    assert stats["generated"] == 1
+    assert len(llm.prompts) == 1 and "只设计第11章到第20章" in llm.prompts[0]
+    assert sorted(split_chapters(read_file(os.path.join(filepath, "Novel_directory.txt")))) == list(range(1, 21))
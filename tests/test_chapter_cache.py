@@ -0,0 +1,88 @@
+# tests/test_chapter_cache.py
+# -*- coding: utf-8 -*-
+import json
+import os
+
+from novel_generator.chapter_cache import INDEX_FILE, ChapterCache
+from utils import read_file_tail, save_string_to_txt
+
+
+def write_chapter(chapters_dir, n, text):
+    path = os.path.join(chapters_dir, f"chapter_{n}.txt")
+    save_string_to_txt(text, path)
+    # 保证改写后 mtime 一定变化，不依赖文件系统时间精度
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + n * 1000 + 1_000_000))
+    return path
+
+
+def test_last_n_texts_orders_chapters_and_fills_missing(tmp_path):
+    chapters_dir = str(tmp_path)
+    write_chapter(chapters_dir, 1, "第一章正文。\n")
+    write_chapter(chapters_dir, 3, "  第三章正文。  ")
+    cache = ChapterCache(chapters_dir)
+
+    assert cache.last_n_texts(4, 3) == ["第一章正文。", "", "第三章正文。"]
+    assert cache.last_n_texts(2, 3) == ["第一章正文。"]
+    assert cache.last_n_texts(1, 3) == []
+    # 先截取结尾 tail_chars 个字符，再去掉首尾空白
+    assert cache.last_n_texts(4, 3, tail_chars=4) == ["正文。", "", "文。"]
+
+
+def test_rewritten_chapter_is_reread(tmp_path):
+    chapters_dir = str(tmp_path)
+    write_chapter(chapters_dir, 1, "草稿")
+    cache = ChapterCache(chapters_dir)
+    assert cache.read(1) == "草稿"
+
+    path = write_chapter(chapters_dir, 1, "定稿扩写后的正文")
+    assert cache.read(1) == "定稿扩写后的正文"
+    assert cache.tail(1, 2) == "正文"
+
+    os.remove(path)
+    assert cache.read(1) == "" and cache.tail(1, 2) == ""
+
+
+def test_tail_reads_only_end_of_file_with_multibyte_text(tmp_path):
+    path = write_chapter(str(tmp_path), 1, "开头" + "林风" * 5000 + "。结尾是这一句")
+    assert read_file_tail(path, 7) == "。结尾是这一句"
+    assert read_file_tail(path, 0) == ""
+    assert ChapterCache(str(tmp_path)).tail(1, 4) == "是这一句"
+    short = write_chapter(str(tmp_path), 2, "短章")
+    assert read_file_tail(short, 100) == "短章"
+
+
+def test_char_counts_persist_index_and_detect_changes(tmp_path):
+    chapters_dir = str(tmp_path)
+    write_chapter(chapters_dir, 1, "一二三")
+    write_chapter(chapters_dir, 2, "四五")
+    save_string_to_txt("不是章节", os.path.join(chapters_dir, "notes.txt"))
+    assert ChapterCache(chapters_dir).char_counts() == {1: 3, 2: 2}
+    with open(os.path.join(chapters_dir, INDEX_FILE), encoding="utf-8") as f:
+        assert json.load(f)["1"]["chars"] == 3
+
+    # 新实例从索引读取字数，文件改动后重新统计
+    write_chapter(chapters_dir, 2, "四五六七")
+    cache = ChapterCache(chapters_dir)
+    assert cache.char_count(1) == 3
+    assert cache.char_count(2) == 4
+    assert cache.char_count(9) == 0
+
+
+def test_corrupt_index_is_rebuilt(tmp_path):
+    chapters_dir = str(tmp_path)
+    write_chapter(chapters_dir, 1, "一二三")
+    save_string_to_txt("{坏", os.path.join(chapters_dir, INDEX_FILE))
+    assert ChapterCache(chapters_dir).char_counts() == {1: 3}
+    with open(os.path.join(chapters_dir, INDEX_FILE), encoding="utf-8") as f:
+        assert json.load(f)["1"]["chars"] == 3
+
+
+def test_lru_keeps_at_most_max_cached_chapters(tmp_path):
+    chapters_dir = str(tmp_path)
+    for n in range(1, 5):
+        write_chapter(chapters_dir, n, f"第{n}章")
+    cache = ChapterCache(chapters_dir, max_cached=2)
+    for n in range(1, 5):
+        cache.read(n)
+    assert list(cache._texts) == [3, 4]
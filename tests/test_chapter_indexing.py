@@ -0,0 +1,74 @@
+# tests/test_chapter_indexing.py
+# -*- coding: utf-8 -*-
+from novel_generator.chapter_indexing import (
+    CHUNK_MAX_CHARS,
+    load_chapter_manifest,
+    split_chapter_for_index,
+    update_chapter_vector_store,
+)
+from novel_generator.local_vectorstore import close_local_vector_store, open_local_vector_store
+
+from helpers import HashEmbedding
+
+
+class CountingEmbedding(HashEmbedding):
+    def __init__(self):
+        super().__init__()
+        self.texts = 0
+
+    def embed_documents(self, texts):
+        self.texts += len(texts)
+        return super().embed_documents(texts)
+
+
+def chapter(n_paragraphs, edit=None):
+    paragraphs = [f"第{i}段，林风沿着山路前行，远处传来钟声，雾气在松林间缓缓流动，他想起了师父临别时的叮嘱。" * 2
+                  for i in range(n_paragraphs)]
+    if edit is not None:
+        paragraphs[edit] = "这一段被彻底改写了：林风在半山腰遇到了一位拄杖的老者，老者问他要去哪里。" * 2
+    return "\n".join(paragraphs)
+
+
+def test_chunks_respect_bounds_and_keep_paragraphs_whole():
+    text = chapter(60)
+    chunks = split_chapter_for_index(text)
+    assert len(chunks) > 3
+    assert all(len(c) <= CHUNK_MAX_CHARS for c in chunks)
+    assert "\n".join(chunks) == text
+
+
+def test_local_edit_only_changes_nearby_chunks():
+    before = split_chapter_for_index(chapter(60))
+    after = split_chapter_for_index(chapter(60, edit=30))
+    changed = set(after) - set(before)
+    assert 1 <= len(changed) <= 2
+    # 修改点之前与之后的切块都能重新对齐
+    assert before[0] == after[0]
+    assert before[-1] == after[-1]
+
+
+def test_refinalize_embeds_only_changed_chunks(tmp_path):
+    filepath = str(tmp_path)
+    close_local_vector_store()
+    embedding = CountingEmbedding()
+    first = update_chapter_vector_store(embedding, chapter(60), filepath, 3, volume=1, character_names=["林风", "老者"])
+    total = first["added"]
+    assert first["deleted"] == 0 and embedding.texts == total
+
+    second = update_chapter_vector_store(embedding, chapter(60, edit=30), filepath, 3, volume=1,
+                                         character_names=["林风", "老者"])
+    assert 1 <= second["added"] <= 2
+    assert second["deleted"] == second["added"]
+    assert embedding.texts == total + second["added"]
+
+    store = open_local_vector_store(filepath)
+    assert len(store.filter_ids({"chapter": 3})) == len(load_chapter_manifest(filepath, 3)["chunks"])
+    assert len(store.filter_ids({"characters": "老者"})) == second["added"]
+
+    # 只改元数据（卷号）时复用已存向量，不重新 embedding
+    third = update_chapter_vector_store(embedding, chapter(60, edit=30), filepath, 3, volume=2,
+                                        character_names=["林风", "老者"])
+    assert third["added"] == 0 and third["retagged"] == len(load_chapter_manifest(filepath, 3)["chunks"])
+    assert embedding.texts == total + second["added"]
+    assert store.filter_ids({"volume": 1}) == []
+    close_local_vector_store()
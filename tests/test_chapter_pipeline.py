@@ -0,0 +1,158 @@
+# tests/test_chapter_pipeline.py
+# -*- coding: utf-8 -*-
+import os
+import threading
+
+import pytest
+
+from novel_generator import chapter_pipeline, runner
+from novel_generator.chapter_pipeline import fingerprint_files, prep_input_files, run_chapters_pipelined
+from novel_generator.task_graph import STATUS_DONE, STATUS_FAILED, STATUS_SKIPPED
+from utils import read_file, save_string_to_txt
+
+from helpers import HashEmbedding, ScriptedLLM
+
+SUMMARIES = {1: "林风在青云宗拜师学艺，师父传他青云剑法，三年后他下山寻找失散的妹妹。"}
+OVERLAPPING = "林风在青云宗拜师学艺，师父传他青云剑法，三年后下山寻找妹妹。"
+FRESH = "北境雪原上有一座废弃的观星台，台下埋着上古阵法的残图，青云剑可以开启它。"
+
+
+@pytest.fixture
+def pipeline(tmp_path, monkeypatch):
+    """把 LLM 相关的步骤替换为记录调用顺序的本地实现，只测试流水线的调度。"""
+    filepath = str(tmp_path)
+    os.makedirs(os.path.join(filepath, "chapters"))
+    state = {"log": [], "lock": threading.Lock(), "prep_calls": {}, "on_finalize": None, "fail_draft": set(),
+             "retrieved": [], "llm": ScriptedLLM(respond=lambda prompt: "过滤后的知识")}
+
+    def log(entry):
+        with state["lock"]:
+            state["log"].append(entry)
+
+    def prepare(settings, n, llm_adapter, embedding_adapter):
+        log(("prep", n))
+        state["prep_calls"][n] = state["prep_calls"].get(n, 0) + 1
+        return {"fingerprints": fingerprint_files(prep_input_files(filepath, n)), "previous": read_file(
+            chapter_pipeline.chapter_file(filepath, n - 1)), "retrieved_texts": state["retrieved"],
+            "short_summary": "", "chapter_info": {"chapter_title": "", "chapter_summary": ""}}
+
+    def draft(settings, n, custom_prompt_text=None, emit=None):
+        log(("draft", n))
+        if n in state["fail_draft"]:
+            raise RuntimeError("草稿生成失败")
+        save_string_to_txt(f"第{n}章草稿。{custom_prompt_text or ''}", chapter_pipeline.chapter_file(filepath, n))
+
+    def finalize(settings, n, emit):
+        if state["on_finalize"] is not None:
+            state["on_finalize"](n)
+        log(("finalize", n))
+        path = chapter_pipeline.chapter_file(filepath, n)
+        save_string_to_txt(read_file(path) + "（定稿扩写）", path)
+        summary_path = os.path.join(filepath, "global_summary.txt")
+        save_string_to_txt(read_file(summary_path) + f"第{n}章：{SUMMARIES.get(n, '')}\n", summary_path)
+
+    monkeypatch.setattr(chapter_pipeline, "create_adapters", lambda settings: (state["llm"], HashEmbedding()))
+    monkeypatch.setattr(chapter_pipeline, "prepare_chapter_context", prepare)
+    monkeypatch.setattr(chapter_pipeline, "build_draft_prompt",
+                        lambda settings, n, context: f"[上一章:{context['previous'][-6:]}]{context['filtered_context']}")
+    monkeypatch.setattr(runner, "run_draft", draft)
+    monkeypatch.setattr(runner, "run_finalize", finalize)
+    state["settings"] = {"params": dict(runner.DEFAULT_NOVEL_PARAMS, filepath=filepath)}
+    return state
+
+
+def test_prep_of_next_chapter_overlaps_finalize(pipeline, monkeypatch):
+    barrier = threading.Barrier(2, timeout=5)
+    original = chapter_pipeline.prepare_chapter_context
+
+    def on_finalize(n):
+        if n == 1:
+            barrier.wait()  # 第 1 章定稿与第 2 章准备必须同时在执行
+
+    def prepare(settings, n, *args):
+        if n == 2 and pipeline["prep_calls"].get(2) is None:
+            barrier.wait()
+        return original(settings, n, *args)
+
+    pipeline["on_finalize"] = on_finalize
+    monkeypatch.setattr(chapter_pipeline, "prepare_chapter_context", prepare)
+    results = run_chapters_pipelined(pipeline["settings"], 1, 3)
+    assert all(r["status"] == STATUS_DONE for r in results.values())
+    log = pipeline["log"]
+    # 草稿总在上一章定稿之后
+    for n in (2, 3):
+        assert log.index(("finalize", n - 1)) < log.index(("draft", n))
+
+
+def test_prep_is_redone_when_finalize_rewrites_previous_chapter(pipeline, monkeypatch):
+    prepared = threading.Event()
+    original = chapter_pipeline.prepare_chapter_context
+
+    def prepare(settings, n, *args):
+        context = original(settings, n, *args)
+        prepared.set()
+        return context
+
+    # 第 1 章定稿等第 2 章准备完成后才改写正文
+    pipeline["on_finalize"] = lambda n: prepared.wait(5)
+    monkeypatch.setattr(chapter_pipeline, "prepare_chapter_context", prepare)
+    events = []
+    run_chapters_pipelined(pipeline["settings"], 1, 2, emit=events.append)
+    # 第 1 章定稿扩写了正文，第 2 章的准备结果已过期，草稿前重新准备并使用新的正文
+    assert pipeline["prep_calls"][2] == 2
+    assert any(e["event"] == "step_rerun" and e["chapter"] == 2 for e in events)
+    assert "定稿扩写）]" in read_file(chapter_pipeline.chapter_file(pipeline["settings"]["params"]["filepath"], 2))
+
+
+def test_failed_draft_skips_later_chapters(pipeline):
+    pipeline["fail_draft"].add(2)
+    results = run_chapters_pipelined(pipeline["settings"], 1, 3)
+    assert results["finalize_1"]["status"] == STATUS_DONE
+    assert results["draft_2"]["status"] == STATUS_FAILED
+    assert {results[name]["status"] for name in ("finalize_2", "prep_3", "draft_3", "finalize_3")} == {STATUS_SKIPPED}
+
+
+def test_journal_skips_completed_chapters_on_rerun(pipeline):
+    journal = runner.StepJournal(pipeline["settings"]["params"]["filepath"])
+    run_chapters_pipelined(pipeline["settings"], 1, 2, journal=journal)
+    pipeline["log"].clear()
+
+    events = []
+    results = run_chapters_pipelined(pipeline["settings"], 1, 2, journal=journal, emit=events.append)
+    assert all(r["status"] == STATUS_DONE for r in results.values())
+    assert pipeline["log"] == []
+    assert sum(e["event"] == "step_skipped" for e in events) == 4
+
+
+def test_pipelined_nodes_emit_step_events(pipeline):
+    pipeline["fail_draft"].add(2)
+    events = []
+    run_chapters_pipelined(pipeline["settings"], 1, 2, emit=events.append)
+    steps = [(e["event"], e["step"], e["chapter"]) for e in events
+             if e["event"] in ("step_start", "step_done", "step_failed")]
+    assert steps == [("step_start", "draft", 1), ("step_done", "draft", 1),
+                     ("step_start", "finalize", 1), ("step_done", "finalize", 1),
+                     ("step_start", "draft", 2), ("step_failed", "draft", 2)]
+    failed = next(e for e in events if e["event"] == "step_failed")
+    assert failed["error"] == "草稿生成失败"
+
+
+def test_summary_overlap_is_filtered_after_previous_finalize(pipeline, monkeypatch):
+    prepared = threading.Event()
+    original = chapter_pipeline.prepare_chapter_context
+
+    def prepare(settings, n, *args):
+        context = original(settings, n, *args)
+        prepared.set()
+        return context
+
+    # 第 2 章准备时第 1 章摘要尚未写入；预过滤必须使用定稿后的前文摘要
+    pipeline["on_finalize"] = lambda n: prepared.wait(5)
+    pipeline["retrieved"] = [OVERLAPPING, FRESH]
+    monkeypatch.setattr(chapter_pipeline, "prepare_chapter_context", prepare)
+    run_chapters_pipelined(pipeline["settings"], 1, 2)
+
+    filter_prompts = [p for p in pipeline["llm"].prompts if FRESH in p]
+    assert len(filter_prompts) == 1
+    assert OVERLAPPING not in filter_prompts[0]
+    assert read_file(chapter_pipeline.chapter_file(pipeline["settings"]["params"]["filepath"], 2)).endswith("过滤后的知识（定稿扩写）")
@@ -0,0 +1,111 @@
+# tests/test_character_store.py
+# -*- coding: utf-8 -*-
+import json
+import os
+
+from novel_generator.character_store import (
+    apply_character_deltas,
+    load_character_store,
+    mentioned_names,
+    parse_character_state,
+    parse_delta_response,
+    present_characters,
+    render_character_state,
+    select_character_state,
+    select_relevant_characters,
+    split_names,
+    update_character_state_delta,
+)
+from utils import save_string_to_txt
+
+from helpers import ScriptedLLM
+
+STATE_TEXT = """张三：
+├──物品:
+│  ├──青衫: 师父所赠
+│  └──铁剑
+├──状态:
+│  └──身体状态: 左臂受伤
+├──主要角色间关系网:
+│  └──李四: 师兄
+
+张三丰：
+├──能力:
+│  └──太极: 宗师
+
+李四：
+├──状态:
+│  └──心理状态: 焦虑
+
+新出场角色：
+- 王五：客栈掌柜"""
+
+
+def test_parse_and_render_round_trip():
+    store = parse_character_state(STATE_TEXT)
+    assert list(store["characters"]) == ["张三", "张三丰", "李四"]
+    assert store["characters"]["张三"]["物品"] == {"青衫": "师父所赠", "铁剑": ""}
+    assert store["minor_characters"] == {"王五": "客栈掌柜"}
+    rendered = render_character_state(store)
+    assert rendered == STATE_TEXT
+    assert parse_character_state(rendered) == store
+
+
+def test_apply_deltas_merges_and_removes_entries():
+    store = parse_character_state(STATE_TEXT)
+    changes = apply_character_deltas(store, {
+        "characters": {
+            "张三": {"状态": {"身体状态": "痊愈"}, "物品": {"铁剑": None}},
+            "王五": {"状态": {"心理状态": "惊慌"}},
+        },
+        "new_characters": {"赵六": "捕快"},
+        "removed_characters": ["赵六", "不存在"],
+    }, chapter_number=7)
+    assert changes == {"updated": ["张三"], "added": ["王五"], "removed": ["赵六"]}
+    assert store["characters"]["张三"]["状态"] == {"身体状态": "痊愈"}
+    assert store["characters"]["张三"]["物品"] == {"青衫": "师父所赠"}
+    # 次要角色升级为主要角色后从次要列表移除
+    assert "王五" not in store["minor_characters"]
+    assert store["last_seen"] == {"张三": 7, "王五": 7}
+
+
+def test_parse_delta_response_accepts_code_block():
+    assert parse_delta_response('说明\n```json\n{"characters": {}}\n```') == {"characters": {}}
+
+
+def test_names_match_whole_names_only():
+    assert split_names("张三（主角）、李四, Al  王五") == ["张三", "李四", "Al", "王五"]
+    assert mentioned_names(["张三", "张三丰", "Al"], ["张三丰缓缓起身，Alice 递上茶。"]) == {"张三丰"}
+    assert mentioned_names(["张三", "张三丰", "Al"], ["张三看见了张三丰，Al 点头。"]) == {"张三", "张三丰", "Al"}
+
+    store = parse_character_state(STATE_TEXT)
+    assert present_characters(store, "张三丰在山顶打拳。") == ["张三丰"]
+    assert present_characters(store, "张三与李四并肩而行。") == ["张三", "李四"]
+
+
+def test_select_relevant_characters_uses_involved_list_and_relations():
+    store = parse_character_state(STATE_TEXT)
+    # 点名张三丰时不应选中张三；张三的一度关联角色李四随张三一起选中
+    assert select_relevant_characters(store, "张三丰") == ["张三丰"]
+    assert select_relevant_characters(store, "张三") == ["张三", "李四"]
+    assert select_relevant_characters(store, "张三和王五") == ["张三", "李四"]
+
+    text = select_character_state(store, "张三丰", ["掌柜王五迎了出来。"])
+    assert "张三丰：" in text and "张三：" not in text
+    assert "王五：客栈掌柜" in text
+
+
+def test_update_character_state_delta_sends_only_present_characters(tmp_path):
+    filepath = str(tmp_path)
+    save_string_to_txt(STATE_TEXT, os.path.join(filepath, "character_state.txt"))
+    llm = ScriptedLLM([json.dumps({"characters": {"张三丰": {"状态": {"心理状态": "平静"}}}}, ensure_ascii=False)])
+
+    result = update_character_state_delta(llm, filepath, 3, "张三丰独自在山顶打坐。")
+    assert result["present"] == ["张三丰"]
+    assert "太极: 宗师" in llm.prompts[0]
+    assert "青衫" not in llm.prompts[0]
+
+    store = load_character_store(filepath)
+    assert store["characters"]["张三丰"]["状态"] == {"心理状态": "平静"}
+    assert store["last_seen"] == {"张三丰": 3}
+    assert parse_character_state(result["text"])["characters"] == store["characters"]
@@ -0,0 +1,86 @@
+# tests/test_cli.py
+# -*- coding: utf-8 -*-
+import argparse
+import json
+import os
+
+import pytest
+
+import cli
+from novel_generator import runner
+from utils import save_string_to_txt
+
+
+def test_parse_steps_expands_aliases_and_deduplicates():
+    assert cli.parse_steps("all") == ["architecture", "blueprint", "draft", "finalize"]
+    assert cli.parse_steps("chapters, consistency,draft,") == ["draft", "finalize", "consistency"]
+    with pytest.raises(argparse.ArgumentTypeError):
+        cli.parse_steps("draft,publish")
+
+
+def test_resolve_run_settings_selects_formats_and_applies_overrides():
+    config = {
+        "last_interface_format": "DeepSeek",
+        "llm_configs": {"DeepSeek": {"model_name": "deepseek-chat", "api_key": "k"}},
+        "other_params": {"topic": "修仙", "num_chapters": 30},
+        "draft_quality": {"min_score": 70},
+    }
+    settings = runner.resolve_run_settings(config, {"topic": None, "num_chapters": 5, "filepath": "/tmp/book"})
+    assert settings["interface_format"] == "DeepSeek"
+    assert settings["llm"]["model_name"] == "deepseek-chat"
+    assert settings["llm"]["max_tokens"] == runner.DEFAULT_LLM_CONFIG["max_tokens"]
+    assert settings["embedding_interface_format"] == "OpenAI"
+    assert settings["params"]["topic"] == "修仙"
+    assert settings["params"]["num_chapters"] == 5
+    assert settings["params"]["filepath"] == "/tmp/book"
+    assert settings["quality"] == {"min_score": 70}
+
+
+def test_main_passes_arguments_and_reports_exit_code(tmp_path, monkeypatch, capsys):
+    config_file = str(tmp_path / "config.json")
+    with open(config_file, "w", encoding="utf-8") as f:
+        json.dump({"other_params": {"num_chapters": 8}}, f)
+    calls = []
+
+    def fake_run_pipeline(settings, steps, **kwargs):
+        calls.append((settings, steps, kwargs))
+        return {"completed": [], "failed": [("draft", 3)] if kwargs["chapter_start"] == 3 else []}
+
+    monkeypatch.setattr(cli, "run_pipeline", fake_run_pipeline)
+    argv = ["--config", config_file, "--project", str(tmp_path / "book"), "--steps", "chapters",
+            "--from", "2", "--keep-going", "--no-quality-gate"]
+    assert cli.main(argv) == 0
+    settings, steps, kwargs = calls[0]
+    assert steps == ["draft", "finalize"]
+    assert kwargs["chapter_start"] == 2 and kwargs["chapter_end"] is None
+    assert kwargs["stop_on_error"] is False and kwargs["resume"] is True
+    assert settings["quality"]["enabled"] is False
+    first_event = json.loads(capsys.readouterr().out.splitlines()[0])
+    assert first_event["event"] == "run_start" and first_event["to"] == 8
+
+    assert cli.main(argv[:6] + ["--from", "3"]) == 1
+
+
+def test_run_pipeline_skips_steps_already_in_journal(tmp_path, monkeypatch):
+    filepath = str(tmp_path)
+    runs = []
+
+    def fake_architecture(settings, emit):
+        runs.append("architecture")
+        save_string_to_txt("架构", os.path.join(filepath, runner.ARCHITECTURE_FILE))
+
+    monkeypatch.setattr(runner, "run_architecture", fake_architecture)
+    settings = runner.resolve_run_settings({}, {"filepath": filepath, "topic": "修仙"})
+    events = []
+    assert runner.run_pipeline(settings, ["architecture"], emit=events.append)["completed"] == [("architecture", None)]
+    assert runner.run_pipeline(settings, ["architecture"], emit=events.append)["failed"] == []
+    assert runs == ["architecture"]
+    assert {"event": "step_skipped", "step": "architecture", "reason": "journal"} in events
+
+    # 参数改变后输入摘要不同，重新执行
+    settings["params"]["topic"] = "都市"
+    runner.run_pipeline(settings, ["architecture"])
+    assert runs == ["architecture", "architecture"]
+
+    with pytest.raises(ValueError):
+        runner.run_pipeline(runner.resolve_run_settings({}), ["architecture"])
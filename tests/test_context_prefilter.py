@@ -0,0 +1,63 @@
+# tests/test_context_prefilter.py
+# -*- coding: utf-8 -*-
+import os
+
+from novel_generator.chapter_pipeline import filter_chapter_context, prepare_chapter_context
+from novel_generator.context_prefilter import prefilter_retrieved_texts
+from novel_generator.local_vectorstore import open_local_vector_store
+from novel_generator.metadata_index import SOURCE_KNOWLEDGE
+from utils import save_string_to_txt
+
+from helpers import HashEmbedding, ScriptedLLM
+
+SUMMARY = "林风在青云宗拜师学艺，师父传他青云剑法，三年后他下山寻找失散的妹妹。"
+OVERLAPPING = "林风在青云宗拜师学艺，师父传他青云剑法，三年后下山寻找妹妹。"
+FRESH = "北境雪原上有一座废弃的观星台，台下埋着上古阵法的残图，青云剑可以开启它。"
+
+
+def test_prefilter_drops_summary_overlap_and_near_duplicates():
+    result = prefilter_retrieved_texts([FRESH, FRESH + "。", OVERLAPPING, ""], SUMMARY)
+    assert result["texts"] == [FRESH]
+    assert result["stats"]["near_duplicate"] == 1
+    assert result["stats"]["summary_overlap"] == 1
+
+    # 不传摘要时重合片段保留
+    assert OVERLAPPING in prefilter_retrieved_texts([FRESH, OVERLAPPING])["texts"]
+
+
+def test_prefilter_respects_token_budget():
+    result = prefilter_retrieved_texts([FRESH, "南海之滨渔村里流传着关于鲛人的歌谣。"], token_budget=1)
+    assert result["texts"] == []
+    assert result["stats"]["over_budget"] == 2
+
+
+def test_prepare_chapter_context_prefilters_with_summary(tmp_path):
+    filepath = str(tmp_path)
+    save_string_to_txt(SUMMARY, os.path.join(filepath, "global_summary.txt"))
+    save_string_to_txt("第1章 - 拜师\n本章简述：拜入青云宗\n\n第2章 - 下山\n本章简述：下山\n\n第3章 - 雪原\n本章简述：北上",
+                       os.path.join(filepath, "Novel_directory.txt"))
+    store = open_local_vector_store(filepath, HashEmbedding())
+    store.add_texts([OVERLAPPING, FRESH], metadatas=[{"source": SOURCE_KNOWLEDGE}, {"source": SOURCE_KNOWLEDGE}])
+
+    def respond(prompt: str) -> str:
+        if FRESH in prompt or OVERLAPPING in prompt:
+            return "过滤后的知识"
+        return "林风·青云剑\n观星台·阵法"
+
+    llm = ScriptedLLM(respond=respond)
+    settings = {
+        "params": {"filepath": filepath, "characters_involved": "林风", "key_items": "青云剑", "scene_location": "雪原",
+                   "time_constraint": "", "user_guidance": ""},
+        "embedding": {"retrieval_k": 4}
+    }
+    context = prepare_chapter_context(settings, 3, llm, HashEmbedding())
+    # 准备阶段只检索，不读取前文摘要，也不调用知识过滤
+    assert set(context["retrieved_texts"]) == {OVERLAPPING, FRESH}
+    assert not any(FRESH in p for p in llm.prompts)
+
+    filtered = filter_chapter_context(settings, 3, context, llm)
+    filter_prompts = [p for p in llm.prompts if FRESH in p or OVERLAPPING in p]
+    assert len(filter_prompts) == 1
+    assert FRESH in filter_prompts[0]
+    assert OVERLAPPING not in filter_prompts[0]
+    assert filtered == "过滤后的知识"
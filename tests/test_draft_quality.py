@@ -0,0 +1,106 @@
+# tests/test_draft_quality.py
+# -*- coding: utf-8 -*-
+from novel_generator.draft_quality import (
+    ACTION_ACCEPT,
+    ACTION_CLEAN,
+    ACTION_CONTINUE,
+    ACTION_REGENERATE,
+    count_words,
+    ensure_draft_quality,
+    markdown_lines,
+    strip_markdown,
+    validate_draft,
+)
+
+from helpers import ScriptedLLM
+
+
+def prose(n_chars, seed=0):
+    """不含重复片段的伪正文：每 20 字一个句号。"""
+    chars = []
+    for i in range(n_chars):
+        chars.append(chr(0x4E00 + ((i + seed) * 7919) % 20000))
+        if i % 20 == 19:
+            chars.append("。")
+    text = "".join(chars)
+    return text if text.endswith("。") else text + "。"
+
+
+def codes(report):
+    return [item["code"] for item in report["issues"]]
+
+
+def test_clean_draft_is_accepted():
+    report = validate_draft("第1章 下山\n" + prose(1000), 1000)
+    assert report["ok"] and report["action"] == ACTION_ACCEPT
+    assert report["score"] == 100 and report["issues"] == []
+
+
+def test_each_problem_maps_to_its_fix():
+    assert validate_draft("  \n", 1000)["action"] == ACTION_REGENERATE
+
+    short = validate_draft(prose(300), 1000)
+    assert codes(short) == ["too_short"] and short["action"] == ACTION_CONTINUE
+
+    truncated = validate_draft(prose(1000) + "林风转身看向", 1000)
+    assert codes(truncated) == ["truncated"] and truncated["action"] == ACTION_CONTINUE
+
+    markdown = validate_draft("## 第一节 下山\n" + prose(1000), 1000)
+    assert codes(markdown) == ["markdown"] and markdown["action"] == ACTION_CLEAN
+
+    repeated = validate_draft(prose(400) * 3, 1000)
+    assert "repetition" in codes(repeated) and repeated["action"] == ACTION_REGENERATE
+
+
+def test_strip_markdown_keeps_prose_and_chapter_title():
+    text = ("第3章 雪夜\n## 场景一\n**林风**走进客栈。\n- 掌柜抬头看他。\n> 外面下着雪。\n---\n"
+            "第二节 夜谈\n他们聊到深夜。")
+    cleaned = strip_markdown(text)
+    assert cleaned == "第3章 雪夜\n林风走进客栈。\n掌柜抬头看他。\n外面下着雪。\n他们聊到深夜。"
+    assert markdown_lines(cleaned) == []
+    assert count_words(cleaned) == count_words(cleaned.replace("\n", " "))
+
+
+def test_ensure_continues_truncated_draft():
+    llm = ScriptedLLM(responses=["道：“走吧。”" + prose(200, seed=5000)])
+    draft = prose(900) + "林风低声"
+    text, report = ensure_draft_quality(draft, 1000, 2, invoke=llm.invoke, chapter_title="下山")
+
+    assert report["ok"]
+    assert text.startswith(draft + "道：“走吧。”")  # 半句话直接接上
+    assert [step["action"] for step in report["history"]] == [ACTION_CONTINUE]
+    assert "林风低声" in llm.prompts[0] and "《下山》" in llm.prompts[0]
+
+
+def test_ensure_cleans_locally_before_continuing():
+    llm = ScriptedLLM(responses=["走进客栈。"])
+    text, report = ensure_draft_quality("## 第一节 下山\n" + prose(900) + "林风低声", 1000, 3, invoke=llm.invoke)
+    assert report["ok"] and not text.startswith("##")
+    # 本地清理不计入尝试次数，也不调用 LLM
+    assert [step["action"] for step in report["history"]] == [ACTION_CLEAN, ACTION_CONTINUE]
+    assert len(llm.prompts) == 1
+
+
+def test_ensure_regenerates_repetition_ahead_of_cleaning():
+    regenerated = []
+
+    def regenerate():
+        regenerated.append(1)
+        return prose(1000, seed=9000)
+
+    events = []
+    text, report = ensure_draft_quality("## 标题\n" + prose(400) * 3, 1000, 4, regenerate=regenerate,
+                                        emit=events.append)
+    assert report["ok"] and len(regenerated) == 1
+    assert [step["action"] for step in report["history"]] == [ACTION_REGENERATE]
+    assert [e["action"] for e in events] == [ACTION_REGENERATE]
+
+
+def test_ensure_stops_after_max_attempts():
+    text, report = ensure_draft_quality("", 1000, 1, regenerate=lambda: "", config={"max_attempts": 2})
+    assert not report["ok"] and report["action"] == ACTION_REGENERATE
+    assert len(report["history"]) == 2
+
+    # 没有可用的处理方式时直接返回原文与报告
+    text, report = ensure_draft_quality(prose(300), 1000, 1)
+    assert report["action"] == ACTION_CONTINUE and report["history"] == []
@@ -0,0 +1,126 @@
+# tests/test_job_queue.py
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+from novel_generator.job_queue import STATUS_DONE, STATUS_QUEUED, STATUS_RUNNING, JobQueue, JobWorkerPool
+from utils import provider_call_slot, set_provider_call_limits
+
+
+def _queue(tmp_path):
+    return JobQueue(str(tmp_path / "jobs.db"))
+
+
+def test_claim_runs_one_job_per_project_in_order(tmp_path):
+    queue = _queue(tmp_path)
+    a1 = queue.enqueue(str(tmp_path / "a"), ["draft"], config="missing.json", chapter_end=2)
+    a2 = queue.enqueue(str(tmp_path / "a"), ["draft"], config="missing.json", chapter_end=2)
+    b1 = queue.enqueue(str(tmp_path / "b"), ["draft"], config="missing.json", chapter_end=2)
+    assert a1["progress"] == {"done": 0, "total": 2}
+
+    assert queue.claim()["id"] == a1["id"]
+    # a 项目有执行中的任务，跳过 a2 取 b1
+    assert queue.claim()["id"] == b1["id"]
+    assert queue.claim() is None
+
+    queue.finish(a1["id"], STATUS_DONE, result={"failed": []})
+    assert queue.claim()["id"] == a2["id"]
+    assert queue.counts() == {STATUS_DONE: 1, STATUS_RUNNING: 2}
+    queue.close()
+
+
+def test_cancel_and_requeue(tmp_path):
+    queue = _queue(tmp_path)
+    job = queue.enqueue(str(tmp_path / "a"), ["draft"], config="missing.json", chapter_end=1)
+    other = queue.enqueue(str(tmp_path / "b"), ["draft"], config="missing.json", chapter_end=1)
+    assert queue.cancel(job["id"])
+    assert queue.claim()["id"] == other["id"]
+    assert not queue.cancel(other["id"])
+    assert queue.requeue_running() == 1
+    assert queue.get(other["id"])["status"] == STATUS_QUEUED
+    queue.close()
+
+
+def test_progress_events_count_finished_steps(tmp_path):
+    queue = _queue(tmp_path)
+    job = queue.enqueue(str(tmp_path / "a"), ["draft", "finalize"], config="missing.json", chapter_end=2)
+    queue.add_event(job["id"], {"event": "step_done", "step": "draft", "chapter": 1})
+    queue.add_event(job["id"], {"event": "step_done", "step": "prep", "chapter": 2})
+    queue.add_event(job["id"], {"event": "step_start", "step": "draft", "chapter": 2})
+    assert queue.get(job["id"])["progress"] == {"done": 1, "total": 4}
+    events = queue.events(job["id"])
+    assert [e["event"] for e in events] == ["step_done", "step_done", "step_start"]
+    assert queue.events(job["id"], since=events[1]["id"])[0]["step"] == "draft"
+    queue.close()
+
+
+def test_provider_call_slot_limits_concurrent_calls():
+    set_provider_call_limits({"OpenAI": 2})
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    def call(provider):
+        with provider_call_slot(provider):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.02)
+            with lock:
+                active[0] -= 1
+
+    try:
+        threads = [threading.Thread(target=call, args=("openai",)) for _ in range(6)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert peak[0] == 2
+
+        # 未列出且没有默认上限的接口不限制
+        peak[0] = 0
+        threads = [threading.Thread(target=call, args=("DeepSeek",)) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert peak[0] > 2
+    finally:
+        set_provider_call_limits({})
+
+
+def test_worker_pool_applies_call_limits_across_jobs(tmp_path):
+    queue = _queue(tmp_path)
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    def job_runner(job, emit):
+        # 每个任务内部并行发起 3 次调用
+        def call():
+            with provider_call_slot(job["provider"]):
+                with lock:
+                    active[0] += 1
+                    peak[0] = max(peak[0], active[0])
+                time.sleep(0.02)
+                with lock:
+                    active[0] -= 1
+
+        threads = [threading.Thread(target=call) for _ in range(3)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return {"failed": []}
+
+    jobs = [queue.enqueue(str(tmp_path / f"p{i}"), ["draft"], config="missing.json", chapter_end=1) for i in range(3)]
+    pool = JobWorkerPool(queue, max_workers=3, provider_limits={"OpenAI": 2}, poll_interval=0.01, job_runner=job_runner)
+    try:
+        pool.start()
+        deadline = time.time() + 5
+        while time.time() < deadline and any(queue.get(j["id"])["status"] != STATUS_DONE for j in jobs):
+            time.sleep(0.01)
+        assert [queue.get(j["id"])["status"] for j in jobs] == [STATUS_DONE] * 3
+    finally:
+        pool.stop(wait=True)
+        set_provider_call_limits({})
+        queue.close()
+    assert peak[0] == 2
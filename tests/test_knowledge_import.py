@@ -0,0 +1,111 @@
+# tests/test_knowledge_import.py
+# -*- coding: utf-8 -*-
+import os
+
+from novel_generator.knowledge_parallel import import_knowledge_directory
+from novel_generator.knowledge_stream import iter_file_chunks, stream_import_knowledge_file
+from novel_generator.local_vectorstore import open_local_vector_store
+from novel_generator.vectorstore_scope import clear_vector_store_scope, list_knowledge_files
+
+from helpers import HashEmbedding
+
+
+def _write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+    return str(path)
+
+
+def _paragraphs(prefix, n):
+    return "".join(f"{prefix}第{i}段：青云宗的弟子在山门前练剑，剑光映着晨雾。\n" for i in range(n))
+
+
+def test_iter_file_chunks_offsets_land_on_paragraph_boundaries(tmp_path):
+    path = _write(tmp_path / "a.txt", _paragraphs("甲", 40))
+    data = open(path, "rb").read()
+    offsets = [offset for _, offset in iter_file_chunks(path, block_bytes=256, split_func=lambda t: [t])]
+    assert offsets[-1] == len(data)
+    assert all(data[offset - 1:offset] == b"\n" for offset in offsets)
+
+    # 从中间的偏移续读，得到的内容与剩余部分一致
+    resumed = "".join("".join(chunks) for chunks, _ in iter_file_chunks(path, offsets[2], block_bytes=256,
+                                                                         split_func=lambda t: [t]))
+    assert resumed == data[offsets[2]:].decode("utf-8")
+
+
+def test_stream_import_is_idempotent(tmp_path):
+    filepath = str(tmp_path / "novel")
+    path = _write(tmp_path / "docs" / "lore.txt", _paragraphs("甲", 30))
+    embedding = HashEmbedding()
+    first = stream_import_knowledge_file(embedding, path, filepath, block_bytes=512)
+    assert not first["skipped"] and first["chunks"] > 0
+    second = stream_import_knowledge_file(embedding, path, filepath, block_bytes=512)
+    assert second["skipped"]
+    store = open_local_vector_store(filepath)
+    assert len(store.filter_ids({"source": "knowledge"})) == first["chunks"]
+
+
+def test_clear_single_file_keeps_same_named_file_from_other_directory(tmp_path):
+    filepath = str(tmp_path / "novel")
+    path_a = _write(tmp_path / "a" / "lore.txt", _paragraphs("甲", 20))
+    path_b = _write(tmp_path / "b" / "lore.txt", _paragraphs("乙", 20))
+    embedding = HashEmbedding()
+    count_a = stream_import_knowledge_file(embedding, path_a, filepath)["chunks"]
+    count_b = stream_import_knowledge_file(embedding, path_b, filepath)["chunks"]
+
+    files = list_knowledge_files(filepath)
+    assert files == {os.path.abspath(path_a): count_a, os.path.abspath(path_b): count_b}
+
+    stats = clear_vector_store_scope(filepath, file_path=path_a)
+    assert stats["deleted"] == count_a
+    assert stats["checkpoints"] == 1
+    assert list_knowledge_files(filepath) == {os.path.abspath(path_b): count_b}
+
+    # 被清理的文件重新导入时完整重建，另一个文件仍然跳过
+    assert not stream_import_knowledge_file(embedding, path_a, filepath)["skipped"]
+    assert stream_import_knowledge_file(embedding, path_b, filepath)["skipped"]
+
+
+def test_clear_relative_path_resolves_against_cwd(tmp_path, monkeypatch):
+    filepath = str(tmp_path / "novel")
+    path_a = _write(tmp_path / "a" / "lore.txt", _paragraphs("甲", 10))
+    path_b = _write(tmp_path / "b" / "lore.txt", _paragraphs("乙", 10))
+    embedding = HashEmbedding()
+    stream_import_knowledge_file(embedding, path_a, filepath)
+    count_b = stream_import_knowledge_file(embedding, path_b, filepath)["chunks"]
+
+    # 当前目录下的相对文件名只指向该目录中的文件
+    monkeypatch.chdir(tmp_path / "a")
+    stats = clear_vector_store_scope(filepath, file_path="lore.txt")
+    assert stats["checkpoints"] == 1
+    assert list_knowledge_files(filepath) == {os.path.abspath(path_b): count_b}
+
+
+class FlakyEmbedding(HashEmbedding):
+    """含有 marker 的批次 embedding 失败。"""
+
+    def __init__(self, marker):
+        super().__init__()
+        self.marker = marker
+
+    def embed_documents(self, texts):
+        if self.marker and any(self.marker in t for t in texts):
+            raise RuntimeError("embedding 接口超时")
+        return super().embed_documents(texts)
+
+
+def test_parallel_import_reports_failed_file_and_continues(tmp_path):
+    filepath = str(tmp_path / "novel")
+    good = _write(tmp_path / "docs" / "good.txt", _paragraphs("甲", 10))
+    bad = _write(tmp_path / "docs" / "bad.txt", _paragraphs("坏", 10))
+
+    stats = import_knowledge_directory(FlakyEmbedding("坏"), str(tmp_path / "docs"), filepath, workers=1, batch_size=1)
+    assert stats["files"] == 1 and stats["failed"] == 1
+    assert stats["errors"] == [{"file": bad, "error": "embedding 接口超时"}]
+    assert set(list_knowledge_files(filepath)) == {os.path.abspath(good)}
+
+    # 失败的文件没有写入完成检查点，重新导入时只处理它
+    stats = import_knowledge_directory(FlakyEmbedding(None), str(tmp_path / "docs"), filepath, workers=1, batch_size=1)
+    assert (stats["files"], stats["skipped"], stats["failed"]) == (1, 1, 0)
+    assert set(list_knowledge_files(filepath)) == {os.path.abspath(good), os.path.abspath(bad)}
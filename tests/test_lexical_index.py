@@ -0,0 +1,146 @@
+# tests/test_lexical_index.py
+# -*- coding: utf-8 -*-
+import json
+import os
+import pickle
+import sys
+import threading
+
+from novel_generator import local_vectorstore
+from novel_generator.lexical_index import BigramBM25Index, reciprocal_rank_fusion, tokenize_bigrams
+from novel_generator.local_vectorstore import (LEXICAL_FILE, LocalVectorStore, close_local_vector_store,
+                                               get_local_vectorstore_dir, open_local_vector_store)
+from novel_generator.retrieval import hybrid_search, multi_query_search
+
+from helpers import HashEmbedding
+
+
+def test_tokenize_bigrams_mixes_cjk_and_ascii():
+    assert tokenize_bigrams("青云剑，HP值100") == ["青云", "云剑", "hp", "值", "100"]
+
+
+def test_bm25_ranks_exact_proper_noun_first_and_supports_remove():
+    index = BigramBM25Index()
+    index.add("a", "林风握紧了青云剑，剑光如水。")
+    index.add("b", "山门前的石阶上落满了枫叶。")
+    index.add("c", "长老提到青云宗的旧事。")
+    ranked = [doc_id for doc_id, _ in index.search("青云剑", k=3)]
+    assert ranked[0] == "a"
+    assert "b" not in ranked
+
+    index.remove("a")
+    assert [doc_id for doc_id, _ in index.search("青云剑")] == ["c"]
+    assert index.total_len == sum(index.doc_len.values())
+
+
+def test_bm25_candidates_restrict_scoring():
+    index = BigramBM25Index()
+    index.add("a", "青云剑")
+    index.add("b", "青云剑出鞘")
+    assert [doc_id for doc_id, _ in index.search("青云剑", candidates=["b"])] == ["b"]
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = dict(reciprocal_rank_fusion([["a", "b", "c"], ["c", "a"]], k=60))
+    assert fused["a"] > fused["c"] > fused["b"]
+
+
+def test_hybrid_search_finds_proper_noun(tmp_path):
+    store = LocalVectorStore(str(tmp_path), embedding_function=HashEmbedding())
+    store.add_texts(["林风握紧了青云剑。", "枫叶落满石阶。", "青云宗的长老闭关百年。"], ids=["a", "b", "c"],
+                    metadatas=[{"source": "knowledge"}, {"source": "knowledge"}, {"source": "chapter"}])
+    docs = hybrid_search(store, "青云剑", k=1)
+    assert [d.id for d in docs] == ["a"]
+    docs = multi_query_search(store, ["青云", "长老 闭关"], k=1, where={"source": "chapter"})
+    assert [d.id for d in docs] == ["c"]
+
+
+def test_lexical_search_is_safe_during_concurrent_writes(tmp_path):
+    """流水线中定稿写入与下一章的检索并发执行，检索不能读到正在修改的倒排表。"""
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    store = LocalVectorStore(str(tmp_path), embedding_function=HashEmbedding())
+    body = "青云剑光映着林风的脸，" * 20
+    store.add_texts([f"{body}{i}" for i in range(200)], ids=[f"seed{i}" for i in range(200)])
+    store.lexical_index()
+    errors = []
+    done = threading.Event()
+
+    def writer():
+        for i in range(200):
+            store.add_texts([f"{body}新写入{i}"], ids=[f"w{i}"])
+        done.set()
+
+    def reader():
+        while not done.is_set():
+            try:
+                store.lexical_search("青云剑 林风", k=5)
+                multi_query_search(store, ["青云剑", "林风"], k=2)
+            except RuntimeError as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=writer)] + [threading.Thread(target=reader) for _ in range(2)]
+    try:
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    finally:
+        sys.setswitchinterval(switch_interval)
+    assert errors == []
+
+
+def snapshot_version(store):
+    with open(os.path.join(store.persist_directory, LEXICAL_FILE), encoding="utf-8") as f:
+        return json.load(f)["version"]
+
+
+def test_lexical_snapshot_is_written_every_interval_and_on_close(tmp_path, monkeypatch):
+    monkeypatch.setattr(local_vectorstore, "LEXICAL_SNAPSHOT_INTERVAL", 3)
+    filepath = str(tmp_path)
+    store = open_local_vector_store(filepath, HashEmbedding())
+    store.add_texts(["林风握紧了青云剑。"], ids=["a"])
+    store.lexical_search("青云剑")
+    assert snapshot_version(store) == 1
+
+    # 写入后的检索不再立即重写快照，落后达到间隔才写
+    for i in range(2):
+        store.add_texts([f"枫叶落满石阶{i}。"], ids=[f"b{i}"])
+        store.lexical_search("青云剑")
+    assert snapshot_version(store) == 1
+    store.add_texts(["药王谷的丹炉。"], ids=["c"])
+    store.lexical_search("青云剑")
+    assert snapshot_version(store) == 4
+
+    store.delete(ids=["a"])
+    close_local_vector_store(filepath)
+    assert snapshot_version(store) == 5
+
+    # 重新打开时直接加载快照，不按文本重建
+    def no_rebuild(self, doc_id, text):
+        raise AssertionError("不应按文本重建索引")
+
+    monkeypatch.setattr(BigramBM25Index, "add", no_rebuild)
+    reopened = open_local_vector_store(filepath, HashEmbedding())
+    assert [doc_id for doc_id, _ in reopened.lexical_search("丹炉")] == ["c"]
+    assert reopened.lexical_search("青云剑") == []
+    close_local_vector_store(filepath)
+
+
+def test_lexical_snapshot_rejects_pickle_and_foreign_store(tmp_path):
+    store_dir = get_local_vectorstore_dir(str(tmp_path))
+    store = LocalVectorStore(store_dir, embedding_function=HashEmbedding())
+    store.add_texts(["林风握紧了青云剑。"], ids=["a"])
+    path = os.path.join(store_dir, LEXICAL_FILE)
+
+    with open(path, "wb") as f:
+        pickle.dump({"version": store.version}, f)
+    assert BigramBM25Index.load(path) is None
+    assert [doc_id for doc_id, _ in store.lexical_search("青云剑")] == ["a"]
+
+    # 同版本号但库标识不同（目录被删除后重建）的快照同样重建
+    stale = BigramBM25Index()
+    stale.add("x", "青云剑")
+    stale.save(path, store.version, "other-store")
+    fresh = LocalVectorStore(store_dir, embedding_function=HashEmbedding())
+    assert [doc_id for doc_id, _ in fresh.lexical_search("青云剑")] == ["a"]
@@ -0,0 +1,78 @@
+# tests/test_local_vectorstore.py
+# -*- coding: utf-8 -*-
+import shutil
+
+from novel_generator.local_vectorstore import (
+    LocalVectorStore,
+    close_local_vector_store,
+    get_local_vectorstore_dir,
+    open_local_vector_store,
+)
+
+from helpers import HashEmbedding
+
+
+def test_persist_delete_and_reload(tmp_path):
+    directory = str(tmp_path / "store")
+    store = LocalVectorStore(directory, embedding_function=HashEmbedding())
+    store.add_texts(["林风握紧了青云剑。", "山门前落满枫叶。", "长老提起旧事。"],
+                    metadatas=[{"chapter": 1}, {"chapter": 2}, {"chapter": 3}], ids=["a", "b", "c"])
+    store.add_texts(["林风收剑入鞘。"], metadatas=[{"chapter": 1}], ids=["a"])  # 同 id 覆盖
+    assert store.delete(where={"chapter": 2}) == 1
+
+    reloaded = LocalVectorStore(directory, embedding_function=HashEmbedding())
+    assert reloaded.count() == 2
+    assert reloaded.get(ids=["a"])["documents"] == ["林风收剑入鞘。"]
+    assert reloaded.store_id == store.store_id
+    assert reloaded.version == store.version
+    assert reloaded.similarity_search("收剑", k=1)[0].id == "a"
+
+
+def test_compact_keeps_alive_rows_and_identity(tmp_path):
+    directory = str(tmp_path / "store")
+    store = LocalVectorStore(directory, embedding_function=HashEmbedding())
+    store.add_texts([f"第{i}段文本" for i in range(10)], ids=[str(i) for i in range(10)])
+    store.delete(ids=[str(i) for i in range(7)])
+    assert store.needs_compaction()
+    result = store.compact()
+    assert (result["before"]["rows"], result["after"]["rows"]) == (10, 3)
+
+    reloaded = LocalVectorStore(directory)
+    assert sorted(reloaded.get()["ids"]) == ["7", "8", "9"]
+    assert reloaded.generation == 1
+    assert reloaded.store_id == store.store_id
+
+
+def test_open_reuses_instance_until_store_is_recreated(tmp_path):
+    filepath = str(tmp_path)
+    close_local_vector_store()
+    store = open_local_vector_store(filepath, HashEmbedding())
+    assert open_local_vector_store(filepath) is store
+    store.add_texts(["林风握紧了青云剑。"], ids=["a"])
+    assert open_local_vector_store(filepath) is store
+
+    # 目录被清空后由其它进程重建，行数与版本号都与缓存实例相同
+    directory = get_local_vectorstore_dir(filepath)
+    shutil.rmtree(directory)
+    other = LocalVectorStore(directory, embedding_function=HashEmbedding())
+    other.add_texts(["北境雪原上的观星台。"], ids=["b"])
+
+    reopened = open_local_vector_store(filepath)
+    assert reopened is not store
+    assert reopened.get()["ids"] == ["b"]
+    close_local_vector_store()
+
+
+def test_open_detects_store_created_after_empty_instance(tmp_path):
+    filepath = str(tmp_path)
+    close_local_vector_store()
+    empty = open_local_vector_store(filepath, HashEmbedding())
+    assert empty.count() == 0
+
+    other = LocalVectorStore(get_local_vectorstore_dir(filepath), embedding_function=HashEmbedding())
+    other.add_texts(["北境雪原上的观星台。"], ids=["b"])
+
+    reopened = open_local_vector_store(filepath)
+    assert reopened is not empty
+    assert reopened.count() == 1
+    close_local_vector_store()
@@ -0,0 +1,106 @@
+# tests/test_metadata_index.py
+# -*- coding: utf-8 -*-
+import os
+
+import pytest
+
+from novel_generator.finalize_graph import build_finalize_graph
+from novel_generator.local_vectorstore import LocalVectorStore, close_local_vector_store, open_local_vector_store
+from novel_generator.metadata_index import MetadataIndex, build_metadata_filter, recent_chapters_filter
+from novel_generator.task_graph import failed_nodes
+from utils import save_string_to_txt
+
+from helpers import HashEmbedding, ScriptedLLM
+
+ROWS = [
+    {"source": "chapter", "chapter": 1, "volume": 1, "characters": ["林风", "苏瑶"]},
+    {"source": "chapter", "chapter": 2, "volume": 1, "characters": ["林风"]},
+    {"source": "chapter", "chapter": 5, "volume": 2, "characters": ["苏瑶"]},
+    {"source": "knowledge", "file": "lore.txt"},
+]
+
+
+def _index():
+    index = MetadataIndex()
+    for row, meta in enumerate(ROWS):
+        index.add(row, meta)
+    return index
+
+
+@pytest.mark.parametrize("where, expected", [
+    ({"source": "chapter"}, {0, 1, 2}),
+    ({"chapter": {"$gte": 2, "$lte": 5}}, {1, 2}),
+    ({"chapter": {"$lt": 2}}, {0}),
+    ({"source": {"$ne": "chapter"}}, {3}),
+    ({"volume": {"$in": [2, 3]}}, {2}),
+    ({"volume": {"$nin": [1]}}, {2, 3}),
+    ({"characters": {"$contains": "苏瑶"}}, {0, 2}),
+    ({"characters": "林风"}, {0, 1}),
+    ({"$or": [{"source": "knowledge"}, {"chapter": {"$lte": 1}}]}, {0, 3}),
+    ({"$and": [{"source": "chapter"}, {"characters": {"$in": ["苏瑶"]}}, {"volume": 1}]}, {0}),
+    ({"$or": []}, set()),
+    ({}, {0, 1, 2, 3}),
+])
+def test_where_operators(where, expected):
+    assert _index().match(where) == expected
+
+
+def test_unknown_operator_is_rejected():
+    with pytest.raises(ValueError):
+        _index().match({"chapter": {"$regex": "1"}})
+
+
+def test_remove_updates_postings_and_range_values():
+    index = _index()
+    index.remove(2, ROWS[2])
+    assert index.match({"volume": 2}) == set()
+    assert index.match({"chapter": {"$gt": 2}}) == set()
+    assert index.match({"source": {"$ne": "knowledge"}}) == {0, 1}
+
+
+def test_build_metadata_filter_combinations():
+    assert build_metadata_filter() is None
+    assert build_metadata_filter(source="knowledge") == {"source": "knowledge"}
+    assert build_metadata_filter(source="chapter", chapter_range=(3, None), characters=["林风"]) == {
+        "$and": [{"source": "chapter"}, {"chapter": {"$gte": 3}}, {"characters": {"$in": ["林风"]}}]
+    }
+    assert _index().match(recent_chapters_filter(6, 4)) == {1, 2}
+
+
+def test_store_search_only_scores_filtered_rows(tmp_path):
+    store = LocalVectorStore(str(tmp_path / "store"), embedding_function=HashEmbedding())
+    store.add_texts(["林风握紧了青云剑。", "林风握紧了青云剑，剑光如水。", "长老提到青云宗。"],
+                    metadatas=[{"source": "chapter", "chapter": 1}, {"source": "chapter", "chapter": 8},
+                               {"source": "knowledge"}],
+                    ids=["c1", "c8", "k"])
+    where = {"$or": [{"source": "knowledge"}, {"chapter": {"$lte": 3}}]}
+    assert {doc.id for doc in store.similarity_search("林风握紧了青云剑，剑光如水。", k=3, where=where)} == {"c1", "k"}
+
+    # 删除后的行不再出现在过滤结果中，重新打开后索引从磁盘重建
+    store.delete(ids=["c1"])
+    assert store.filter_ids(where) == ["k"]
+    assert LocalVectorStore(str(tmp_path / "store")).filter_ids({"chapter": {"$gte": 1}}) == ["c8"]
+
+
+def test_finalize_tags_chapter_chunks_with_volume_and_characters(tmp_path):
+    filepath = str(tmp_path)
+    close_local_vector_store()
+    os.makedirs(os.path.join(filepath, "chapters"))
+    save_string_to_txt("第一卷 下山\n第1章 - [拜师]\n本章简述：[拜师]\n\n第二卷 北上\n第2章 - [雪原]\n本章简述：[北上]\n",
+                       os.path.join(filepath, "Novel_directory.txt"))
+    save_string_to_txt("林风：\n├──状态:\n│  └──心理状态: 平静\n\n新出场角色：\n- 王五：客栈掌柜",
+                       os.path.join(filepath, "character_state.txt"))
+    save_string_to_txt("林风踏上北上的路，雪原一望无际。\n" * 10 + "客栈里，王五端来一碗热汤。",
+                       os.path.join(filepath, "chapters", "chapter_2.txt"))
+
+    llm = ScriptedLLM(respond=lambda prompt: "{}" if "已登记的全部角色名" in prompt else "林风北上。")
+    results = build_finalize_graph(llm, HashEmbedding(), filepath, 2, retries=0).run()
+    assert failed_nodes(results) == []
+
+    store = open_local_vector_store(filepath)
+    chapter_ids = store.filter_ids({"chapter": 2})
+    assert chapter_ids and store.filter_ids({"volume": 2}) == chapter_ids
+    assert store.filter_ids({"characters": "林风"})
+    assert store.filter_ids(build_metadata_filter(characters=["王五"])) == chapter_ids
+    assert store.filter_ids({"characters": "苏瑶"}) == []
+    close_local_vector_store()
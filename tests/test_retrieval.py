@@ -0,0 +1,64 @@
+# tests/test_retrieval.py
+# -*- coding: utf-8 -*-
+from novel_generator.local_vectorstore import LocalVectorStore
+from novel_generator.retrieval import hybrid_search, multi_query_search, parse_keyword_groups
+
+from helpers import HashEmbedding
+
+TEXTS = [
+    "青云剑是青云宗的镇派之宝，剑身刻有云纹。",
+    "苏瑶在药王谷学医，擅长炼制丹药。",
+    "天机阁掌管天下情报，阁主从不露面。",
+    "林风在客栈与掌柜王五谈起北境的战事。",
+    "药王谷的丹炉三百年未曾熄灭。",
+]
+
+
+def make_store(path, embedding):
+    store = LocalVectorStore(str(path), embedding_function=embedding)
+    store.add_texts(TEXTS, metadatas=[{"source": "knowledge", "volume": 1 + i % 2} for i in range(len(TEXTS))],
+                    ids=[f"k{i}" for i in range(len(TEXTS))])
+    return store
+
+
+def test_parse_keyword_groups_strips_markers_and_deduplicates():
+    response = "1. 青云剑·镇派之宝\n- 药王谷·丹药\n\n这是一段很长的解释说明文字，不是检索词组，应当被跳过不参与检索。\n• 青云剑·镇派之宝\n天机阁"
+    assert parse_keyword_groups(response) == ["青云剑 镇派之宝", "药王谷 丹药", "天机阁"]
+    assert parse_keyword_groups("甲·乙\n丙·丁\n戊", max_groups=2) == ["甲 乙", "丙 丁"]
+
+
+def test_multi_query_embeds_all_groups_in_one_call(tmp_path):
+    embedding = HashEmbedding()
+    store = make_store(tmp_path / "store", embedding)
+    embedding.calls = 0
+
+    queries = ["青云剑 镇派之宝", "药王谷 丹药", "  "]
+    docs = multi_query_search(store, queries, k=1)
+    assert embedding.calls == 1
+    assert {doc.id for doc in docs} == {"k0", "k1"}
+
+    # 与逐组 hybrid_search 的结果合并后一致
+    single = {doc.id for q in queries[:2] for doc in hybrid_search(store, q, k=1)}
+    assert {doc.id for doc in docs} == single
+
+
+def test_multi_query_deduplicates_and_respects_where(tmp_path):
+    store = make_store(tmp_path / "store", HashEmbedding())
+    docs = multi_query_search(store, ["药王谷", "药王谷 丹炉"], k=2)
+    ids = [doc.id for doc in docs]
+    assert len(ids) == len(set(ids)) and {"k1", "k4"} <= set(ids)
+
+    docs = multi_query_search(store, ["药王谷", "天机阁"], k=2, where={"volume": 1})
+    assert {doc.id for doc in docs} <= {"k0", "k2", "k4"}
+    assert multi_query_search(store, ["药王谷"], k=2, where={"volume": 9}) == []
+
+
+def test_multi_query_falls_back_to_lexical_when_embedding_fails(tmp_path):
+    store = make_store(tmp_path / "store", HashEmbedding())
+
+    def fail(texts):
+        raise RuntimeError("embedding 服务不可用")
+
+    store.embedding_function.embed_documents = fail
+    docs = multi_query_search(store, ["天机阁 阁主"], k=1)
+    assert [doc.id for doc in docs] == ["k2"]
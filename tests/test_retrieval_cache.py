@@ -0,0 +1,110 @@
+# tests/test_retrieval_cache.py
+# -*- coding: utf-8 -*-
+import itertools
+import os
+import shutil
+
+from novel_generator.chapter_pipeline import prepare_chapter_context
+from novel_generator.local_vectorstore import LocalVectorStore
+from novel_generator.retrieval_cache import cached_multi_query_search, invalidate_retrieval_cache, memoize_keywords
+
+from utils import save_string_to_txt
+
+from helpers import HashEmbedding, ScriptedLLM
+
+QUERIES = ["青云剑 林风"]
+
+
+def test_cache_hit_skips_embedding_and_write_invalidates(tmp_path):
+    invalidate_retrieval_cache()
+    embedding = HashEmbedding()
+    store = LocalVectorStore(str(tmp_path / "store"), embedding_function=embedding)
+    store.add_texts(["林风握紧了青云剑。"], ids=["a"])
+
+    first = cached_multi_query_search(store, QUERIES, k=2)
+    calls = embedding.calls
+    assert [doc.id for doc in cached_multi_query_search(store, QUERIES, k=2)] == [doc.id for doc in first]
+    assert embedding.calls == calls
+
+    store.add_texts(["青云剑在林风手中嗡鸣。"], ids=["b"])
+    assert {doc.id for doc in cached_multi_query_search(store, QUERIES, k=2)} == {"a", "b"}
+
+
+def test_recreated_store_with_same_version_does_not_hit_old_results(tmp_path):
+    invalidate_retrieval_cache()
+    directory = str(tmp_path / "store")
+    old = LocalVectorStore(directory, embedding_function=HashEmbedding())
+    old.add_texts(["林风握紧了青云剑。"], ids=["old"])
+    assert [doc.id for doc in cached_multi_query_search(old, QUERIES, k=1)] == ["old"]
+
+    # 清空后重建：目录与版本号都与旧库相同
+    shutil.rmtree(directory)
+    new = LocalVectorStore(directory, embedding_function=HashEmbedding())
+    new.add_texts(["青云剑与林风。"], ids=["new"])
+    assert new.version == old.version
+    assert [doc.id for doc in cached_multi_query_search(new, QUERIES, k=1)] == ["new"]
+
+
+def test_caller_mutation_does_not_corrupt_cache(tmp_path):
+    invalidate_retrieval_cache()
+    store = LocalVectorStore(str(tmp_path / "store"), embedding_function=HashEmbedding())
+    store.add_texts(["林风握紧了青云剑。"], metadatas=[{"chapter": 1}], ids=["a"])
+
+    docs = cached_multi_query_search(store, QUERIES, k=1)
+    docs[0].metadata["chapter"] = 99
+    docs[0].page_content = "被调用方改写"
+    docs.append(docs[0])
+
+    again = cached_multi_query_search(store, QUERIES, k=1)
+    assert len(again) == 1
+    assert again[0].metadata == {"chapter": 1}
+    assert again[0].page_content == "林风握紧了青云剑。"
+
+
+def test_memoize_keywords_caches_non_empty_output(tmp_path):
+    calls = []
+
+    def generate(value):
+        def run():
+            calls.append(value)
+            return value
+        return run
+
+    filepath = str(tmp_path)
+    assert memoize_keywords(filepath, "h1", generate("")) == ""
+    assert memoize_keywords(filepath, "h1", generate("林风·青云剑")) == "林风·青云剑"
+    assert memoize_keywords(filepath, "h1", generate("不会调用")) == "林风·青云剑"
+    assert calls == ["", "林风·青云剑"]
+
+
+def test_retried_chapter_prep_reuses_summary_and_keywords(tmp_path):
+    filepath = str(tmp_path)
+    os.makedirs(os.path.join(filepath, "chapters"))
+    save_string_to_txt("第1章 - 拜师\n本章简述：拜入青云宗\n\n第2章 - 下山\n本章简述：下山",
+                       os.path.join(filepath, "Novel_directory.txt"))
+    save_string_to_txt("林风拜入青云宗。", os.path.join(filepath, "chapters", "chapter_1.txt"))
+    settings = {
+        "params": {"filepath": filepath, "characters_involved": "林风", "key_items": "", "scene_location": "",
+                   "time_constraint": "", "user_guidance": ""},
+        "embedding": {"retrieval_k": 4}
+    }
+    counter = itertools.count()
+
+    def respond(prompt):
+        # 每次调用的输出都不同，模拟采样的不确定性
+        return f"当前章节摘要：第{next(counter)}种写法" if "当前章节摘要" in prompt else f"林风·青云剑{next(counter)}"
+
+    first_llm = ScriptedLLM(respond=respond)
+    first = prepare_chapter_context(settings, 2, first_llm, HashEmbedding())
+    assert len(first_llm.prompts) == 2
+
+    retry_llm = ScriptedLLM(respond=respond)
+    retry = prepare_chapter_context(settings, 2, retry_llm, HashEmbedding())
+    assert retry_llm.prompts == []
+    assert retry["short_summary"] == first["short_summary"]
+
+    # 上一章正文改动后重新生成
+    save_string_to_txt("林风拜入青云宗，师父赠剑。", os.path.join(filepath, "chapters", "chapter_1.txt"))
+    changed_llm = ScriptedLLM(respond=respond)
+    prepare_chapter_context(settings, 2, changed_llm, HashEmbedding())
+    assert len(changed_llm.prompts) == 2
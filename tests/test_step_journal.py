@@ -0,0 +1,113 @@
+# tests/test_step_journal.py
+# -*- coding: utf-8 -*-
+import os
+
+import pytest
+
+from novel_generator.runner import DEFAULT_NOVEL_PARAMS, STEP_DRAFT, STEP_FINALIZE, journal_done, journaled
+from novel_generator.step_journal import JOURNAL_FILE, StepJournal
+from utils import read_file, save_string_to_txt
+
+
+def write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    save_string_to_txt(text, path)
+
+
+def test_commit_is_done_until_inputs_or_outputs_change(tmp_path):
+    filepath = str(tmp_path)
+    output = os.path.join(filepath, "chapters", "chapter_1.txt")
+    journal = StepJournal(filepath)
+    journal.begin("draft", 1, {"blueprint": "a"})
+    assert not journal.is_done("draft", 1, {"blueprint": "a"}, [output])
+
+    write(output, "林风下山。")
+    journal.commit("draft", 1, {"blueprint": "a"}, [output])
+    assert journal.is_done("draft", 1, {"blueprint": "a"}, [output])
+    assert not journal.is_done("draft", 1, {"blueprint": "b"}, [output])
+    assert not journal.is_done("draft", 2, {"blueprint": "a"}, [output])
+
+    # 重新打开后从日志恢复状态
+    assert StepJournal(filepath).is_done("draft", 1, {"blueprint": "a"}, [output])
+
+    # 输出文件被手工改动后不再视为完成
+    write(output, "林风上山。")
+    assert not StepJournal(filepath).is_done("draft", 1, {"blueprint": "a"}, [output])
+
+
+def test_truncated_last_line_is_ignored(tmp_path):
+    filepath = str(tmp_path)
+    journal = StepJournal(filepath)
+    journal.commit("blueprint", None, {"params": "x"})
+    with open(os.path.join(filepath, JOURNAL_FILE), "a", encoding="utf-8") as f:
+        f.write('{"seq": 9, "event": "sta')
+
+    reloaded = StepJournal(filepath)
+    assert reloaded.is_done("blueprint", None, {"params": "x"})
+    assert reloaded.interrupted() == []
+    # 序号在已有记录之后继续递增
+    assert reloaded.fail("architecture")["seq"] == 2
+
+
+def test_recover_restores_snapshot_of_interrupted_step_once(tmp_path):
+    filepath = str(tmp_path)
+    summary = os.path.join(filepath, "global_summary.txt")
+    created_later = os.path.join(filepath, "character_state.txt")
+    write(summary, "第1章摘要")
+    journal = StepJournal(filepath)
+    journal.begin("finalize", 2, {"draft": "3"}, snapshot=[summary, created_later])
+    # 模拟定稿写到一半时进程退出
+    write(summary, "第1章摘要\n第2章摘要（半成品）")
+
+    restarted = StepJournal(filepath)
+    assert restarted.interrupted() == ["finalize:2"]
+    assert restarted.recover() == {"finalize:2": ["global_summary.txt"]}
+    assert read_file(summary) == "第1章摘要"
+    assert restarted.interrupted() == []
+    assert restarted.committed("finalize", 2) is None
+
+    # 已记为 fail，之后再次恢复不会覆盖新的内容
+    write(summary, "第1章摘要\n第2章摘要")
+    assert StepJournal(filepath).recover() == {}
+    assert read_file(summary) == "第1章摘要\n第2章摘要"
+
+
+def test_commit_discards_snapshot(tmp_path):
+    filepath = str(tmp_path)
+    summary = os.path.join(filepath, "global_summary.txt")
+    write(summary, "旧摘要")
+    journal = StepJournal(filepath)
+    journal.begin("finalize", 1, snapshot=[summary])
+    write(summary, "新摘要")
+    journal.commit("finalize", 1, outputs=[summary])
+
+    assert journal.restore_snapshot("finalize", 1) == []
+    assert StepJournal(filepath).recover() == {}
+    assert read_file(summary) == "新摘要"
+
+
+def test_journaled_steps_and_redraft_invalidates_finalize(tmp_path):
+    filepath = str(tmp_path)
+    settings = {"params": dict(DEFAULT_NOVEL_PARAMS, filepath=filepath)}
+    chapter_file = os.path.join(filepath, "chapters", "chapter_1.txt")
+    journal = StepJournal(filepath)
+
+    journaled(journal, settings, STEP_DRAFT, lambda: write(chapter_file, "草稿"), 1)()
+    assert journal_done(journal, settings, STEP_DRAFT, 1)
+    assert not journal_done(journal, settings, STEP_FINALIZE, 1)
+
+    def broken_finalize():
+        write(chapter_file, "扩写到一半")
+        raise RuntimeError("LLM 超时")
+
+    with pytest.raises(RuntimeError):
+        journaled(journal, settings, STEP_FINALIZE, broken_finalize, 1)()
+    assert journal.interrupted() == []
+    assert not journal_done(journal, settings, STEP_FINALIZE, 1)
+
+    journaled(journal, settings, STEP_FINALIZE, lambda: write(chapter_file, "定稿"), 1)()
+    assert journal_done(journal, settings, STEP_FINALIZE, 1)
+
+    # 草稿重新生成后，定稿的输入（草稿 commit 序号）随之变化
+    journaled(journal, settings, STEP_DRAFT, lambda: write(chapter_file, "新草稿"), 1)()
+    assert not journal_done(journal, settings, STEP_FINALIZE, 1)
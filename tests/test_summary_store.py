@@ -0,0 +1,70 @@
+# tests/test_summary_store.py
+# -*- coding: utf-8 -*-
+import os
+
+from novel_generator.summary_store import (
+    SUMMARY_TOKEN_BUDGET,
+    arc_summary_path,
+    build_summary_context,
+    chapter_summary_path,
+    summary_dir,
+    update_hierarchical_summary
+)
+from utils import estimate_tokens, read_file, save_string_to_txt
+
+from helpers import ScriptedLLM
+
+
+def _write(path: str, text: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    save_string_to_txt(text, path)
+
+
+def test_mid_arc_context_keeps_global_and_arc_summaries(tmp_path):
+    filepath = str(tmp_path)
+    for n in range(1, 20):
+        _write(chapter_summary_path(filepath, n), f"第{n}章的事件" + "剧情推进" * 74)
+    _write(arc_summary_path(filepath, 1), "第一段：主角离开山村，拜入宗门。" + "阶段经过" * 100)
+    _write(os.path.join(summary_dir(filepath), "global.txt"), "全书至今：主角拜入宗门，卷入宗门内斗。" + "主线经过" * 150)
+
+    context = build_summary_context(filepath, 20)
+
+    assert "【全书概要】" in context and "卷入宗门内斗" in context
+    assert "【近期阶段】" in context and "拜入宗门" in context
+    assert "第19章的事件" in context
+    # 已汇总进第一段的第1-10章不再逐章出现
+    assert "第10章的事件" not in context
+    assert estimate_tokens(context) <= SUMMARY_TOKEN_BUDGET + 50
+
+
+def test_oversized_global_summary_is_trimmed_not_dropped(tmp_path):
+    filepath = str(tmp_path)
+    _write(os.path.join(summary_dir(filepath), "global.txt"), "开篇设定" + "很长的全书概要" * 1000)
+    _write(chapter_summary_path(filepath, 1), "第1章的事件")
+    context = build_summary_context(filepath, 2, token_budget=1000)
+    assert context.startswith("【全书概要】\n开篇设定")
+    assert "第1章的事件" in context
+    assert estimate_tokens(context) <= 1000
+
+
+def test_update_hierarchical_summary_rolls_up_completed_arc(tmp_path):
+    filepath = str(tmp_path)
+    save_string_to_txt("旧的前文摘要", os.path.join(filepath, "global_summary.txt"))
+
+    def respond(prompt: str) -> str:
+        if "阶段摘要" in prompt and "逐章摘要" in prompt:
+            return "第1-3章阶段摘要"
+        if "各阶段摘要" in prompt:
+            return "重建的全书概要"
+        return f"摘要{len(prompt)}"
+
+    llm = ScriptedLLM(respond=respond)
+    for n in range(1, 4):
+        result = update_hierarchical_summary(llm, filepath, n, f"第{n}章正文", arc_size=3)
+    assert result["arc"] == 1
+    assert read_file(os.path.join(summary_dir(filepath), "legacy.txt")) == "旧的前文摘要"
+    assert read_file(arc_summary_path(filepath, 1)) == "第1-3章阶段摘要"
+    context = read_file(os.path.join(filepath, "global_summary.txt"))
+    assert "重建的全书概要" in context and "第1-3章阶段摘要" in context
+    # 每次定稿只发送本章正文，提示词不随章节数增长
+    assert all("第1章正文" not in p for p in llm.prompts if "第3章正文" in p)
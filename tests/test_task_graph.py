@@ -0,0 +1,115 @@
+# tests/test_task_graph.py
+# -*- coding: utf-8 -*-
+import json
+import os
+import threading
+
+import pytest
+
+from novel_generator.finalize_graph import NODE_CHARACTER_STATE, build_finalize_graph
+from novel_generator.local_vectorstore import close_local_vector_store
+from novel_generator.task_graph import STATUS_DONE, STATUS_FAILED, STATUS_SKIPPED, TaskGraph, failed_nodes
+from utils import read_file, save_string_to_txt
+
+from helpers import HashEmbedding, ScriptedLLM
+
+
+def test_independent_nodes_run_concurrently_and_receive_inputs():
+    barrier = threading.Barrier(2, timeout=5)
+
+    def branch(value):
+        def run(inputs):
+            barrier.wait()  # 两个分支必须同时在执行，否则超时失败
+            return inputs["root"] + value
+        return run
+
+    graph = TaskGraph("t")
+    graph.add("root", lambda inputs: 1)
+    graph.add("a", branch(10), deps=["root"])
+    graph.add("b", branch(100), deps=["root"])
+    graph.add("join", lambda inputs: inputs["a"] + inputs["b"], deps=["a", "b"])
+    events = []
+    results = graph.run(max_workers=2, emit=events.append)
+
+    assert results["join"]["result"] == 112
+    assert failed_nodes(results) == []
+    assert events[-1]["event"] == "graph_done"
+
+
+def test_retry_then_failure_skips_only_downstream():
+    calls = {"flaky": 0}
+
+    def flaky(inputs):
+        calls["flaky"] += 1
+        if calls["flaky"] < 2:
+            raise RuntimeError("临时错误")
+        return "ok"
+
+    graph = TaskGraph("t")
+    graph.add("flaky", flaky, retries=1)
+    graph.add("broken", lambda inputs: 1 / 0)
+    graph.add("after_broken", lambda inputs: "never", deps=["broken"])
+    graph.add("after_flaky", lambda inputs: inputs["flaky"] * 2, deps=["flaky"])
+    results = graph.run()
+
+    assert results["flaky"]["status"] == STATUS_DONE and results["flaky"]["attempts"] == 2
+    assert results["broken"]["status"] == STATUS_FAILED and "division" in results["broken"]["error"]
+    assert results["after_broken"]["status"] == STATUS_SKIPPED
+    assert results["after_flaky"]["result"] == "okok"
+    assert failed_nodes(results) == ["broken", "after_broken"]
+
+
+def test_only_reruns_target_and_reuses_previous_upstream():
+    calls = []
+
+    def node(name):
+        def run(inputs):
+            calls.append(name)
+            return name
+        return run
+
+    graph = TaskGraph("t")
+    graph.add("a", node("a"))
+    graph.add("b", node("b"), deps=["a"])
+    graph.add("c", node("c"), deps=["b"])
+    first = graph.run()
+    calls.clear()
+
+    second = graph.run(only=["c"], previous=first)
+    assert calls == ["c"]
+    assert list(second) == ["a", "b", "c"]
+    assert second["c"]["status"] == STATUS_DONE
+
+
+def test_add_validates_names_and_dependencies():
+    graph = TaskGraph("t").add("a", lambda inputs: None)
+    with pytest.raises(ValueError):
+        graph.add("a", lambda inputs: None)
+    with pytest.raises(ValueError):
+        graph.add("b", lambda inputs: None, deps=["missing"])
+
+
+def test_finalize_graph_isolates_failed_substep_and_reruns_it(tmp_path):
+    filepath = str(tmp_path)
+    close_local_vector_store()
+    os.makedirs(os.path.join(filepath, "chapters"))
+    save_string_to_txt("林风下山，在客栈遇见掌柜王五。\n" * 20, os.path.join(filepath, "chapters", "chapter_1.txt"))
+    delta = {"characters": {"林风": {"状态": {"心理状态": "警惕"}}}}
+    broken = {"on": True}
+
+    def respond(prompt):
+        if "已登记的全部角色名" in prompt:
+            return "" if broken["on"] else json.dumps(delta, ensure_ascii=False)
+        return "林风下山。"
+
+    graph = build_finalize_graph(ScriptedLLM(respond=respond), HashEmbedding(), filepath, 1, retries=0)
+    first = graph.run()
+    assert failed_nodes(first) == [NODE_CHARACTER_STATE]
+    assert first["summary"]["status"] == STATUS_DONE
+    assert first["vectorstore"]["result"]["added"] > 0
+
+    broken["on"] = False
+    second = graph.run(only=failed_nodes(first), previous=first)
+    assert failed_nodes(second) == []
+    assert "心理状态: 警惕" in read_file(os.path.join(filepath, "character_state.txt"))
+    close_local_vector_store()
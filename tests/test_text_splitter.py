@@ -0,0 +1,42 @@
+# tests/test_text_splitter.py
+# -*- coding: utf-8 -*-
+import pytest
+
+from novel_generator.text_splitter import ChineseSentenceSplitter, split_sentences
+from utils import estimate_tokens
+
+
+def test_split_sentences_keeps_dialogue_and_closing_marks():
+    text = "他说：“走吧。我们今晚就出发！”她点头。真的吗？！（他笑了。）\n新的一段"
+    assert split_sentences(text) == ["他说：“走吧。我们今晚就出发！”", "她点头。", "真的吗？！", "（他笑了。）", "新的一段"]
+
+
+def test_split_sentences_breaks_overlong_unclosed_quote():
+    text = "“" + "很长的独白。" * 60 + "结束"
+    sentences = split_sentences(text)
+    assert len(sentences) > 1
+    assert "".join(sentences) == text
+
+
+def test_splitter_packs_sentences_with_whole_sentence_overlap():
+    sentences = [f"第{i}句话讲述林风在山中修行的经历。" for i in range(40)]
+    splitter = ChineseSentenceSplitter(chunk_tokens=60, overlap_tokens=20)
+    chunks = splitter.split_text("".join(sentences))
+
+    assert all(estimate_tokens(c) <= 60 for c in chunks)
+    for previous, current in zip(chunks, chunks[1:]):
+        first_sentence = split_sentences(current)[0]
+        # 下一片段以上一片段末尾的整句开头
+        assert previous.endswith(first_sentence)
+    # 每句至少出现在一个片段中
+    assert all(any(s in c for c in chunks) for s in sentences)
+
+
+def test_splitter_hard_splits_sentence_without_punctuation():
+    chunks = ChineseSentenceSplitter(chunk_tokens=50, overlap_tokens=0).split_text("无" * 130)
+    assert [len(c) for c in chunks] == [50, 50, 30]
+
+
+def test_overlap_must_be_smaller_than_chunk():
+    with pytest.raises(ValueError):
+        ChineseSentenceSplitter(chunk_tokens=10, overlap_tokens=10)
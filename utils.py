@@ -2,6 +2,9 @@
 # -*- coding: utf-8 -*-
 import os
 import json
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional
 
 def read_file(filename: str) -> str:
     """读取文件的全部内容，若文件不存在或异常则返回空字符串。"""
@@ -15,6 +18,38 @@ def read_file(filename: str) -> str:
         print(f"[read_file] 读取文件时发生错误: {e}")
         return ""
 
+def read_file_tail(filename: str, max_chars: int) -> str:
+    """
+    只读取文件末尾的 max_chars 个字符（UTF-8），从文件尾部按需向前扩大读取范围，
+    起点落在多字节字符中间时跳过残缺字节。文件不存在或异常时返回空字符串。
+    """
+    if max_chars <= 0:
+        return ""
+    try:
+        with open(filename, 'rb') as file:
+            file.seek(0, os.SEEK_END)
+            size = file.tell()
+            span = max_chars * 3 + 4
+            while True:
+                start = max(0, size - span)
+                file.seek(start)
+                data = file.read(size - start)
+                if start > 0:
+                    # 跳过 UTF-8 续字节（10xxxxxx），从完整字符开始解码
+                    skip = 0
+                    while skip < len(data) and skip < 4 and (data[skip] & 0xC0) == 0x80:
+                        skip += 1
+                    data = data[skip:]
+                text = data.decode('utf-8', errors='replace')
+                if len(text) >= max_chars or start == 0:
+                    return text[-max_chars:]
+                span *= 2
+    except FileNotFoundError:
+        return ""
+    except Exception as e:
+        print(f"[read_file_tail] 读取文件时发生错误: {e}")
+        return ""
+
 def append_text_to_file(text_to_append: str, file_path: str):
     """在文件末尾追加文本(带换行)。若文本非空且无换行，则自动加换行。"""
     if text_to_append and not text_to_append.startswith('\n'):
@@ -51,3 +86,52 @@ def save_data_to_json(data: dict, file_path: str) -> bool:
     except Exception as e:
         print(f"[save_data_to_json] 保存数据到JSON文件时出错: {e}")
         return False
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算 token 数：中日韩字符按 1 个 token 计，其余字符按 4 个字符 1 个 token 计。"""
+    if not text:
+        return 0
+    cjk = sum(1 for ch in text if '\u3400' <= ch <= '\u9fff' or '\uf900' <= ch <= '\ufaff')
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+_provider_limits: Dict[str, int] = {}
+_provider_default_limit: Optional[int] = None
+_provider_semaphores: Dict[str, threading.BoundedSemaphore] = {}
+_provider_lock = threading.Lock()
+
+
+def set_provider_call_limits(limits: Dict[str, int], default_limit: Optional[int] = None):
+    """
+    设置各 LLM 接口（interface_format，不区分大小写）同时进行的调用数上限，进程内全局生效；
+    未列出的接口使用 default_limit，为 None 时不限制。已在等待或执行中的调用不受影响。
+    """
+    global _provider_default_limit
+    with _provider_lock:
+        _provider_limits.clear()
+        _provider_limits.update({name.strip().lower(): int(limit) for name, limit in limits.items()})
+        _provider_default_limit = default_limit
+        _provider_semaphores.clear()
+
+
+def provider_call_limit(provider: str) -> Optional[int]:
+    with _provider_lock:
+        return _provider_limits.get(provider.strip().lower(), _provider_default_limit)
+
+
+@contextmanager
+def provider_call_slot(provider: str):
+    """在接口的并发上限内执行一次调用：已达上限时阻塞等待；该接口不限制时直接执行。"""
+    key = provider.strip().lower()
+    with _provider_lock:
+        limit = _provider_limits.get(key, _provider_default_limit)
+        semaphore = None
+        if limit is not None:
+            semaphore = _provider_semaphores.get(key)
+            if semaphore is None:
+                semaphore = _provider_semaphores[key] = threading.BoundedSemaphore(max(1, limit))
+    if semaphore is None:
+        yield
+        return
+    with semaphore:
+        yield